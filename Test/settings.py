@@ -1,26 +1,59 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Profil d'exécution (variable d'environnement DJANGO_ENV) : `development` (défaut) ou `production`.
+# En production : DEBUG désactivé, clé secrète (DJANGO_SECRET_KEY, obligatoire) et hôtes
+# (DJANGO_ALLOWED_HOSTS, séparés par des virgules) lus dans l'environnement, sans les applications
+# ni les middlewares de développement (barre de debug, thème jazzmin, documentation Swagger),
+# schéma OpenAPI mis en cache. DJANGO_API_DOCS=1 garde /swagger/ et /redoc/ ; DJANGO_ADMIN=0
+# sert l'API seule (sans administration, sessions, CSRF ni messages).
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'development')
+PRODUCTION = DJANGO_ENV == 'production'
+
+
+def env_flag(name, default):
+    """ Variable d'environnement booléenne (`1`, `true`, `yes`, `on`), `default` si absente """
+    value = os.environ.get(name)
+    return default if value is None else value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-=^#e$%9nkp%03y9az!xn6(tw$n&^env1$er0_l-6t#ziseza87'
+if PRODUCTION:
+    try:
+        SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+    except KeyError:
+        raise ImproperlyConfigured("DJANGO_SECRET_KEY est obligatoire avec DJANGO_ENV=production.") from None
+else:
+    SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY',
+                                'django-insecure-=^#e$%9nkp%03y9az!xn6(tw$n&^env1$er0_l-6t#ziseza87')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_flag('DJANGO_DEBUG', not PRODUCTION)
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
 
-ALLOWED_HOSTS = []
+# Applications optionnelles du profil
+ADMIN_THEME = env_flag('DJANGO_ADMIN_THEME', not PRODUCTION)
+API_DOCS = env_flag('DJANGO_API_DOCS', not PRODUCTION)
+ADMIN = env_flag('DJANGO_ADMIN', True)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT avec utilisateurs en cache (accounting/authentication.py)
+        'accounting.authentication.CachedJWTAuthentication',
     ),
+    # Pagination par page (`?page=`) ou keyset (`?cursor=`) sur toutes les listes
+    'DEFAULT_PAGINATION_CLASS': 'accounting.pagination.LedgerPagination',
+    'PAGE_SIZE': 100,
 }
 
 INSTALLED_APPS = [
     'jazzmin',
-    'debug_toolbar',
     'django.contrib.admin',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -34,7 +67,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    # Premier : la durée mesurée couvre toute la chaîne (accounting/metrics.py)
+    'accounting.metrics.MetricsMiddleware',
+    # Chaque requête commence sur la base principale (accounting/routers.py)
+    'accounting.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -44,6 +80,22 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Profil : applications et middlewares retirés (voir DJANGO_ENV ci-dessus)
+if not ADMIN_THEME:
+    INSTALLED_APPS.remove('jazzmin')
+if not API_DOCS:
+    INSTALLED_APPS.remove('drf_yasg')
+if not ADMIN:
+    # L'API s'authentifie par JWT : sessions, CSRF et messages ne servent qu'à l'administration
+    for app in ('jazzmin', 'django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages'):
+        if app in INSTALLED_APPS:
+            INSTALLED_APPS.remove(app)
+    for middleware in ('django.contrib.sessions.middleware.SessionMiddleware',
+                       'django.middleware.csrf.CsrfViewMiddleware',
+                       'django.contrib.auth.middleware.AuthenticationMiddleware',
+                       'django.contrib.messages.middleware.MessageMiddleware'):
+        MIDDLEWARE.remove(middleware)
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
@@ -121,9 +173,18 @@ SWAGGER_SETTINGS = {
     },
     'USE_SESSION_AUTH': False,
 }
+# Durée de cache (secondes) du schéma OpenAPI généré pour /swagger/ et /redoc/ : la génération
+# parcourt toutes les vues. 0 en développement (schéma toujours à jour).
+ACCOUNTING_SCHEMA_CACHE_TIMEOUT = int(os.environ.get('DJANGO_SCHEMA_CACHE_TIMEOUT', 3600 if PRODUCTION else 0))
 
 
 ROOT_URLCONF = 'Test.urls'
+
+# Barre de debug : en développement uniquement. En production, voir /metrics.
+if DEBUG:
+    INSTALLED_APPS.insert(1, 'debug_toolbar')
+    MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1'
 ]
@@ -164,24 +225,133 @@ WSGI_APPLICATION = 'Test.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-#DATABASES = {
-#    'default': {
-#        'ENGINE': 'django.db.backends.sqlite3',
-#        'NAME': BASE_DIR / 'db.sqlite3',
-#    }
-#}
-
-# Database postgresql
+# Database postgresql (paramètres surchargés par les variables d'environnement DB_*)
+# Connexions persistantes : réutilisées par chaque worker pendant DB_CONN_MAX_AGE secondes
+# (0 : une connexion par requête ; None : sans limite), vérifiées avant réutilisation
+# après une erreur (CONN_HEALTH_CHECKS).
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'comptabilite',
-        'USER': 'db_admin_test',
-        'PASSWORD': 'compt2@25Benin',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'comptabilite'),
+        'USER': os.environ.get('DB_USER', 'db_admin_test'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'compt2@25Benin'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Pool de connexions de psycopg 3 (`pip install "psycopg[pool]"`, à la place de psycopg2) :
+# DB_POOL_MAX_SIZE connexions partagées par les threads d'un worker. Incompatible avec
+# les connexions persistantes (CONN_MAX_AGE = 0). Derrière PgBouncer, laisser DB_POOL vide.
+if os.environ.get('DB_POOL') and os.environ.get('DB_ENGINE') != 'sqlite':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {'pool': {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+    }}
+
+# Base SQLite locale (DB_ENGINE=sqlite) : tests, benchmarks et développement sans PostgreSQL.
+# DB_NAME est alors le chemin du fichier (db.sqlite3 à la racine du projet par défaut).
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # Écritures concurrentes (threads des rapports, benchmarks de concurrence) : attente du verrou
+            'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
+            # Base de test en fichier (et non en mémoire) : partagée par les threads des tests de concurrence
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+
+# Réplica en lecture seule (DB_REPLICA_HOST) : lectures des ViewSets, exports et rapports
+# (accounting/routers.py). Un utilisateur qui vient d'écrire lit sur la base principale
+# pendant ACCOUNTING_REPLICA_STICKY_SECONDS (délai de réplication toléré).
+# Sous SQLite, le réplica est une seconde connexion en lecture au fichier DB_REPLICA_NAME
+# (par défaut le fichier principal) : le routage des lectures est exercé en local et par les tests.
+ACCOUNTING_REPLICA_DATABASE = 'replica'
+ACCOUNTING_REPLICA_STICKY_SECONDS = 5
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES[ACCOUNTING_REPLICA_DATABASE] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif os.environ.get('DB_REPLICA_HOST'):
+    DATABASES[ACCOUNTING_REPLICA_DATABASE] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        # Les tests lisent la base de test principale à la place du réplica
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['accounting.routers.ReplicaRouter']
+
+# Cache des lectures de comptes et de soldes (accounting/cache.py), invalidé par versions.
+# La mémoire locale ne vaut que pour un processus : avec plusieurs workers, utiliser
+# un cache partagé (django.core.cache.backends.redis.RedisCache, FileBasedCache…).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'comptabilite',
     }
 }
+ACCOUNTING_CACHE_TIMEOUT = 300
+
+# Threads du processus web dédiés aux rapports asynchrones (accounting/reports.py).
+# 0 : les rapports sont générés uniquement par `manage.py run_report_worker`.
+ACCOUNTING_REPORT_WORKERS = 2
+# Durée (secondes) au-delà de laquelle un rapport encore en cours est considéré comme abandonné
+ACCOUNTING_REPORT_TIMEOUT = 3600
+
+# Préfixes des codes des comptes de trésorerie pour /api/analytics/cash_flow/ (classe 5 par défaut)
+ACCOUNTING_CASH_PREFIXES = ('5',)
+
+# Répertoire des archives du journal (`manage.py archive_journal`)
+ACCOUNTING_JOURNAL_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archives', 'journal')
+
+# Comptes techniques de la clôture des exercices (accounting/closing.py), créés au besoin :
+# rôle → (code, intitulé, type)
+ACCOUNTING_CLOSING_ACCOUNTS = {
+    'result': ('120', "Résultat de l'exercice", 'Passif'),
+    'closing': ('891', "Bilan de clôture", 'Passif'),
+    'opening': ('890', "Bilan d'ouverture", 'Passif'),
+}
+
+# Listes des comptes, transactions et journal lues par `.values()` et rendues sans les champs
+# DRF (accounting/fastread.py), au même schéma ; rendu JSON par orjson s'il est installé.
+# Facultatif : activé par la variable d'environnement ACCOUNTING_FAST_READS=1.
+ACCOUNTING_FAST_READS = env_flag('ACCOUNTING_FAST_READS', False)
+
+# Instrumentation des requêtes (accounting/metrics.py) : fraction des requêtes mesurées,
+# de 0 (désactivé, middleware retiré de la chaîne) à 1 ; 0.1 par défaut en production.
+# Les mesures sont exposées sur /metrics (Prometheus), avec le jeton
+# `Authorization: Bearer <ACCOUNTING_METRICS_TOKEN>` ou, sans jeton, depuis ACCOUNTING_METRICS_ALLOWED_IPS.
+ACCOUNTING_METRICS_SAMPLE_RATE = float(os.environ.get('ACCOUNTING_METRICS_SAMPLE_RATE', 0.1 if PRODUCTION else 1.0))
+ACCOUNTING_METRICS_TOKEN = ''
+ACCOUNTING_METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Devise fonctionnelle : devise des soldes, de la balance et des montants `amount`. Les transactions
+# saisies dans une autre devise sont converties au taux du jour (ExchangeRate, `manage.py load_exchange_rates`).
+ACCOUNTING_FUNCTIONAL_CURRENCY = 'EUR'
+
+# Authentification JWT (accounting/authentication.py) : utilisateurs résolus gardés en mémoire
+# ACCOUNTING_AUTH_CACHE_TTL secondes (0 : relus à chaque requête), relus dès leur modification.
+# ACCOUNTING_JWT_STATELESS_READS : lectures authentifiées par le jeton seul, sans utilisateur chargé
+# (un compte désactivé garde la lecture jusqu'à l'expiration de son jeton d'accès).
+ACCOUNTING_AUTH_CACHE_TTL = 30
+ACCOUNTING_JWT_STATELESS_READS = False
+# Jetons émis avec la revendication `is_staff` (lue en lecture sans état à la place de l'utilisateur)
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'accounting.authentication.LedgerTokenObtainPairSerializer',
+}
+
+# Durée de conservation (secondes) des clés `Idempotency-Key` des écritures (accounting/idempotency.py) :
+# une nouvelle tentative dans ce délai renvoie la réponse d'origine sans nouvelle comptabilisation.
+# Les clés expirées sont supprimées par `manage.py purge_idempotency_keys`.
+ACCOUNTING_IDEMPOTENCY_TTL = 24 * 3600
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -1,35 +1,48 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-# Définition du schéma de l'API
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Gestion Comptable API",
-        default_version='v1',
-        description="API pour la gestion comptable",
-        terms_of_service="https://www.example.com/terms/",
-        contact=openapi.Contact(email="contact@example.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
-
 urlpatterns = [
-    # Swagger et Redoc pour afficher la documentation de l'API
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-
     # Autres URLs de votre application
     path('', include('accounting.urls')),
-    path('__debug__/', include('debug_toolbar.urls')),
-    path('admin/', admin.site.urls),
 
     # Endpoints pour l'authentification JWT
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
+
+# Barre de debug : uniquement si elle est installée (DEBUG, voir settings)
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    urlpatterns.append(path('__debug__/', include('debug_toolbar.urls')))
+
+# Administration : absente du profil « API seule » (DJANGO_ADMIN=0, voir settings)
+if 'django.contrib.admin' in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+# Swagger et Redoc : uniquement si drf_yasg est installé (DJANGO_API_DOCS, voir settings).
+# Le schéma généré est mis en cache ACCOUNTING_SCHEMA_CACHE_TIMEOUT secondes.
+if 'drf_yasg' in settings.INSTALLED_APPS:
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+
+    schema_view = get_schema_view(
+        openapi.Info(
+            title="Gestion Comptable API",
+            default_version='v1',
+            description="API pour la gestion comptable",
+            terms_of_service="https://www.example.com/terms/",
+            contact=openapi.Contact(email="contact@example.com"),
+            license=openapi.License(name="BSD License"),
+        ),
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+    schema_cache_timeout = settings.ACCOUNTING_SCHEMA_CACHE_TIMEOUT
+    urlpatterns += [
+        path('swagger/', schema_view.with_ui('swagger', cache_timeout=schema_cache_timeout),
+             name='schema-swagger-ui'),
+        path('redoc/', schema_view.with_ui('redoc', cache_timeout=schema_cache_timeout), name='schema-redoc'),
+    ]
@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Account, Transaction, JournalEntry
+from django.contrib import admin, messages
+from .models import (Account, ArchivedTransaction, BalanceSnapshot, ExchangeRate, FiscalYear, IdempotencyKey,
+                     Transaction, JournalEntry, ReconciliationRun, ReportJob, Voucher)
+from .reconcile import reconcile
+from .search import search_transactions
 
 # Configuration de l'affichage du modèle Account dans l'interface d'administration
 @admin.register(Account)
@@ -7,20 +10,146 @@ class AccountAdmin(admin.ModelAdmin):
     list_display = ('code', 'title', 'type', 'balance')  # Colonnes affichées dans la liste
     search_fields = ('code', 'title')  # Champs de recherche
     list_filter = ('type',)  # Filtres disponibles dans la barre latérale
+    actions = ('check_balances', 'repair_balances')
+
+    @admin.action(description="Rapprocher les soldes avec le grand livre")
+    def check_balances(self, request, queryset):
+        self._reconcile(request, queryset, repair=False)
+
+    @admin.action(description="Corriger les soldes d'après le grand livre", permissions=('change',))
+    def repair_balances(self, request, queryset):
+        self._reconcile(request, queryset, repair=True)
+
+    def _reconcile(self, request, queryset, repair):
+        checked, drifts = reconcile(repair=repair, account_ids=queryset.values_list('pk', flat=True))
+        if not drifts:
+            self.message_user(request, f"{checked} comptes vérifiés : aucun écart.", messages.SUCCESS)
+            return
+        details = ', '.join(f"{drift.code} ({drift.stored} → {drift.ledger})" for drift in drifts)
+        if repair:
+            self.message_user(request, f"{len(drifts)} soldes corrigés : {details}", messages.SUCCESS)
+        else:
+            self.message_user(request, f"{len(drifts)} comptes en écart : {details}", messages.WARNING)
 
 # Configuration de l'affichage du modèle Transaction dans l'interface d'administration
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ('date', 'description', 'debit_account', 'credit_account', 'amount', 'user')
+    list_display = ('date', 'description', 'debit_account', 'credit_account', 'amount', 'currency', 'currency_amount',
+                    'user')
     search_fields = ('description', 'debit_account__title', 'credit_account__title')
-    list_filter = ('date', 'user')
+    list_filter = ('date', 'currency', 'user')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Recherche indexée (plein texte et trigrammes sous PostgreSQL) plutôt que des LIKE avec jointures
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return search_transactions(queryset, search_term), False
+
+# Pièces comptables : saisies par l'API (comptabilisation groupée), consultables ici
+@admin.register(Voucher)
+class VoucherAdmin(admin.ModelAdmin):
+    list_display = ('reference', 'kind', 'date', 'description', 'user', 'created_at')
+    search_fields = ('reference', 'description')
+    list_filter = ('kind', 'date')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Exercices : la clôture et l'archivage passent par l'API (/api/fiscal-years/) ou `manage.py close_fiscal_year`
+@admin.register(FiscalYear)
+class FiscalYearAdmin(admin.ModelAdmin):
+    list_display = ('start', 'end', 'status', 'closed_at', 'closed_by')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'closing_voucher', 'opening_voucher', 'closed_at', 'closed_by')
+
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and (obj is None or obj.status == FiscalYear.OPEN)
+
+# Transactions des exercices archivés : consultation seule
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(admin.ModelAdmin):
+    list_display = ('date', 'description', 'debit_account', 'credit_account', 'amount', 'fiscal_year')
+    search_fields = ('description',)
+    list_filter = ('fiscal_year',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
-# Configuration de l'affichage du modèle JournalEntry dans l'interface d'administration
+# Cumuls mensuels par compte : maintenus automatiquement, consultables en lecture seule
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('account', 'period', 'debit', 'credit')
+    list_filter = ('period',)
+    list_select_related = ('account',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Journal en ajout seul : alimenté par la comptabilisation, consultable en lecture seule
 @admin.register(JournalEntry)
 class JournalEntryAdmin(admin.ModelAdmin):
-    list_display = ('transaction', 'created_at', 'user')
-    search_fields = ('transaction__description', 'user__username')
-    list_filter = ('created_at', 'user')
+    list_display = ('transaction_id', 'action', 'date', 'amount', 'created_at', 'user')
+    search_fields = ('description', 'user__username')
+    list_filter = ('action', 'created_at')
+    list_select_related = ('user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+# Passages du rapprochement des soldes (`manage.py reconcile_balances`) : consultation seule
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'finished_at', 'incremental', 'repair', 'accounts_checked', 'drifted')
+    list_filter = ('incremental', 'repair')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Taux de change (`manage.py load_exchange_rates`) : toute modification invalide les tables en mémoire
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'date', 'rate')
+    list_filter = ('currency',)
+    date_hierarchy = 'date'
+
+# Clés d'idempotence des écritures (accounting/idempotency.py) : consultation seule
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'scope', 'user', 'status_code', 'created_at', 'expires_at')
+    list_filter = ('scope',)
+    search_fields = ('key',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
-    # Ajouter des champs en lecture seule dans le formulaire d'édition
-    readonly_fields = ('created_at',)
+# Suivi des rapports asynchrones
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'user', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('fingerprint', 'created_at', 'finished_at')
@@ -0,0 +1,171 @@
+"""
+Analyses calculées côté serveur avec pandas (`/api/analytics/`).
+
+Seules les colonnes utiles du grand livre (date, comptes débité / crédité,
+montant) sont lues, par `values_list` et par blocs, dans des tableaux en
+colonnes : aucun objet `Transaction` n'est instancié, et chaque bloc est
+agrégé avant la lecture du suivant. Les montants sont
+convertis en centimes entiers (`int64`) afin que les agrégats vectorisés
+restent exacts, puis reconvertis en `Decimal` dans les résultats.
+
+Les sens suivent la convention du modèle : le crédit augmente le solde d'un
+compte, le débit le diminue.
+
+Les écritures de clôture et les à-nouveaux (`accounting/closing.py`) sont
+écartés : les analyses portent sur les mouvements réels. Seuls sont gardés
+les à-nouveaux du premier exercice non archivé, qui reportent les soldes des
+exercices archivés.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .models import Account, FiscalYear, Transaction, Voucher
+
+# Nombre de lignes lues par bloc depuis la base
+CHUNK_SIZE = 50000
+
+# Comptes de trésorerie (classe 5 du plan comptable) pour le tableau des flux
+DEFAULT_CASH_PREFIXES = ('5',)
+
+
+def _cents(values):
+    """ Montants `Decimal` → centimes entiers """
+    return np.rint(np.asarray(values, dtype='float64') * 100).astype('int64')
+
+
+def _decimal(cents):
+    """ Centimes entiers → `Decimal` à deux décimales """
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def ledger_chunks(date_from=None, date_to=None, chunk_size=CHUNK_SIZE):
+    """
+    Lit les transactions de `[date_from, date_to]` par blocs de `chunk_size`
+    lignes et produit pour chacun un DataFrame `month`, `debit_account`,
+    `credit_account`, `amount` (centimes).
+    """
+    transactions = Transaction.objects.order_by().exclude(voucher__kind=Voucher.CLOSING)
+    archived_through = FiscalYear.objects.archived_through()
+    openings = {'voucher__kind': Voucher.OPENING}
+    if archived_through is not None:
+        openings['date__gt'] = archived_through + timedelta(days=1)
+    transactions = transactions.exclude(**openings)
+    if date_from is not None:
+        transactions = transactions.filter(date__gte=date_from)
+    if date_to is not None:
+        transactions = transactions.filter(date__lte=date_to)
+    rows = transactions.values_list('date', 'debit_account_id', 'credit_account_id', 'amount').iterator(
+        chunk_size=chunk_size)
+
+    while chunk := list(islice(rows, chunk_size)):
+        dates, debits, credits, amounts = zip(*chunk)
+        yield pd.DataFrame({
+            'month': pd.PeriodIndex(pd.to_datetime(dates), freq='M'),
+            'debit_account': np.asarray(debits, dtype='int64'),
+            'credit_account': np.asarray(credits, dtype='int64'),
+            'amount': _cents(amounts),
+        })
+
+
+def _aggregate(chunks, partial, columns):
+    """
+    Applique `partial` (un groupby → somme) à chaque bloc et additionne les
+    résultats : seul le bloc courant et les sous-totaux restent en mémoire.
+    """
+    partials = [partial(chunk) for chunk in chunks]
+    if not partials:
+        return pd.DataFrame(columns=columns, dtype='int64')
+    totals = pd.concat(partials)
+    return totals.groupby(level=list(range(totals.index.nlevels))).sum()
+
+
+def movements_frame(frame):
+    """ Une ligne par jambe : `month`, `account`, `debit`, `credit` (centimes) """
+    zeros = np.zeros(len(frame), dtype='int64')
+    debit_leg = pd.DataFrame({'month': frame['month'], 'account': frame['debit_account'],
+                              'debit': frame['amount'], 'credit': zeros})
+    credit_leg = pd.DataFrame({'month': frame['month'], 'account': frame['credit_account'],
+                               'debit': zeros, 'credit': frame['amount']})
+    return pd.concat([debit_leg, credit_leg], ignore_index=True)
+
+
+def account_types():
+    """ Série `account_id → type` des comptes """
+    return pd.Series(dict(Account.objects.values_list('id', 'type')), dtype='object')
+
+
+def monthly_pnl(date_from=None, date_to=None):
+    """
+    Compte de résultat mensuel : une ligne `period`, `revenue`, `expenses`,
+    `result` par mois mouvementé (produits = crédits − débits des comptes de
+    produits, charges = débits − crédits des comptes de charges).
+    """
+    types = account_types()
+
+    def partial(chunk):
+        movements = movements_frame(chunk)
+        movements['type'] = movements['account'].map(types)
+        movements = movements[movements['type'].isin(['Produit', 'Charge'])]
+        return movements.groupby(['month', 'type'])[['debit', 'credit']].sum()
+
+    totals = _aggregate(ledger_chunks(date_from, date_to), partial, ['debit', 'credit'])
+    if totals.empty:
+        return
+    net = (totals['credit'] - totals['debit']).unstack(-1, fill_value=0)
+    revenue = net.get('Produit', pd.Series(0, index=net.index))
+    expenses = -net.get('Charge', pd.Series(0, index=net.index))
+    for month, income, spent in zip(net.index, revenue, expenses):
+        yield {'period': month.start_time.date(), 'revenue': _decimal(income), 'expenses': _decimal(spent),
+               'result': _decimal(income - spent)}
+
+
+def balance_sheet(day=None):
+    """
+    Totaux du bilan au `day` inclus : une ligne `type`, `debit`, `credit`,
+    `balance` pour les comptes d'actif et de passif.
+    """
+    types = account_types()
+
+    def partial(chunk):
+        movements = movements_frame(chunk)
+        return movements.groupby(movements['account'].map(types))[['debit', 'credit']].sum()
+
+    totals = _aggregate(ledger_chunks(date_to=day), partial, ['debit', 'credit'])
+    for account_type in ('Actif', 'Passif'):
+        debit, credit = totals.loc[account_type] if account_type in totals.index else (0, 0)
+        yield {'type': account_type, 'debit': _decimal(debit), 'credit': _decimal(credit),
+               'balance': _decimal(credit - debit)}
+
+
+def cash_flow(date_from=None, date_to=None, prefixes=None):
+    """
+    Flux de trésorerie mensuels : une ligne `period`, `inflow`, `outflow`,
+    `net` par mois. Les comptes de trésorerie sont ceux dont le code commence
+    par l'un des préfixes `ACCOUNTING_CASH_PREFIXES` ; les virements entre deux
+    comptes de trésorerie sont ignorés.
+    """
+    if prefixes is None:
+        prefixes = getattr(settings, 'ACCOUNTING_CASH_PREFIXES', DEFAULT_CASH_PREFIXES)
+    codes = pd.Series(dict(Account.objects.values_list('id', 'code')), dtype='object')
+    cash_ids = codes.index[codes.str.startswith(tuple(prefixes))] if len(codes) else []
+
+    def partial(chunk):
+        debit_cash = chunk['debit_account'].isin(cash_ids)
+        credit_cash = chunk['credit_account'].isin(cash_ids)
+        external = debit_cash ^ credit_cash
+        flows = pd.DataFrame({
+            'month': chunk['month'],
+            'inflow': np.where(credit_cash, chunk['amount'], 0),
+            'outflow': np.where(debit_cash, chunk['amount'], 0),
+        })[external]
+        return flows.groupby('month')[['inflow', 'outflow']].sum()
+
+    totals = _aggregate(ledger_chunks(date_from, date_to), partial, ['inflow', 'outflow'])
+    for month, inflow, outflow in zip(totals.index, totals['inflow'], totals['outflow']):
+        yield {'period': month.start_time.date(), 'inflow': _decimal(inflow), 'outflow': _decimal(outflow),
+               'net': _decimal(inflow - outflow)}
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounting'
+
+    def ready(self):
+        from django.conf import settings
+        from .metrics import instrument_serializers
+
+        if getattr(settings, 'ACCOUNTING_METRICS_SAMPLE_RATE', 0) > 0:
+            instrument_serializers()
@@ -0,0 +1,173 @@
+"""
+Vues de lecture asynchrones (`/api/async/…`), servies sans thread par requête
+sous ASGI (`Test/asgi.py`, uvicorn ou daphne).
+
+Les vues DRF restent synchrones : sous ASGI, chacune occupe un thread le temps
+de la requête. Les vues ci-dessous lisent la base par l'ORM asynchrone
+(`aiterator`, `aaggregate`, `async for`) avec les mêmes requêtes que les vues
+synchrones (fonctions `a…` de `balances` et `ledger`), et rendent les mêmes
+schémas JSON :
+
+- `GET /api/async/accounts/` : comptes, paginés par curseur sur le code ;
+- `GET /api/async/accounts/{id}/ledger/` : grand livre avec solde progressif ;
+- `GET /api/async/balance/` : balance comptable ;
+- `GET /api/async/balance/export/` : balance en CSV, envoyée au fil de l'eau
+  par un générateur asynchrone.
+
+L'authentification est celle de l'API (`Authorization: Bearer <jeton JWT>`).
+"""
+import logging
+from datetime import date
+from functools import wraps
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import acached_user
+from .balances import abalance_rows
+from .exports import CSV_CONTENT_TYPE, aiter_balance_csv
+from .fastread import AccountReader
+from .ledger import aledger_page
+from .models import Account
+from .pagination import LedgerPagination
+from .search import code_prefix, search_accounts
+from .serializers import BalancePeriodSerializer, BalanceRowSerializer, LedgerPageSerializer
+
+logger = logging.getLogger(__name__)
+
+
+async def authenticated_user(request):
+    """ Utilisateur actif du jeton `Authorization: Bearer …` (en cache), None si le jeton est absent ou invalide """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = authentication.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        user_id = authentication.get_validated_token(raw_token)[jwt_settings.USER_ID_CLAIM]
+    except (AuthenticationFailed, KeyError):
+        return None
+    user = await acached_user(user_id)
+    return user if user is not None and user.is_active else None
+
+
+def jwt_required(view):
+    """ Refuse (401) les requêtes sans jeton JWT valide ; l'utilisateur est posé sur `request.user` """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await authenticated_user(request)
+        if user is None:
+            return JsonResponse({'detail': "Authentification requise (jeton JWT valide)."}, status=401,
+                                headers={'WWW-Authenticate': 'Bearer realm="api"'})
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _paginator(request):
+    """ Pagination de l'API, pour l'encodage des curseurs (`?cursor=`) """
+    paginator = LedgerPagination()
+    paginator.request = request
+    return paginator
+
+
+def _page_size(request):
+    """ `?page_size=` borné comme dans `LedgerPagination` (taille par défaut si invalide) """
+    try:
+        size = int(request.GET[LedgerPagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return LedgerPagination.page_size
+    return min(size, LedgerPagination.max_page_size) if size > 0 else LedgerPagination.page_size
+
+
+def _period(request):
+    """ Paramètres `date_from` / `date_to` validés, ou `(None, réponse 400)` """
+    params = BalancePeriodSerializer(data=request.GET)
+    if not params.is_valid():
+        return None, JsonResponse(params.errors, status=400)
+    return params.validated_data, None
+
+
+def _not_found(message="Introuvable."):
+    return JsonResponse({'detail': message}, status=404)
+
+
+@require_GET
+@jwt_required
+async def accounts(request):
+    """ Comptes triés par code, filtrables par `code_prefix` et `search`, paginés par curseur """
+    queryset = Account.objects.order_by('code')
+    prefix = request.GET.get('code_prefix', '').strip()
+    if prefix:
+        queryset = queryset.filter(code_prefix(queryset, prefix))
+    terms = request.GET.get('search', '').strip()
+    if terms:
+        queryset = search_accounts(queryset, terms)
+
+    paginator = _paginator(request)
+    try:
+        position = paginator.decode_cursor(request.GET.get(paginator.cursor_query_param))
+    except NotFound:
+        return _not_found(paginator.invalid_cursor_message)
+    if position is not None:
+        if not isinstance(position, list) or len(position) != 1 or not isinstance(position[0], str):
+            return _not_found(paginator.invalid_cursor_message)
+        queryset = queryset.filter(code__gt=position[0])
+
+    size = _page_size(request)
+    rows = [row async for row in queryset.values(*AccountReader.columns)[:size + 1]]
+    next_url = paginator.encode_cursor([rows[size - 1]['code']]) if len(rows) > size else None
+    return JsonResponse({'next': next_url, 'results': AccountReader.rows(rows[:size])})
+
+
+@require_GET
+@jwt_required
+async def account_ledger(request, pk):
+    """ Page du grand livre d'un compte (même schéma que `/api/accounts/{id}/ledger/`) """
+    period, error = _period(request)
+    if error is not None:
+        return error
+    if not await Account.objects.filter(pk=pk).aexists():
+        return _not_found()
+
+    paginator = _paginator(request)
+    after = None
+    try:
+        position = paginator.decode_cursor(request.GET.get(paginator.cursor_query_param))
+        if position is not None:
+            day, transaction_id = position
+            after = (date.fromisoformat(day), int(transaction_id))
+    except (NotFound, TypeError, ValueError):
+        return _not_found(paginator.invalid_cursor_message)
+
+    opening, lines, last = await aledger_page(pk, after=after, limit=_page_size(request), **period)
+    next_url = paginator.encode_cursor([last[0].isoformat(), last[1]]) if last is not None else None
+    return JsonResponse(LedgerPageSerializer({'account': pk, 'opening_balance': opening, 'next': next_url,
+                                              'results': lines}).data)
+
+
+@require_GET
+@jwt_required
+async def balance(request):
+    """ Balance comptable (même schéma que `/api/balance/`) """
+    period, error = _period(request)
+    if error is not None:
+        return error
+    rows = [row async for row in abalance_rows(**period)]
+    return JsonResponse(BalanceRowSerializer(rows, many=True).data, safe=False)
+
+
+@require_GET
+@jwt_required
+async def balance_export(request):
+    """ Balance comptable en CSV, produite et envoyée ligne par ligne par un générateur asynchrone """
+    period, error = _period(request)
+    if error is not None:
+        return error
+    response = StreamingHttpResponse(aiter_balance_csv(abalance_rows(**period)), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = 'attachment; filename=balance_comptable.csv'
+    logger.info("Balance comptable exportée (asynchrone) par %s", request.user)
+    return response
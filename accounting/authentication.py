@@ -0,0 +1,141 @@
+"""
+Authentification JWT sans requête `User` à chaque appel.
+
+`JWTAuthentication` de simplejwt relit l'utilisateur du jeton en base à
+chaque requête. `CachedJWTAuthentication` (classe par défaut de l'API) garde
+les utilisateurs résolus en mémoire du processus pendant
+`ACCOUNTING_AUTH_CACHE_TTL` secondes, avec les mêmes contrôles (compte
+actif, jeton révoqué par changement de mot de passe) :
+
+- la modification, la désactivation ou la suppression d'un utilisateur
+  (signaux `post_save` / `post_delete`) incrémente sa version dans le cache
+  Django (`cache.user_version`), relue à chaque requête : tous les processus
+  qui partagent ce cache relisent l'utilisateur à la requête suivante ;
+- une modification qui ne passe pas par les signaux (`QuerySet.update`) est
+  prise en compte au plus tard à l'expiration de l'entrée.
+
+Avec `ACCOUNTING_JWT_STATELESS_READS`, les requêtes en lecture (GET, HEAD,
+OPTIONS) sont authentifiées par les seules revendications du jeton
+(`TokenUser`, sans base ni cache) ; un utilisateur désactivé garde alors
+l'accès en lecture jusqu'à l'expiration de son jeton d'accès
+(`SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']`). Les écritures chargent toujours
+l'utilisateur. Les jetons émis par /api/token/ (`LedgerTokenObtainPairSerializer`)
+portent `is_staff`, lu par `TokenUser.is_staff` ; un jeton sans cette
+revendication est traité comme celui d'un non-administrateur.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import user_version
+
+# Utilisateurs résolus : {identifiant: (échéance, version, utilisateur)}
+_users = {}
+_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'ACCOUNTING_AUTH_CACHE_TTL', 30)
+
+
+def stateless_reads():
+    return getattr(settings, 'ACCOUNTING_JWT_STATELESS_READS', False)
+
+
+def _cached(user_id):
+    """ Utilisateur en mémoire encore valide (échéance et version), sinon `(None, version courante)` """
+    version = user_version(user_id)
+    with _lock:
+        entry = _users.get(user_id)
+    if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+        # Copie : l'instance partagée entre threads n'est jamais modifiée par une requête
+        return copy.copy(entry[2]), version
+    return None, version
+
+
+def _remember(user_id, version, user):
+    if _ttl() > 0:
+        with _lock:
+            _users[user_id] = (time.monotonic() + _ttl(), version, user)
+    return copy.copy(user)
+
+
+def cached_user(user_id):
+    """ Utilisateur `user_id` (champ `USER_ID_FIELD`), lu en mémoire ou en base ; None s'il n'existe pas """
+    user, version = _cached(user_id)
+    if user is None:
+        user = get_user_model().objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            user = _remember(user_id, version, user)
+    return user
+
+
+async def acached_user(user_id):
+    """ Version asynchrone de `cached_user` """
+    user, version = _cached(user_id)
+    if user is None:
+        user = await get_user_model().objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is not None:
+            user = _remember(user_id, version, user)
+    return user
+
+
+def clear():
+    """ Vide les utilisateurs en mémoire du processus """
+    with _lock:
+        _users.clear()
+
+
+class LedgerTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """ Jetons avec la revendication `is_staff`, pour les lectures authentifiées par le jeton seul """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['is_staff'] = user.is_staff
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """ `JWTAuthentication` avec utilisateurs en cache, ou revendications seules pour les lectures """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if stateless_reads() and request.method in SAFE_METHODS:
+            return TokenUser(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        """ Mêmes contrôles que `JWTAuthentication.get_user`, utilisateur lu par `cached_user` """
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from exc
+
+        user = cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if jwt_settings.CHECK_REVOKE_TOKEN and (validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM)
+                                                != get_md5_hash_password(user.password)):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
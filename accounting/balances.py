@@ -0,0 +1,302 @@
+"""
+Moteur de calcul de la balance comptable.
+
+Les soldes sont calculés à partir du grand livre et non du solde courant
+`Account.balance` : le solde de début de période est la somme des mouvements
+antérieurs à `date_from` (convention du modèle : le crédit augmente le solde,
+le débit le diminue).
+
+Les mois complets sont lus dans les cumuls mensuels `BalanceSnapshot`
+(maintenus par le chemin de comptabilisation) et seule la fin d'un mois
+entamé est lue dans `Transaction` (et `ArchivedTransaction` si elle tombe
+dans un exercice archivé), par une passe groupée sur chaque jambe. Le
+coût d'une balance dépend donc du nombre de comptes et de mois, pas du nombre
+de transactions, et le nombre de requêtes reste constant.
+
+Les exercices clos sont soldés compte par compte par leurs écritures de
+clôture (voir `accounting/closing.py`) : pour une date de la période ouverte,
+seuls les cumuls postérieurs au dernier exercice clos sont lus, à-nouveaux
+compris.
+
+Les fonctions préfixées par `a` (`abalance_rows`, `aaccount_totals`…) sont
+leurs équivalents pour les vues asynchrones (accounting/async_views.py) :
+mêmes requêtes, lues par l'ORM asynchrone.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Account, ArchivedTransaction, BalanceSnapshot, FiscalYear, Transaction, month_start
+
+ZERO = Decimal('0.00')
+
+# Taille des lots lus par curseur côté serveur lors du parcours des comptes
+ACCOUNT_CHUNK_SIZE = 2000
+
+LEGS = ('debit_account', 'credit_account')
+
+# `open_from` non fourni : le début de la période ouverte est lu en base
+UNREAD = object()
+
+
+def _snapshot_rows(before=None, account_id=None, since=None):
+    """ Cumuls `(compte, débit, crédit)` des mois de `[since, before[`, groupés par compte """
+    snapshots = BalanceSnapshot.objects.order_by()
+    if account_id is not None:
+        snapshots = snapshots.filter(account_id=account_id)
+    if since is not None:
+        snapshots = snapshots.filter(period__gte=since)
+    if before is not None:
+        snapshots = snapshots.filter(period__lt=before)
+    return snapshots.values('account').annotate(debit=Sum('debit'), credit=Sum('credit')).values_list(
+        'account', 'debit', 'credit')
+
+
+def _ledger_models(date_from, archived_through):
+    """ Tables du grand livre qui contiennent des transactions datées à partir de `date_from` """
+    if archived_through is not None and date_from <= archived_through:
+        return (ArchivedTransaction, Transaction)
+    return (Transaction,)
+
+
+def _transaction_rows(date_from, date_to, account_id=None, archived_through=None):
+    """
+    Pour chaque table et chaque jambe, `(index, totaux (compte, montant))` des
+    transactions de `[date_from, date_to]`, exercices archivés jusqu'au
+    `archived_through` compris.
+    """
+    for model in _ledger_models(date_from, archived_through):
+        transactions = model.objects.order_by().filter(date__gte=date_from, date__lte=date_to)
+        for index, field in enumerate(LEGS):
+            leg = transactions if account_id is None else transactions.filter(**{field: account_id})
+            yield index, leg.values(field).annotate(total=Sum('amount')).values_list(field, 'total')
+
+
+def _new_totals():
+    return defaultdict(lambda: [ZERO, ZERO])
+
+
+def _snapshot_totals(before=None, totals=None, account_id=None, since=None):
+    """ Ajoute à `totals` les cumuls `[débit, crédit]` par compte des mois de `[since, before[` """
+    totals = totals if totals is not None else _new_totals()
+    for account, debit, credit in _snapshot_rows(before, account_id, since):
+        totals[account][0] += debit or ZERO
+        totals[account][1] += credit or ZERO
+    return totals
+
+
+def _transaction_totals(date_from, date_to, totals, account_id=None, archived_through=None):
+    """ Ajoute à `totals` les débits / crédits par compte des transactions de `[date_from, date_to]` """
+    for index, rows in _transaction_rows(date_from, date_to, account_id, archived_through):
+        for account, total in rows:
+            totals[account][index] += total or ZERO
+    return totals
+
+
+def _cumulative_bounds(day, open_from):
+    """
+    `(since, boundary)` des cumuls jusqu'au `day` : mois complets de
+    `[since, boundary[` lus dans les cumuls, puis queue `[boundary, day]` du
+    mois entamé lue dans le grand livre (si `boundary <= day`).
+    """
+    since = open_from if open_from is not None and (day is None or day >= open_from) else None
+    boundary = month_start(day + timedelta(days=1)) if day is not None else None
+    return since, boundary
+
+
+def _tail_in_open_period(boundary, open_from):
+    # Queue dans la période ouverte : aucune transaction archivée, l'exercice archivé n'est pas relu
+    return open_from is not None and boundary >= open_from
+
+
+def cumulative_totals(day=None, account_id=None, open_from=UNREAD):
+    """
+    Retourne `{account_id: [débit, crédit]}` cumulés jusqu'au `day` inclus
+    (tout l'historique si `day` vaut None), éventuellement pour un seul compte.
+    `open_from` est le premier jour de la période ouverte (lu en base si omis) :
+    les cumuls d'une date de la période ouverte commencent à cette date.
+    """
+    if open_from is UNREAD:
+        open_from = FiscalYear.objects.open_from()
+    since, boundary = _cumulative_bounds(day, open_from)
+    totals = _snapshot_totals(before=boundary, account_id=account_id, since=since)
+    if boundary is not None and boundary <= day:
+        # Mois de `day` entamé : la queue est lue dans le grand livre, archives comprises
+        archived_through = (None if _tail_in_open_period(boundary, open_from)
+                            else FiscalYear.objects.archived_through())
+        _transaction_totals(boundary, day, totals, account_id=account_id, archived_through=archived_through)
+    return totals
+
+
+async def acumulative_totals(day=None, account_id=None, open_from=UNREAD):
+    """ Version asynchrone de `cumulative_totals` (ORM asynchrone) """
+    if open_from is UNREAD:
+        open_from = await FiscalYear.objects.aopen_from()
+    since, boundary = _cumulative_bounds(day, open_from)
+    totals = _new_totals()
+    async for account, debit, credit in _snapshot_rows(boundary, account_id, since):
+        totals[account][0] += debit or ZERO
+        totals[account][1] += credit or ZERO
+    if boundary is not None and boundary <= day:
+        archived_through = (None if _tail_in_open_period(boundary, open_from)
+                            else await FiscalYear.objects.aarchived_through())
+        for index, rows in _transaction_rows(boundary, day, account_id, archived_through):
+            async for account, total in rows:
+                totals[account][index] += total or ZERO
+    return totals
+
+
+def account_balance_at(account_id, day):
+    """ Solde d'un compte à la fin du jour `day` (somme des crédits moins somme des débits) """
+    debit, credit = cumulative_totals(day, account_id=account_id).get(account_id, (ZERO, ZERO))
+    return credit - debit
+
+
+async def aaccount_balance_at(account_id, day):
+    """ Version asynchrone de `account_balance_at` """
+    debit, credit = (await acumulative_totals(day, account_id=account_id)).get(account_id, (ZERO, ZERO))
+    return credit - debit
+
+
+def _period_open_from(date_from, open_from):
+    """ Début de la période ouverte retenu pour une période commençant à `date_from` """
+    if open_from is not None and date_from is not None and date_from < open_from:
+        # Période commençant dans un exercice clos : les deux cumuls portent sur tout l'historique
+        return None
+    return open_from
+
+
+def _reads_opening(date_from, open_from):
+    # Au premier jour de la période ouverte, tous les comptes sont soldés par la clôture
+    return date_from is not None and date_from != open_from
+
+
+def _period_totals(closing, opening):
+    """ `{account_id: (solde_début, débit, crédit)}` à partir des cumuls de fin et de début de période """
+    totals = {}
+    for account_id in closing.keys() | opening.keys():
+        debit_before, credit_before = opening.get(account_id, (ZERO, ZERO))
+        debit, credit = closing.get(account_id, (ZERO, ZERO))
+        totals[account_id] = (credit_before - debit_before, debit - debit_before, credit - credit_before)
+    return totals
+
+
+def account_totals(date_from=None, date_to=None):
+    """
+    Retourne `{account_id: (solde_début, débit, crédit)}` pour les comptes mouvementés.
+
+    `solde_début` cumule les mouvements antérieurs à `date_from`, `débit` et
+    `crédit` ceux de la période `[date_from, date_to]` (bornes optionnelles).
+    Sans `date_from`, la période commence au début de la période ouverte
+    (après le dernier exercice clos, à-nouveaux compris).
+    """
+    open_from = _period_open_from(date_from, FiscalYear.objects.open_from())
+    closing = cumulative_totals(date_to, open_from=open_from)
+    opening = {}
+    if _reads_opening(date_from, open_from):
+        opening = cumulative_totals(date_from - timedelta(days=1), open_from=open_from)
+    return _period_totals(closing, opening)
+
+
+async def aaccount_totals(date_from=None, date_to=None):
+    """ Version asynchrone de `account_totals` """
+    open_from = _period_open_from(date_from, await FiscalYear.objects.aopen_from())
+    closing = await acumulative_totals(date_to, open_from=open_from)
+    opening = {}
+    if _reads_opening(date_from, open_from):
+        opening = await acumulative_totals(date_from - timedelta(days=1), open_from=open_from)
+    return _period_totals(closing, opening)
+
+
+def _balance_row(account_id, code, title, totals):
+    opening, debit, credit = totals.get(account_id, (ZERO, ZERO, ZERO))
+    return {
+        'account_id': account_id,
+        'code': code,
+        'title': title,
+        'opening_balance': opening,
+        'debit': debit,
+        'credit': credit,
+        'closing_balance': opening + credit - debit,
+    }
+
+
+def balance_rows(accounts=None, date_from=None, date_to=None):
+    """
+    Calcule la balance comptable ligne par ligne pour la période demandée.
+
+    Chaque ligne est un dictionnaire `account_id`, `code`, `title`,
+    `opening_balance`, `debit`, `credit`, `closing_balance`. Les comptes sont
+    parcourus par curseur afin que la mémoire reste constante.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+    totals = account_totals(date_from, date_to)
+    accounts = accounts.order_by('code').values_list('pk', 'code', 'title')
+    for account_id, code, title in accounts.iterator(chunk_size=ACCOUNT_CHUNK_SIZE):
+        yield _balance_row(account_id, code, title, totals)
+
+
+async def abalance_rows(accounts=None, date_from=None, date_to=None):
+    """ Version asynchrone de `balance_rows` : générateur asynchrone (`aiterator`) """
+    if accounts is None:
+        accounts = Account.objects.all()
+    totals = await aaccount_totals(date_from, date_to)
+    # `.values()` : `aiterator()` d'un `values_list()` à plusieurs champs exécute la requête hors thread (Django 5.1)
+    accounts = accounts.order_by('code').values('pk', 'code', 'title')
+    async for account in accounts.aiterator(chunk_size=ACCOUNT_CHUNK_SIZE):
+        yield _balance_row(account['pk'], account['code'], account['title'], totals)
+
+
+def account_history(account, date_from=None, date_to=None):
+    """
+    Historique mensuel d'un compte : une ligne `period`, `opening_balance`,
+    `debit`, `credit`, `closing_balance` par mois mouvementé, lue dans les
+    cumuls mensuels (les bornes sont ramenées au mois).
+    """
+    snapshots = BalanceSnapshot.objects.filter(account=account).order_by('period')
+    balance = ZERO
+    if date_from is not None:
+        first = month_start(date_from)
+        before = snapshots.filter(period__lt=first).aggregate(debit=Sum('debit'), credit=Sum('credit'))
+        balance = (before['credit'] or ZERO) - (before['debit'] or ZERO)
+        snapshots = snapshots.filter(period__gte=first)
+    if date_to is not None:
+        snapshots = snapshots.filter(period__lte=month_start(date_to))
+
+    for period, debit, credit in snapshots.values_list('period', 'debit', 'credit'):
+        opening, balance = balance, balance + credit - debit
+        yield {'period': period, 'opening_balance': opening, 'debit': debit, 'credit': credit,
+               'closing_balance': balance}
+
+
+def rebuild_snapshots(batch_size=5000):
+    """
+    Reconstruit tous les cumuls mensuels à partir du grand livre, exercices
+    archivés compris.
+
+    Les comptes sont verrouillés pendant la reconstruction afin qu'aucune
+    comptabilisation concurrente ne soit perdue. Retourne le nombre de cumuls.
+    """
+    with transaction.atomic():
+        list(Account.objects.select_for_update().order_by('pk').values_list('pk', flat=True))
+        totals = defaultdict(lambda: [ZERO, ZERO])
+        for model in (ArchivedTransaction, Transaction):
+            ledger = model.objects.order_by().annotate(period=TruncMonth('date'))
+            for index, field in enumerate(LEGS):
+                rows = ledger.values(field, 'period').annotate(total=Sum('amount')).values_list(field, 'period',
+                                                                                               'total')
+                for account_id, period, total in rows.iterator():
+                    totals[(account_id, period)][index] += total
+
+        BalanceSnapshot.objects.all().delete()
+        BalanceSnapshot.objects.bulk_create(
+            (BalanceSnapshot(account_id=account_id, period=period, debit=debit, credit=credit)
+             for (account_id, period), (debit, credit) in totals.items()),
+            batch_size=batch_size,
+        )
+    return len(totals)
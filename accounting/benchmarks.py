@@ -0,0 +1,463 @@
+"""
+Suite de benchmarks de l'API (`manage.py run_benchmarks`).
+
+Chaque scénario est une requête HTTP rejouée par le client de test de Django
+sur les vraies URLs (authentification forcée, sans JWT). Les durées sont
+mesurées sur `repeat` exécutions après un échauffement ; une exécution
+supplémentaire, hors chronométrage, compte les requêtes SQL et le pic
+mémoire (tracemalloc). Le cache des lectures est vidé avant chaque
+exécution, sauf demande contraire, pour mesurer le calcul et non le cache.
+
+Les résultats sont un dictionnaire sérialisable en JSON, comparable d'une
+version à l'autre (`compare`).
+
+`read_throughput` compare, par nombre de lignes, la lecture des listes par les
+sérializers DRF et par les lecteurs `.values()` (accounting/fastread.py).
+
+`concurrency` simule de nombreux clients simultanés sur un seul worker : vues
+DRF servies en WSGI par un nombre fixe de threads (worker gunicorn `gthread`)
+contre vues asynchrones servies en ASGI par une seule boucle d'événements
+(accounting/async_views.py). Les données doivent être validées en base (les
+threads ont leurs propres connexions).
+
+`auth_overhead` mesure le coût de l'authentification JWT d'une requête :
+utilisateur relu en base (simplejwt), en cache (accounting/authentication.py)
+ou revendications du jeton seules.
+
+`startup` compare les profils de réglages (`DJANGO_ENV`, voir Test/settings.py)
+dans des processus neufs : démarrage d'un worker (application WSGI et
+URLconf), modules importés, et traversée de la chaîne de middlewares par une
+requête refusée avant toute lecture en base.
+"""
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import date
+from itertools import count
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import authentication
+from .fastread import AccountReader, FastJSONRenderer, JournalEntryReader, TransactionReader, read_values
+from .models import Account, JournalEntry, Transaction
+from .serializers import AccountSerializer, JournalEntrySerializer, TransactionSerializer
+
+# Adresse hors INTERNAL_IPS : la barre de debug ne s'active pas pendant les mesures
+CLIENT_ADDRESS = '192.0.2.1'
+
+
+def percentile(values, fraction):
+    """ Percentile par rang le plus proche (`fraction` entre 0 et 1) """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def scenarios(user):
+    """
+    Scénarios `{nom: fonction(client) → réponse}` sur le grand livre existant :
+    listes, filtres, exports, balance et comptabilisation (trois comptes au moins).
+    """
+    accounts = list(Account.objects.order_by('pk').values_list('pk', flat=True)[:3])
+    if len(accounts) < 3:
+        return {}
+    last = Transaction.objects.order_by('-date').values_list('date', flat=True).first() or date.today()
+    # Page du milieu de la liste paginée (100 lignes par page) : coût d'un OFFSET profond
+    middle_page = max(Transaction.objects.count() // 200, 1)
+    postings = count()
+
+    def post_transaction(client):
+        debit, credit = accounts[:2] if next(postings) % 2 else accounts[1::-1]
+        return client.post('/api/transactions/', {'date': last.isoformat(), 'description': "Benchmark",
+                                                  'debit_account': debit, 'credit_account': credit,
+                                                  'amount': '10.00', 'user': user.pk}, format='json')
+
+    def post_voucher(client):
+        return client.post('/api/vouchers/', {'date': last.isoformat(), 'description': "Benchmark", 'lines': [
+            {'account': accounts[0], 'debit': '12.00'},
+            {'account': accounts[1], 'credit': '10.00'},
+            {'account': accounts[2], 'credit': '2.00'},
+        ]}, format='json')
+
+    return {
+        'accounts.list': lambda client: client.get('/api/accounts/'),
+        'transactions.list': lambda client: client.get('/api/transactions/'),
+        'transactions.list.middle_page': lambda client: client.get('/api/transactions/', {'page': middle_page}),
+        'transactions.cursor': lambda client: client.get('/api/transactions/', {'cursor': ''}),
+        'transactions.filter.account': lambda client: client.get('/api/transactions/',
+                                                                 {'debit_account': accounts[0]}),
+        'transactions.filter.date': lambda client: client.get('/api/transactions/', {'date': last.isoformat()}),
+        'journal.list': lambda client: client.get('/api/journal/', {'cursor': ''}),
+        'account.ledger': lambda client: client.get(f'/api/accounts/{accounts[0]}/ledger/', {'cursor': ''}),
+        'balance': lambda client: client.get('/api/balance/'),
+        'export_balance.csv': lambda client: client.get('/api/export-balance/export_balance/',
+                                                        {'file_format': 'csv'}),
+        'export_balance.xlsx': lambda client: client.get('/api/export-balance/export_balance/'),
+        'transactions.post': post_transaction,
+        'vouchers.post': post_voucher,
+    }
+
+
+def _consume(response):
+    """ Lit entièrement une réponse (les exports sont envoyés au fil de l'eau) """
+    if getattr(response, 'streaming', False):
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure(client, request, repeat=20, warmup=2, clear_cache=True):
+    """ Mesure un scénario : percentiles de durée (ms), requêtes SQL et pic mémoire (Ko) """
+    def run():
+        if clear_cache:
+            cache.clear()
+        return _consume(request(client))
+
+    for _ in range(warmup):
+        run()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = run()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        run()
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(durations, 0.50), 3),
+        'p95_ms': round(percentile(durations, 0.95), 3),
+        'mean_ms': round(sum(durations) / len(durations), 3),
+        'max_ms': round(max(durations), 3),
+        'queries': len(queries),
+        'peak_kb': round(peak, 1),
+        'throughput_per_s': round(1000 * len(durations) / sum(durations), 1),
+    }
+
+
+async def _aconsume(response):
+    """ Lit entièrement une réponse du client asynchrone (flux asynchrones compris) """
+    if getattr(response, 'streaming', False):
+        if response.is_async:
+            async for _ in response.streaming_content:
+                pass
+        else:
+            for _ in response.streaming_content:
+                pass
+    return response
+
+
+def _environment():
+    return {
+        'database': connection.vendor,
+        'database_version': '.'.join(map(str, connection.get_database_version())),
+        'django': django.get_version(),
+        'python': platform.python_version(),
+    }
+
+
+def run_suite(user, repeat=20, warmup=2, only=None, clear_cache=True):
+    """ Exécute les scénarios (tous, ou ceux dont le nom commence par un élément de `only`) """
+    client = APIClient(REMOTE_ADDR=CLIENT_ADDRESS)
+    client.force_authenticate(user)
+    # Taille du jeu de données avant les scénarios d'écriture
+    dataset = {'accounts': Account.objects.count(), 'transactions': Transaction.objects.count()}
+    results = {}
+    for name, request in scenarios(user).items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = measure(client, request, repeat=repeat, warmup=warmup, clear_cache=clear_cache)
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'environment': _environment(),
+        'dataset': dataset,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(previous, current, metric='p50_ms'):
+    """ Écarts relatifs `{scénario: (avant, après, variation en %)}` entre deux rapports """
+    deltas = {}
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name, {}).get(metric)
+        after = result[metric]
+        if before:
+            deltas[name] = (before, after, round((after - before) * 100 / before, 1))
+    return deltas
+
+
+def read_throughput(row_counts=(100, 1000, 10000), repeat=5):
+    """
+    Débit (lignes/s) de la lecture et du rendu JSON des listes, sérializers DRF
+    contre lecture rapide : `{liste: {lignes: {'drf': …, 'fast': …, 'speedup': …}}}`.
+    """
+    lists = {
+        'accounts': (Account.objects.order_by('code'), AccountSerializer, AccountReader),
+        'transactions': (Transaction.objects.select_related('debit_account', 'credit_account').order_by('date', 'id'),
+                         TransactionSerializer, TransactionReader),
+        'journal': (JournalEntry.objects.select_related('user').order_by('created_at', 'id'),
+                    JournalEntrySerializer, JournalEntryReader),
+    }
+    results = {}
+    for name, (queryset, serializer_class, reader) in lists.items():
+        results[name] = {}
+        total = queryset.count()
+        for rows in row_counts:
+            returned = min(rows, total)
+            readers = {
+                'drf': lambda: JSONRenderer().render(serializer_class(queryset[:rows], many=True).data),
+                'fast': lambda: FastJSONRenderer().render(reader.rows(read_values(queryset, reader)[:rows])),
+            }
+            measures = {}
+            for mode, read in readers.items():
+                durations = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    read()
+                    durations.append(time.perf_counter() - start)
+                measures[mode] = round(returned / percentile(durations, 0.50)) if returned else 0
+            measures['speedup'] = round(measures['fast'] / measures['drf'], 1) if measures['drf'] else None
+            results[name][rows] = measures
+    return results
+
+
+def concurrency_scenarios():
+    """ Lectures `{nom: (URL WSGI / DRF, URL ASGI / asynchrone)}` sur le grand livre existant """
+    account = Account.objects.order_by('pk').values_list('pk', flat=True).first()
+    if account is None:
+        return {}
+    return {
+        'accounts': ('/api/accounts/?cursor=', '/api/async/accounts/'),
+        'account.ledger': (f'/api/accounts/{account}/ledger/?cursor=', f'/api/async/accounts/{account}/ledger/'),
+        'balance': ('/api/balance/', '/api/async/balance/'),
+        'export_balance.csv': ('/api/export-balance/export_balance/?file_format=csv', '/api/async/balance/export/'),
+    }
+
+
+def _load_summary(latencies, statuses, elapsed):
+    """ Débit et latences vues par les clients (attente du worker comprise), en ms """
+    latencies = [latency * 1000 for latency in latencies]
+    return {
+        'statuses': sorted(set(statuses)),
+        'throughput_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'max_ms': round(max(latencies), 3),
+    }
+
+
+def wsgi_load(url, headers, clients=50, rounds=4, threads=1):
+    """ `clients` clients simultanés, `rounds` requêtes chacun, servis par `threads` threads (WSGI) """
+    worker = threading.Semaphore(threads)
+    latencies, statuses = [], []
+
+    def client_loop():
+        client = Client(REMOTE_ADDR=CLIENT_ADDRESS)
+        try:
+            for _ in range(rounds):
+                start = time.perf_counter()
+                with worker:
+                    response = _consume(client.get(url, headers=headers))
+                latencies.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    loops = [threading.Thread(target=client_loop) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in loops:
+        thread.start()
+    for thread in loops:
+        thread.join()
+    return _load_summary(latencies, statuses, time.perf_counter() - start)
+
+
+async def asgi_load(url, headers, clients=50, rounds=4):
+    """ `clients` clients simultanés, `rounds` requêtes chacun, servis par une boucle d'événements (ASGI) """
+    # En-têtes passés à chaque requête : ceux du constructeur ne sont pas transmis par le client ASGI
+    client = AsyncClient(client=(CLIENT_ADDRESS, 0))
+    latencies, statuses = [], []
+
+    async def client_loop():
+        for _ in range(rounds):
+            start = time.perf_counter()
+            response = await _aconsume(await client.get(url, headers=headers))
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(clients)))
+    return _load_summary(latencies, statuses, time.perf_counter() - start)
+
+
+def concurrency(user, clients=50, rounds=4, threads=1, only=None):
+    """
+    Compare WSGI (vues DRF, `threads` threads) et ASGI (vues asynchrones) sous
+    `clients` clients simultanés. Le cache des réponses est désactivé pour
+    mesurer le calcul.
+    """
+    headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+    # Conditions de production : sans DEBUG ni barre de debug (qui résout un nom d'hôte à chaque requête)
+    middleware = [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')]
+    results = {}
+    with override_settings(ACCOUNTING_CACHE_TIMEOUT=0, DEBUG=False, MIDDLEWARE=middleware):
+        for name, (wsgi_url, asgi_url) in concurrency_scenarios().items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            results[name] = {
+                'wsgi': wsgi_load(wsgi_url, headers, clients=clients, rounds=rounds, threads=threads),
+                'asgi': asyncio.run(asgi_load(asgi_url, headers, clients=clients, rounds=rounds)),
+            }
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'environment': _environment(),
+        'dataset': {'accounts': Account.objects.count(), 'transactions': Transaction.objects.count()},
+        'clients': clients,
+        'rounds': rounds,
+        'threads': threads,
+        'results': results,
+    }
+
+
+def auth_overhead(user, repeat=2000):
+    """
+    Coût de l'authentification d'une requête GET par jeton JWT, par mode :
+    `{mode: {'p50_us', 'p95_us', 'mean_us', 'queries'}}` (requêtes SQL par requête authentifiée).
+    """
+    token = AccessToken.for_user(user)
+    request = Request(APIRequestFactory().get('/api/accounts/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+    modes = {
+        'jwt': (JWTAuthentication, False),
+        'cached': (authentication.CachedJWTAuthentication, False),
+        'stateless_reads': (authentication.CachedJWTAuthentication, True),
+    }
+    results = {}
+    for name, (authentication_class, stateless) in modes.items():
+        with override_settings(ACCOUNTING_JWT_STATELESS_READS=stateless):
+            authentication.clear()
+            authenticator = authentication_class()
+            # Échauffement : premier chargement de l'utilisateur (mis en cache selon le mode)
+            authenticator.authenticate(request)
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                authenticator.authenticate(request)
+                durations.append((time.perf_counter() - start) * 1_000_000)
+            with CaptureQueriesContext(connection) as queries:
+                authenticator.authenticate(request)
+        results[name] = {
+            'p50_us': round(percentile(durations, 0.50), 1),
+            'p95_us': round(percentile(durations, 0.95), 1),
+            'mean_us': round(sum(durations) / len(durations), 1),
+            'queries': len(queries),
+        }
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'environment': _environment(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+# Profils comparés par `startup` : variables d'environnement du processus mesuré
+STARTUP_PROFILES = {
+    'development': {'DJANGO_ENV': 'development'},
+    'production': {'DJANGO_ENV': 'production'},
+    'production-api': {'DJANGO_ENV': 'production', 'DJANGO_ADMIN': '0'},
+}
+
+# Variables des profils remises à leur valeur par défaut dans les processus mesurés
+PROFILE_FLAGS = ('DJANGO_DEBUG', 'DJANGO_ADMIN', 'DJANGO_ADMIN_THEME', 'DJANGO_API_DOCS')
+
+# Modules coûteux dont la présence au démarrage est relevée
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'debug_toolbar', 'jazzmin', 'drf_yasg.views')
+
+# Exécuté dans un processus neuf : démarrage chronométré, puis requêtes sans jeton (401, aucune lecture en base)
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+startup = time.perf_counter() - start
+modules = len(sys.modules)
+from django.conf import settings
+from django.test import Client
+client = Client(HTTP_HOST='localhost', REMOTE_ADDR={address!r})
+status = client.get('/api/accounts/').status_code
+durations = []
+for _ in range({requests}):
+    start = time.perf_counter()
+    client.get('/api/accounts/')
+    durations.append((time.perf_counter() - start) * 1_000_000)
+print(json.dumps({{'startup_s': startup, 'modules': modules, 'status': status,
+                  'heavy_modules': [name for name in {heavy!r} if name in sys.modules],
+                  'middleware': len(settings.MIDDLEWARE), 'apps': len(settings.INSTALLED_APPS),
+                  'durations_us': durations}}))
+"""
+
+
+def _startup_run(variables, requests):
+    """ Un processus neuf avec le profil `variables` : mesures de `STARTUP_SCRIPT` """
+    environment = {name: value for name, value in os.environ.items() if name not in PROFILE_FLAGS}
+    environment.update(variables, DJANGO_ALLOWED_HOSTS='localhost')
+    environment.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'Test.settings'))
+    environment.setdefault('DJANGO_SECRET_KEY', 'benchmark-startup')
+    script = STARTUP_SCRIPT.format(address=CLIENT_ADDRESS, requests=requests, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', script], env=environment, cwd=settings.BASE_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def startup(profiles=None, repeat=5, requests=200):
+    """
+    Démarrage d'un worker par profil de réglages, sur `repeat` processus neufs :
+    `{profil: {'startup_p50_ms', 'startup_min_ms', 'modules', 'heavy_modules', 'apps', 'middleware',
+    'request_p50_us', 'request_p95_us', 'status'}}`.
+    """
+    results = {}
+    for name in profiles or STARTUP_PROFILES:
+        runs = [_startup_run(STARTUP_PROFILES[name], requests) for _ in range(repeat)]
+        startups = [run['startup_s'] * 1000 for run in runs]
+        durations = [duration for run in runs for duration in run['durations_us']]
+        results[name] = {
+            'startup_p50_ms': round(percentile(startups, 0.50), 1),
+            'startup_min_ms': round(min(startups), 1),
+            'modules': runs[-1]['modules'],
+            'heavy_modules': runs[-1]['heavy_modules'],
+            'apps': runs[-1]['apps'],
+            'middleware': runs[-1]['middleware'],
+            'request_p50_us': round(percentile(durations, 0.50), 1) if durations else None,
+            'request_p95_us': round(percentile(durations, 0.95), 1) if durations else None,
+            'status': runs[-1]['status'],
+        }
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'environment': _environment(),
+        'repeat': repeat,
+        'requests': requests,
+        'results': results,
+    }
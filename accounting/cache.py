@@ -0,0 +1,137 @@
+"""
+Cache des lectures de comptes et de soldes, invalidé par versions.
+
+Chaque compte a un numéro de version, et le grand livre a une version
+globale. Les réponses mises en cache et les ETag incluent la version lue :
+toute écriture qui touche un compte (comptabilisation, import, modification
+du compte) incrémente ces versions et rend donc obsolètes les entrées
+concernées, sans les supprimer explicitement. L'incrément est fait
+immédiatement puis à nouveau à la validation de la transaction, pour écarter
+aussi une lecture concurrente qui aurait mis en cache l'état antérieur au
+COMMIT.
+
+Une réponse lue sur le réplica juste après une écriture (délai de
+réplication, voir `accounting/routers.py`) n'est pas mise en cache : elle
+pourrait ne pas refléter la version qu'elle porterait.
+
+Le cache utilisé est le cache Django par défaut (`CACHES['default']`). En
+mémoire locale il ne vaut que pour un seul processus : avec plusieurs
+workers, il faut un cache partagé (Redis, Memcached, fichiers).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import mark_ledger_write, replica_may_lag
+
+LEDGER_VERSION_KEY = 'accounting:version:ledger'
+ACCOUNT_VERSION_KEY = 'accounting:version:account:{}'
+RESPONSE_KEY = 'accounting:response:{}:{}'
+EXCHANGE_RATES_VERSION_KEY = 'accounting:version:exchange-rates'
+USER_VERSION_KEY = 'accounting:version:user:{}'
+
+
+def _timeout():
+    return getattr(settings, 'ACCOUNTING_CACHE_TIMEOUT', 300)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Version initiale horodatée : après une éviction, on ne retombe pas sur une ancienne valeur
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def ledger_version():
+    """ Version globale : change à chaque écriture touchant un compte """
+    return _get_version(LEDGER_VERSION_KEY)
+
+
+def account_version(account_id):
+    """ Version d'un compte : change à chaque écriture touchant ce compte (None si l'identifiant est invalide) """
+    try:
+        account_id = int(account_id)
+    except (TypeError, ValueError):
+        return None
+    return _get_version(ACCOUNT_VERSION_KEY.format(account_id))
+
+
+def invalidate_accounts(account_ids, using=None):
+    """ Incrémente les versions des comptes et du grand livre, immédiatement et à la validation """
+    account_ids = list(account_ids)
+
+    def bump():
+        for account_id in account_ids:
+            _bump(ACCOUNT_VERSION_KEY.format(account_id))
+        _bump(LEDGER_VERSION_KEY)
+
+    bump()
+    transaction.on_commit(bump, using=using)
+    mark_ledger_write()
+
+
+def exchange_rates_version():
+    """ Version des taux de change : change à chaque chargement ou modification d'un taux """
+    return _get_version(EXCHANGE_RATES_VERSION_KEY)
+
+
+def invalidate_exchange_rates(using=None):
+    """ Incrémente la version des taux de change, immédiatement et à la validation """
+    _bump(EXCHANGE_RATES_VERSION_KEY)
+    transaction.on_commit(lambda: _bump(EXCHANGE_RATES_VERSION_KEY), using=using)
+
+
+def user_version(user_id):
+    """ Version d'un utilisateur : change à chaque modification ou suppression de l'utilisateur """
+    return _get_version(USER_VERSION_KEY.format(user_id))
+
+
+def invalidate_user(user_id, using=None):
+    """ Incrémente la version de l'utilisateur, immédiatement et à la validation """
+    key = USER_VERSION_KEY.format(user_id)
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key), using=using)
+
+
+def cached_response(request, version, compute):
+    """
+    Renvoie la réponse de `compute()` mise en cache pour `version`, avec ETag.
+
+    Si le client présente un `If-None-Match` correspondant, une réponse 304
+    est renvoyée sans requête SQL ni sérialisation. Sans version (`None`), la
+    réponse est calculée sans cache, comme une lecture sur un réplica
+    susceptible de retard.
+    """
+    if version is None or replica_may_lag():
+        return compute()
+    digest = hashlib.sha1(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    etag = quote_etag(f"{version}-{digest[:16]}")
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = RESPONSE_KEY.format(digest, version)
+    data = cache.get(key)
+    if data is None:
+        response = compute()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        data = response.data
+        cache.set(key, data, _timeout())
+    return Response(data, headers=headers)
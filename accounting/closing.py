@@ -0,0 +1,143 @@
+"""
+Clôture des exercices comptables et archivage des exercices clos.
+
+La clôture d'un exercice (`close_fiscal_year`), dans une seule transaction de
+base et sous le verrou de tous les comptes :
+
+- solde les comptes de produits et de charges dans le compte de résultat ;
+- solde les comptes de bilan (résultat compris) contre le compte de bilan de
+  clôture, au dernier jour de l'exercice ;
+- les rouvre le lendemain contre le compte de bilan d'ouverture (à-nouveaux) ;
+- verrouille la période : toute comptabilisation datée d'un exercice clos est
+  refusée (`ClosedPeriodError`, contrôlé par `Account.objects.post_movements`).
+
+Chaque compte étant soldé à la fin d'un exercice clos, les soldes de la
+période ouverte ne lisent plus que les cumuls de cette période
+(`balances.cumulative_totals`). Un exercice clos peut ensuite être archivé
+(`archive_fiscal_year`) : ses transactions sont déplacées dans
+`ArchivedTransaction` par un INSERT … SELECT puis un DELETE, sans passer par
+les signaux (les soldes ne changent pas) ; les cumuls mensuels sont conservés.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .balances import cumulative_totals
+from .cache import invalidate_accounts
+from .models import Account, ArchivedTransaction, ClosedPeriodError, FiscalYear, Transaction, Voucher
+from .vouchers import post_pairs
+
+ZERO = Decimal('0.00')
+
+# Comptes techniques de clôture : (code, intitulé, type)
+DEFAULT_CLOSING_ACCOUNTS = {
+    'result': ('120', "Résultat de l'exercice", 'Passif'),
+    'closing': ('891', "Bilan de clôture", 'Passif'),
+    'opening': ('890', "Bilan d'ouverture", 'Passif'),
+}
+
+# Types de comptes soldés dans le résultat
+INCOME_TYPES = ('Produit', 'Charge')
+
+# Colonnes copiées de Transaction vers ArchivedTransaction
+ARCHIVED_COLUMNS = ('id', 'date', 'description', 'debit_account_id', 'credit_account_id', 'amount', 'currency',
+                    'currency_amount', 'user_id', 'voucher_id')
+
+
+def closing_accounts():
+    """ Comptes `(résultat, bilan de clôture, bilan d'ouverture)`, créés au besoin """
+    configured = {**DEFAULT_CLOSING_ACCOUNTS, **getattr(settings, 'ACCOUNTING_CLOSING_ACCOUNTS', {})}
+    accounts = []
+    for role in ('result', 'closing', 'opening'):
+        code, title, account_type = configured[role]
+        account, _ = Account.objects.get_or_create(code=code, defaults={'title': title, 'type': account_type})
+        accounts.append(account)
+    return accounts
+
+
+def settle(account_id, balance, counterpart_id):
+    """ Paire `(débité, crédité, montant)` qui ramène à zéro le solde `balance` (crédit − débit) du compte """
+    if balance > 0:
+        return account_id, counterpart_id, balance
+    return counterpart_id, account_id, -balance
+
+
+def closing_pairs(balances, types, result_id, closing_id, opening_id):
+    """
+    Écritures de clôture et à-nouveaux à partir des soldes `{account_id: solde}`
+    de fin d'exercice. Retourne `(paires de clôture, paires d'ouverture)`.
+    """
+    technical = {closing_id, opening_id}
+    result = balances.get(result_id, ZERO)
+    closing, carried = [], {}
+    for account_id, balance in sorted(balances.items()):
+        if not balance or account_id in technical or account_id == result_id:
+            continue
+        if types[account_id] in INCOME_TYPES:
+            closing.append(settle(account_id, balance, result_id))
+            result += balance
+        else:
+            carried[account_id] = balance
+    if result:
+        carried[result_id] = result
+    closing += [settle(account_id, balance, closing_id) for account_id, balance in sorted(carried.items())]
+    opening = [settle(account_id, -balance, opening_id) for account_id, balance in sorted(carried.items())]
+    return closing, opening
+
+
+def close_fiscal_year(year, user):
+    """ Clôture l'exercice `year` (les exercices antérieurs doivent être clos) et le retourne """
+    with transaction.atomic():
+        year = FiscalYear.objects.select_for_update().get(pk=year.pk)
+        if year.status != FiscalYear.OPEN:
+            raise ClosedPeriodError(f"L'exercice {year} est déjà clos.")
+        if FiscalYear.objects.filter(start__lt=year.start, status=FiscalYear.OPEN).exists():
+            raise ClosedPeriodError("Les exercices antérieurs doivent être clos avant celui-ci.")
+
+        result, closing, opening = closing_accounts()
+        # Tous les comptes verrouillés : aucune comptabilisation concurrente pendant le calcul des soldes
+        types = dict(Account.objects.select_for_update().order_by('pk').values_list('pk', 'type'))
+        balances = {account_id: credit - debit for account_id, (debit, credit) in cumulative_totals(year.end).items()}
+        closing_lines, opening_lines = closing_pairs(balances, types, result.pk, closing.pk, opening.pk)
+
+        if closing_lines:
+            year.closing_voucher = post_pairs(year.end, f"Clôture de l'exercice {year}", closing_lines, user,
+                                              kind=Voucher.CLOSING)
+            year.opening_voucher = post_pairs(year.end + timedelta(days=1), f"À-nouveaux de l'exercice {year}",
+                                              opening_lines, user, kind=Voucher.OPENING)
+        year.status = FiscalYear.CLOSED
+        year.closed_at = timezone.now()
+        year.closed_by = user
+        year.save()
+    return year
+
+
+def archive_fiscal_year(year):
+    """
+    Déplace les transactions datées jusqu'à la fin de l'exercice clos `year`
+    dans `ArchivedTransaction`. Retourne le nombre de transactions déplacées.
+    """
+    with transaction.atomic():
+        year = FiscalYear.objects.select_for_update().get(pk=year.pk)
+        if year.status != FiscalYear.CLOSED:
+            raise ClosedPeriodError(f"Seul un exercice clos peut être archivé ({year}).")
+        # Archivage dans l'ordre : les à-nouveaux du premier exercice non archivé portent tout l'historique archivé
+        if FiscalYear.objects.filter(start__lt=year.start).exclude(status=FiscalYear.ARCHIVED).exists():
+            raise ClosedPeriodError("Les exercices antérieurs doivent être archivés avant celui-ci.")
+
+        quote = connection.ops.quote_name
+        source, target = quote(Transaction._meta.db_table), quote(ArchivedTransaction._meta.db_table)
+        columns = ', '.join(quote(column) for column in ARCHIVED_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {target} ({columns}, {quote('fiscal_year_id')}) "
+                           f"SELECT {columns}, %s FROM {source} WHERE {quote('date')} <= %s", [year.pk, year.end])
+            cursor.execute(f"DELETE FROM {source} WHERE {quote('date')} <= %s", [year.end])
+            moved = cursor.rowcount
+        year.status = FiscalYear.ARCHIVED
+        year.save(update_fields=['status'])
+        # Les grands livres en cache listent encore les transactions déplacées
+        invalidate_accounts(Account.objects.values_list('pk', flat=True))
+    return moved
@@ -0,0 +1,148 @@
+"""
+Montants en devises et taux de change.
+
+Les soldes (`Account.balance`), les cumuls et les montants `amount` des
+transactions sont tenus en devise fonctionnelle (`ACCOUNTING_FUNCTIONAL_CURRENCY`).
+Une transaction saisie dans une autre devise garde sa devise et son montant
+d'origine (`currency`, `currency_amount`) ; `amount` est converti une fois, à
+la comptabilisation, au taux du jour de l'écriture (dernier taux connu à
+cette date). Les soldes et le moteur de balance ne convertissent donc rien.
+
+Les taux (`ExchangeRate`) sont chargés localement (`manage.py
+load_exchange_rates`). Chaque processus garde en mémoire, par devise, les
+taux triés par date et les lit par dichotomie ; les tables sont rechargées
+lorsque la version des taux change (`cache.exchange_rates_version`, incrémentée
+à chaque chargement ou modification d'un taux). Les conversions d'un lot
+(import, balance dans une devise de présentation) sont faites une fois par
+couple (devise, date), pas une fois par ligne.
+"""
+import threading
+from bisect import bisect_right
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.exceptions import ValidationError
+
+from .cache import exchange_rates_version, invalidate_exchange_rates
+from .models import ExchangeRate, functional_currency
+
+CENT = Decimal('0.01')
+ONE = Decimal(1)
+
+# Symboles d'affichage des soldes formatés ; les autres devises sont affichées par leur code
+CURRENCY_SYMBOLS = {
+    'EUR': '€',
+    'USD': '$',
+    'XOF': 'FCFA',
+}
+
+# Colonnes de la balance converties dans une devise de présentation
+BALANCE_AMOUNTS = ('opening_balance', 'debit', 'credit', 'closing_balance')
+
+
+class MissingRateError(ValidationError):
+    """ Aucun taux de la devise à la date demandée (ni avant) """
+
+
+class RateTable:
+    """ Taux d'une devise indexés par date, recherchés par dichotomie """
+
+    def __init__(self, rows):
+        self.dates = [day for day, _ in rows]
+        self.rates = [rate for _, rate in rows]
+
+    def at(self, day):
+        """ Dernier taux connu à la date `day`, None s'il n'y en a pas """
+        index = bisect_right(self.dates, day)
+        return self.rates[index - 1] if index else None
+
+
+_tables = {}
+_tables_version = None
+_lock = threading.Lock()
+
+
+def rate_table(currency):
+    """ Table des taux de `currency`, lue une fois par processus et par version des taux """
+    global _tables_version
+    version = exchange_rates_version()
+    with _lock:
+        if version != _tables_version:
+            _tables.clear()
+            _tables_version = version
+        table = _tables.get(currency)
+    if table is None:
+        table = RateTable(list(ExchangeRate.objects.filter(currency=currency).order_by('date')
+                               .values_list('date', 'rate')))
+        with _lock:
+            if _tables_version == version:
+                _tables[currency] = table
+    return table
+
+
+def exchange_rate(currency, day):
+    """ Valeur d'une unité de `currency` en devise fonctionnelle au jour `day` (1 pour la devise fonctionnelle) """
+    if currency == functional_currency():
+        return ONE
+    rate = rate_table(currency).at(day)
+    if rate is None:
+        raise MissingRateError(f"Aucun taux de change {currency} au {day:%d/%m/%Y}.")
+    return rate
+
+
+def exchange_rates(pairs):
+    """ Taux `{(devise, date): taux}` des couples `pairs`, chacun lu une fois ; les couples sans taux sont absents """
+    rates = {}
+    for currency, day in set(pairs):
+        try:
+            rates[currency, day] = exchange_rate(currency, day)
+        except MissingRateError:
+            pass
+    return rates
+
+
+def convert(amount, rate):
+    """ Montant en devise fonctionnelle, arrondi au centime """
+    return (amount * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def balance_currency(params):
+    """ Devise de présentation (`currency`) et date de conversion (fin de période) de la balance, ou `(None, None)` """
+    currency = params.get('currency')
+    if not currency or currency == functional_currency():
+        return None, None
+    return currency, params.get('date_to') or date.today()
+
+
+def balance_in_currency(rows, params):
+    """
+    Lignes de la balance converties de la devise fonctionnelle vers la devise
+    de présentation des paramètres, au taux de fin de période : un seul taux
+    pour toute la balance. Sans devise de présentation, les lignes sont inchangées.
+    """
+    currency, day = balance_currency(params)
+    if currency is None:
+        yield from rows
+        return
+    rate = exchange_rate(currency, day)
+    for row in rows:
+        yield {**row, **{name: (row[name] / rate).quantize(CENT, rounding=ROUND_HALF_UP) for name in BALANCE_AMOUNTS}}
+
+
+def format_amount(amount, currency=None):
+    """ Montant avec deux décimales, séparateur de milliers et symbole de la devise (fonctionnelle par défaut) """
+    currency = currency or functional_currency()
+    return f"{amount:,.2f} {CURRENCY_SYMBOLS.get(currency, currency)}"
+
+
+def load_rates(rows):
+    """
+    Enregistre des taux `(devise, date, taux)`, en remplaçant ceux déjà chargés
+    pour la même devise et la même date. Retourne le nombre de taux enregistrés.
+    """
+    rates = [ExchangeRate(currency=currency, date=day, rate=rate) for currency, day, rate in rows]
+    ExchangeRate.objects.bulk_create(rates, batch_size=1000, update_conflicts=True,
+                                     unique_fields=['currency', 'date'], update_fields=['rate'])
+    # `bulk_create` n'émet pas de signaux : les tables en mémoire sont invalidées ici
+    invalidate_exchange_rates()
+    return len(rates)
@@ -0,0 +1,56 @@
+"""
+Écriture des exports de la balance comptable.
+
+Les lignes sont produites par le moteur de soldes (`balances.balance_rows`) et
+écrites au fil de l'eau : CSV généré morceau par morceau pour une
+`StreamingHttpResponse` (itérateur synchrone ou asynchrone), XLSX en mode
+`write_only` d'openpyxl (les lignes sont vidées sur disque au lieu d'être
+conservées en mémoire). openpyxl n'est importé qu'au premier export XLSX :
+il ne pèse pas sur le démarrage des workers.
+"""
+import csv
+
+BALANCE_HEADERS = ["Compte", "Intitulé", "Solde début période", "Débit", "Crédit", "Solde fin période"]
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+
+
+def _as_list(row):
+    return [row['code'], row['title'], row['opening_balance'],
+            row['debit'], row['credit'], row['closing_balance']]
+
+
+class _Echo:
+    """ Pseudo-fichier qui renvoie la ligne écrite au lieu de la stocker """
+
+    def write(self, value):
+        return value
+
+
+def iter_balance_csv(rows):
+    """ Génère le CSV de la balance ligne par ligne (séparateur `;` pour Excel FR) """
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff' + writer.writerow(BALANCE_HEADERS)
+    for row in rows:
+        yield writer.writerow(_as_list(row))
+
+
+async def aiter_balance_csv(rows):
+    """ Version asynchrone de `iter_balance_csv`, pour les lignes d'un générateur asynchrone """
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff' + writer.writerow(BALANCE_HEADERS)
+    async for row in rows:
+        yield writer.writerow(_as_list(row))
+
+
+def write_balance_xlsx(rows, fileobj):
+    """ Écrit la balance dans `fileobj` avec un classeur openpyxl en écriture seule """
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Balance Comptable")
+    sheet.append(BALANCE_HEADERS)
+    for row in rows:
+        sheet.append(_as_list(row))
+    workbook.save(fileobj)
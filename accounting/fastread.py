@@ -0,0 +1,143 @@
+"""
+Lecture rapide des listes volumineuses (comptes, transactions, journal).
+
+Les sérializers DRF passent chaque valeur par un objet champ (`to_representation`,
+`source=` résolus attribut par attribut, `SerializerMethodField`) : sur des pages
+de plusieurs milliers de lignes, ce coût domine. Les lecteurs ci-dessous lisent
+les colonnes utiles par `.values()` (jointures comprises) et construisent
+directement les dictionnaires de sortie, au même schéma que les sérializers :
+décimaux en chaînes à deux décimales, dates ISO, horodatages dans le fuseau
+courant.
+
+Le chemin rapide est activé par `ACCOUNTING_FAST_READS` ; le rendu JSON passe
+alors par `orjson` lorsqu'il est installé.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .currency import format_amount
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance facultative
+    orjson = None
+
+
+def _decimal(value):
+    """ Représentation DRF d'un décimal déjà à l'échelle de sa colonne """
+    return None if value is None else f'{value:f}'
+
+
+def _datetime(value, zone):
+    """ Représentation DRF d'un horodatage : ISO 8601 dans le fuseau `zone`, `Z` pour UTC """
+    value = value.astimezone(zone).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class AccountReader:
+    """ Lignes au schéma de `AccountSerializer` """
+    columns = ('id', 'title', 'code', 'type', 'balance')
+
+    @staticmethod
+    def rows(values):
+        return [{
+            'id': row['id'],
+            'title': row['title'],
+            'code': row['code'],
+            'type': row['type'],
+            'balance': _decimal(row['balance']),
+            'formatted_balance': format_amount(row['balance']),
+        } for row in values]
+
+
+class TransactionReader:
+    """ Lignes au schéma de `TransactionSerializer` (intitulés des comptes par jointure) """
+    columns = ('id', 'date', 'description', 'debit_account', 'debit_account__title', 'credit_account',
+               'credit_account__title', 'amount', 'currency', 'currency_amount', 'user', 'voucher')
+
+    @staticmethod
+    def rows(values):
+        return [{
+            'id': row['id'],
+            'date': row['date'].isoformat(),
+            'description': row['description'],
+            'debit_account': row['debit_account'],
+            'debit_account_name': row['debit_account__title'],
+            'credit_account': row['credit_account'],
+            'credit_account_name': row['credit_account__title'],
+            'amount': _decimal(row['amount']),
+            'currency': row['currency'],
+            'currency_amount': _decimal(row['currency_amount']),
+            'user': row['user'],
+            'voucher': row['voucher'],
+        } for row in values]
+
+
+class JournalEntryReader:
+    """ Lignes au schéma de `JournalEntrySerializer` """
+    columns = ('id', 'transaction', 'action', 'date', 'description', 'debit_account', 'credit_account', 'amount',
+               'created_at', 'user', 'user__username')
+
+    @staticmethod
+    def rows(values):
+        zone = timezone.get_current_timezone()
+        return [{
+            'id': row['id'],
+            'transaction': row['transaction'],
+            'action': row['action'],
+            'date': row['date'].isoformat(),
+            'transaction_description': row['description'],
+            'debit_account': row['debit_account'],
+            'credit_account': row['credit_account'],
+            'amount': _decimal(row['amount']),
+            'created_at': _datetime(row['created_at'], zone),
+            'user': row['user'],
+            'user_name': row['user__username'],
+        } for row in values]
+
+
+def read_values(queryset, reader):
+    """ `.values()` du queryset avec les colonnes du lecteur (les clés de tri y figurent) """
+    return queryset.values(*reader.columns)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """ Rendu JSON par `orjson` (même sortie compacte en UTF-8) ; repli sur DRF sans orjson ou avec `indent` """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=JSONEncoder().default)
+
+
+class FastListMixin:
+    """
+    Chemin rapide des listes d'un ViewSet (`fast_reader`), activé par
+    `ACCOUNTING_FAST_READS` : filtres et pagination inchangés, lignes lues par
+    `.values()` et rendues par `FastJSONRenderer`.
+    """
+    fast_reader = None
+
+    def fast_reads(self):
+        return (self.fast_reader is not None and getattr(self, 'action', None) == 'list'
+                and getattr(settings, 'ACCOUNTING_FAST_READS', False))
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.fast_reads():
+            renderers = [FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+                         for renderer in renderers]
+        return renderers
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_reads():
+            return super().list(request, *args, **kwargs)
+        queryset = read_values(self.filter_queryset(self.get_queryset()), self.fast_reader)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.fast_reader.rows(page))
+        return Response(self.fast_reader.rows(queryset))
+
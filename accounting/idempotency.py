@@ -0,0 +1,127 @@
+"""
+Écritures idempotentes : en-tête `Idempotency-Key` sur la saisie des
+transactions, l'import en lot et les pièces.
+
+Une requête d'écriture qui porte une clé enregistre, dans la même transaction
+de base que la comptabilisation, la clé et la réponse renvoyée
+(`IdempotencyKey`, unique par utilisateur). Une nouvelle tentative avec la
+même clé est servie par une lecture de l'index `(utilisateur, clé)` : la
+réponse d'origine est rejouée (en-tête `Idempotent-Replayed: true`) sans
+nouvelle comptabilisation ni verrou sur les comptes.
+
+- Deux tentatives simultanées : l'insertion de la seconde attend la
+  validation de la première (index unique), puis rejoue sa réponse.
+- Une réponse en erreur n'est pas retenue : la requête corrigée peut être
+  renvoyée avec la même clé.
+- La clé réutilisée pour une autre requête (autre endpoint ou autre contenu)
+  est refusée (422).
+- Les clés expirent après `ACCOUNTING_IDEMPOTENCY_TTL` secondes (24 h par
+  défaut) ; `manage.py purge_idempotency_keys` supprime les clés expirées.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'ACCOUNTING_IDEMPOTENCY_TTL', 24 * 3600))
+
+
+def request_fingerprint(request):
+    """ Empreinte SHA-256 du contenu de la requête (données analysées et fichiers joints) """
+    digest = hashlib.sha256()
+    data = request.data
+    if hasattr(data, 'lists'):
+        # Formulaire ou multipart : les fichiers sont lus à part
+        data = {name: values for name, values in data.lists() if name not in request.FILES}
+    digest.update(json.dumps(data, sort_keys=True, default=str).encode('utf-8'))
+    for name, upload in sorted(request.FILES.items()):
+        digest.update(name.encode('utf-8'))
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        upload.seek(0)
+    return digest.hexdigest()
+
+
+def _replay(record, scope, fingerprint):
+    if record.scope != scope or record.fingerprint != fingerprint:
+        return Response({"detail": f"La clé {HEADER} a déjà servi pour une autre requête."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def _lookup(user, key, now):
+    """ Clé enregistrée et encore valide (une clé expirée est supprimée) """
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None and record.expires_at <= now:
+        record.delete()
+        return None
+    return record
+
+
+def idempotent_response(request, scope, compute):
+    """
+    Renvoie la réponse de `compute()` (qui comptabilise) ou, si la clé
+    `Idempotency-Key` de la requête a déjà servi, la réponse d'origine.
+    Sans clé, `compute()` est appelé directement.
+    """
+    key = request.headers.get(HEADER, '').strip()
+    if not key:
+        return compute()
+    if len(key) > KEY_MAX_LENGTH:
+        return Response({"detail": f"La clé {HEADER} dépasse {KEY_MAX_LENGTH} caractères."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    fingerprint = request_fingerprint(request)
+    now = timezone.now()
+    record = _lookup(request.user, key, now)
+    if record is not None:
+        return _replay(record, scope, fingerprint)
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey(user=request.user, key=key, scope=scope, fingerprint=fingerprint,
+                                        status_code=0, response={}, expires_at=now + ttl())
+                record.save(force_insert=True)
+        except IntegrityError:
+            # Tentative concurrente validée entre-temps : sa réponse est rejouée
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is None:
+                return Response({"detail": "Requête concurrente en cours avec la même clé, réessayez."},
+                                status=status.HTTP_409_CONFLICT)
+            return _replay(record, scope, fingerprint)
+
+        response = compute()
+        if not status.is_success(response.status_code):
+            # Échec : ni la clé ni une éventuelle écriture partielle ne sont conservées
+            transaction.set_rollback(True)
+            return response
+        record.status_code = response.status_code
+        record.response = json.loads(JSONRenderer().render(response.data))
+        record.save(update_fields=['status_code', 'response'])
+    return response
+
+
+def purge_expired(batch_size=10_000):
+    """ Supprime les clés expirées par lots ; retourne le nombre de clés supprimées """
+    deleted = 0
+    now = timezone.now()
+    while True:
+        batch = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,165 @@
+"""
+Import en masse de transactions (API `/api/transactions/bulk/` et commande
+`manage.py import_transactions`).
+
+Un lot est validé en entier avant toute écriture, avec les règles de
+`TransactionSerializer` : les champs simples sont validés ligne par ligne par
+les champs du sérializer, les comptes référencés sont vérifiés en une seule
+requête pour tout le lot. Si une ligne est invalide, rien n'est écrit et le
+rapport d'erreurs indique chaque ligne fautive.
+
+Les lignes en devise étrangère (`currency`, `currency_amount`) sont converties
+en devise fonctionnelle avec un taux lu une fois par couple (devise, date)
+du lot.
+
+Un lot valide est inséré par `bulk_create` découpé en paquets, puis les
+variations de solde sont regroupées par compte (et par mois pour les cumuls
+`BalanceSnapshot`) et appliquées une seule fois.
+"""
+import csv
+import io
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.parsers import BaseParser
+
+from .currency import exchange_rates
+from .models import Account, ClosedPeriodError, JournalEntry, Transaction, functional_currency
+from .serializers import TransactionSerializer, apply_exchange_rate, validate_transaction_rules
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Champs validés directement par les champs de TransactionSerializer
+SCALAR_FIELDS = ('date', 'description', 'amount', 'currency', 'currency_amount')
+# Champs facultatifs : une cellule CSV vide vaut un champ absent
+OPTIONAL_FIELDS = ('amount', 'currency', 'currency_amount')
+ACCOUNT_FIELDS = ('debit_account', 'credit_account')
+DOES_NOT_EXIST = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+
+
+class BulkImportError(Exception):
+    """ Lot rejeté : `errors` contient le rapport d'erreurs par ligne """
+
+    def __init__(self, errors):
+        super().__init__("Lot de transactions invalide")
+        self.errors = errors
+
+
+class CSVParser(BaseParser):
+    """ Accepte un corps de requête `text/csv` et le renvoie décodé """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read().decode('utf-8-sig')
+
+
+def read_csv(text):
+    """ Lit un CSV avec en-tête (séparateur `;` ou `,`) en une liste de dictionnaires """
+    first_line = text.split('\n', 1)[0]
+    delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+    return list(csv.DictReader(io.StringIO(text), delimiter=delimiter))
+
+
+def _error_detail(exc):
+    detail = exc.detail
+    if isinstance(detail, dict):
+        return detail
+    return {'non_field_errors': list(detail)}
+
+
+def validate_rows(rows):
+    """
+    Valide un lot de lignes brutes.
+
+    Retourne `(lignes_validées, erreurs)` ; `erreurs` est une liste de
+    `{'row': numéro (à partir de 1), 'errors': {champ: [messages]}}`.
+    """
+    fields = TransactionSerializer().fields
+    account_field = serializers.IntegerField()
+    cleaned, errors = [], []
+
+    for row in rows:
+        data, row_errors = {}, {}
+        if not isinstance(row, dict):
+            cleaned.append(None)
+            errors.append({'non_field_errors': ["Chaque ligne doit être un objet."]})
+            continue
+        for name in SCALAR_FIELDS:
+            value = row.get(name, empty)
+            if name in OPTIONAL_FIELDS and value in ('', None):
+                value = empty
+            try:
+                data[name] = fields[name].run_validation(value)
+            except SkipField:
+                pass
+            except serializers.ValidationError as exc:
+                row_errors[name] = exc.detail
+        for name in ACCOUNT_FIELDS:
+            try:
+                data[name] = account_field.run_validation(row.get(name, empty))
+            except serializers.ValidationError as exc:
+                row_errors[name] = exc.detail
+        cleaned.append(data)
+        errors.append(row_errors)
+
+    # Existence des comptes : une seule requête pour tout le lot
+    referenced = {data[name] for data in cleaned if data for name in ACCOUNT_FIELDS if name in data}
+    existing = set(Account.objects.filter(pk__in=referenced).values_list('pk', flat=True))
+
+    # Taux de change : un par couple (devise, date) du lot
+    for data in cleaned:
+        if data:
+            data.setdefault('currency', functional_currency())
+    rates = exchange_rates((data['currency'], data['date']) for data in cleaned if data and 'date' in data)
+
+    for data, row_errors in zip(cleaned, errors):
+        if data is None:
+            continue
+        for name in ACCOUNT_FIELDS:
+            if name in data and data[name] not in existing:
+                row_errors[name] = [DOES_NOT_EXIST.format(pk_value=data[name])]
+        if not row_errors and (data['currency'], data['date']) not in rates:
+            row_errors['currency'] = [f"Aucun taux de change {data['currency']} au {data['date']:%d/%m/%Y}."]
+        if not row_errors:
+            try:
+                apply_exchange_rate(data, rates[data['currency'], data['date']])
+                validate_transaction_rules(data['debit_account'], data['credit_account'], data['amount'])
+            except serializers.ValidationError as exc:
+                row_errors.update(_error_detail(exc))
+
+    report = [{'row': index, 'errors': row_errors} for index, row_errors in enumerate(errors, start=1) if row_errors]
+    return cleaned, report
+
+
+def import_transactions(rows, user, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importe un lot de transactions en tout-ou-rien.
+
+    Lève `BulkImportError` si le lot est vide ou si une ligne est invalide ;
+    retourne le nombre de transactions créées sinon.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise BulkImportError([{'row': None, 'errors': {
+            'non_field_errors': ["Le lot doit être une liste non vide de transactions."]}}])
+
+    cleaned, report = validate_rows(rows)
+    if report:
+        raise BulkImportError(report)
+
+    objects = [
+        Transaction(date=data['date'], description=data['description'], amount=data['amount'],
+                    currency=data['currency'], currency_amount=data['currency_amount'],
+                    debit_account_id=data['debit_account'], credit_account_id=data['credit_account'], user=user)
+        for data in cleaned
+    ]
+
+    try:
+        with transaction.atomic():
+            for start in range(0, len(objects), chunk_size):
+                Transaction.objects.bulk_create(objects[start:start + chunk_size])
+            # Une seule mise à jour par compte (et par cumul mensuel) pour l'ensemble du lot
+            Account.objects.post_movements(movement for obj in objects for movement in obj.movements())
+            JournalEntry.objects.record(objects, JournalEntry.CREATE, batch_size=chunk_size)
+    except ClosedPeriodError as exc:
+        raise BulkImportError([{'row': None, 'errors': {'date': exc.messages}}])
+    return len(objects)
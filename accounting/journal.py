@@ -0,0 +1,162 @@
+"""
+Stockage du journal : partitions mensuelles et archivage.
+
+Sous PostgreSQL, la table `JournalEntry` est partitionnée par mois (UTC) sur
+`created_at` (migration 0005) : une lecture de `/api/journal/` bornée par
+`created_at` ne parcourt que les partitions concernées, et archiver un mois
+revient à détacher puis supprimer sa partition. Une partition par défaut
+recueille les entrées d'un mois dont la partition n'a pas encore été créée ;
+`manage.py create_journal_partitions` crée les mois à venir et y rapatrie ces
+entrées.
+
+Les autres bases (SQLite en test) gardent une table simple : l'archivage
+supprime alors les lignes archivées.
+
+Les archives sont des fichiers CSV compressés (`journal_AAAA-MM.csv.gz`).
+"""
+import csv
+import gzip
+import os
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.db import connections, models, transaction
+
+from .models import JournalEntry
+
+TABLE = JournalEntry._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+ARCHIVE_FIELDS = ['id', 'transaction_id', 'action', 'date', 'description', 'debit_account_id',
+                  'credit_account_id', 'amount', 'created_at', 'user_id']
+
+# Variable de session qui autorise la maintenance (déplacement de lignes) malgré le déclencheur d'ajout seul
+MAINTENANCE_SETTING = 'accounting.journal_maintenance'
+
+
+def add_months(month, count):
+    """ Premier jour du mois situé `count` mois après `month` """
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """ Bornes UTC `[début, fin)` du mois """
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=timezone.utc)
+    return start, end
+
+
+def partition_name(month):
+    return f"{TABLE}_y{month:%Y}m{month:%m}"
+
+
+def is_partitioned(using='default'):
+    """ La table du journal est-elle partitionnée (PostgreSQL après la migration 0005) ? """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def partitions(using='default'):
+    """ Mois `[date]` des partitions mensuelles existantes, triés """
+    if not is_partitioned(using):
+        return []
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass", [TABLE])
+        names = [name for name, in cursor.fetchall()]
+    prefix = f"{TABLE}_y"
+    return sorted(date(int(name[len(prefix):len(prefix) + 4]), int(name[-2:]), 1)
+                  for name in names if name.startswith(prefix))
+
+
+def create_partition(month, using='default'):
+    """
+    Crée la partition du mois et y déplace les entrées tombées dans la
+    partition par défaut. Sans effet si la partition existe déjà.
+    """
+    connection = connections[using]
+    name = partition_name(month)
+    start, end = month_bounds(month)
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute("SELECT set_config(%s, 'on', true)", [MAINTENANCE_SETTING])
+        cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(f"INSERT INTO {quote(name)} SELECT * FROM {quote(DEFAULT_PARTITION)} "
+                       f"WHERE created_at >= %s AND created_at < %s", [start, end])
+        cursor.execute(f"DELETE FROM {quote(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s",
+                       [start, end])
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)",
+                       [start, end])
+    return True
+
+
+def ensure_partitions(months_ahead=3, today=None, using='default'):
+    """ Crée les partitions du mois courant et des `months_ahead` mois suivants ; retourne les mois créés """
+    if not is_partitioned(using):
+        return []
+    current = (today or date.today()).replace(day=1)
+    return [month for month in (add_months(current, offset) for offset in range(months_ahead + 1))
+            if create_partition(month, using)]
+
+
+def _write_archive(entries, path):
+    """ Écrit les entrées dans un CSV compressé (fichier temporaire renommé en fin d'écriture) """
+    count = 0
+    partial = f"{path}.partial"
+    with gzip.open(partial, 'wt', encoding='utf-8', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(ARCHIVE_FIELDS)
+        for row in entries.values_list(*ARCHIVE_FIELDS).iterator(chunk_size=5000):
+            writer.writerow(row)
+            count += 1
+    os.replace(partial, path)
+    return count
+
+
+def archive_month(month, directory, using='default'):
+    """
+    Archive les entrées d'un mois dans `directory/journal_AAAA-MM.csv.gz` puis
+    les retire de la base (partition détachée et supprimée sous PostgreSQL).
+    Retourne `(chemin, nombre d'entrées)`.
+    """
+    start, end = month_bounds(month)
+    entries = JournalEntry.objects.using(using).filter(created_at__gte=start, created_at__lt=end).order_by('id')
+    path = os.path.join(directory, f"journal_{month:%Y-%m}.csv.gz")
+    os.makedirs(directory, exist_ok=True)
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=using):
+        count = _write_archive(entries, path)
+        if month in partitions(using):
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(partition_name(month))}")
+                cursor.execute(f"DROP TABLE {quote(partition_name(month))}")
+        else:
+            if connection.vendor == 'postgresql':
+                # Entrées restées dans la partition par défaut : levée du déclencheur d'ajout seul
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT set_config(%s, 'on', true)", [MAINTENANCE_SETTING])
+            # L'archivage est la seule suppression permise : on contourne `JournalEntryQuerySet.delete`
+            models.QuerySet.delete(entries)
+    return path, count
+
+
+def archive_before(month, directory=None, using='default'):
+    """ Archive tous les mois antérieurs à `month` ; retourne la liste `(mois, chemin, nombre)` """
+    directory = directory or getattr(settings, 'ACCOUNTING_JOURNAL_ARCHIVE_DIR', 'archives/journal')
+    start, _ = month_bounds(month)
+    months = {value.date().replace(day=1) for value in JournalEntry.objects.using(using).filter(
+        created_at__lt=start).datetimes('created_at', 'month', tzinfo=timezone.utc)}
+    months.update(existing for existing in partitions(using) if existing < month)
+    return [(archived, *archive_month(archived, directory, using)) for archived in sorted(months)]
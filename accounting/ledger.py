@@ -0,0 +1,124 @@
+"""
+Grand livre d'un compte avec solde progressif (`/api/accounts/{id}/ledger/`).
+
+Une page est lue en deux temps :
+
+1. les clés `(date, id)` de la page sont lues sur chaque jambe (débit, crédit)
+   par un parcours ordonné et limité des index (compte, date), puis
+   fusionnées : le coût ne dépend que de la taille de la page, même pour un
+   compte qui a des millions de mouvements ;
+2. les lignes de la page sont relues avec le solde progressif calculé en base
+   par une fonction de fenêtre (`SUM(...) OVER (ORDER BY date, id)`), auquel
+   s'ajoute le solde d'ouverture de la page (cumuls mensuels + queue du mois,
+   voir `balances.account_balance_at`).
+
+`aledger_page` lit la même page par l'ORM asynchrone (accounting/async_views.py).
+"""
+import heapq
+from datetime import timedelta
+
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When, Window
+
+from .balances import ZERO, aaccount_balance_at, account_balance_at
+from .models import Transaction
+from .pagination import keyset_filter
+
+AMOUNT = DecimalField(max_digits=15, decimal_places=2)
+ORDERING = ('date', 'id')
+LEGS = ('debit_account_id', 'credit_account_id')
+SAME_DAY_TOTAL = {'total': Sum(F('credit') - F('debit'), output_field=AMOUNT)}
+
+
+def _movements(account_id):
+    """ Transactions du compte annotées du côté débit / crédit et de la contrepartie """
+    is_debit = Q(debit_account_id=account_id)
+    return Transaction.objects.filter(is_debit | Q(credit_account_id=account_id)).annotate(
+        debit=Case(When(is_debit, then=F('amount')), default=Value(ZERO), output_field=AMOUNT),
+        credit=Case(When(is_debit, then=Value(ZERO)), default=F('amount'), output_field=AMOUNT),
+        counterpart_account=Case(When(is_debit, then=F('credit_account_id')), default=F('debit_account_id')),
+    )
+
+
+def _leg_keys(field, account_id, date_from, date_to, after, limit):
+    """ Clés `(date, id)` d'une jambe : lecture ordonnée et limitée de l'index (compte, date) """
+    leg = Transaction.objects.filter(**{field: account_id})
+    if date_from is not None:
+        leg = leg.filter(date__gte=date_from)
+    if date_to is not None:
+        leg = leg.filter(date__lte=date_to)
+    if after is not None:
+        leg = leg.filter(keyset_filter(ORDERING, after))
+    return leg.order_by(*ORDERING).values_list(*ORDERING)[:limit]
+
+
+def _page_keys(account_id, date_from, date_to, after, limit):
+    """ Clés `(date, id)` de la page : une lecture ordonnée et limitée par jambe, puis fusion """
+    legs = [list(_leg_keys(field, account_id, date_from, date_to, after, limit)) for field in LEGS]
+    return list(heapq.merge(*legs))[:limit]
+
+
+def _same_day(account_id, after):
+    """ Mouvements du jour de la clé `after` jusqu'à cette clé incluse """
+    day, transaction_id = after
+    return _movements(account_id).filter(date=day, id__lte=transaction_id)
+
+
+def _opening_balance(account_id, date_from, after):
+    """ Solde du compte juste avant la première ligne de la page """
+    if after is None:
+        return account_balance_at(account_id, date_from - timedelta(days=1)) if date_from is not None else ZERO
+    balance = account_balance_at(account_id, after[0] - timedelta(days=1))
+    same_day = _same_day(account_id, after).aggregate(**SAME_DAY_TOTAL)
+    return balance + (same_day['total'] or ZERO)
+
+
+def _page_rows(account_id, keys):
+    """ Lignes de la page avec le solde progressif de la page (`running`) calculé en base """
+    return _movements(account_id).filter(pk__in=[pk for _, pk in keys]).annotate(
+        running=Window(Sum(F('credit') - F('debit'), output_field=AMOUNT),
+                       order_by=[F(field).asc() for field in ORDERING]),
+    ).order_by(*ORDERING).values('id', 'date', 'description', 'counterpart_account', 'debit', 'credit', 'running')
+
+
+def _line(row, opening):
+    row['running_balance'] = opening + row.pop('running')
+    return row
+
+
+def ledger_page(account_id, date_from=None, date_to=None, after=None, limit=100):
+    """
+    Retourne `(solde_ouverture, lignes, dernière_clé)` pour une page du grand livre.
+
+    `after` est la clé `(date, id)` de la dernière ligne de la page précédente ;
+    `dernière_clé` vaut None s'il n'y a pas de page suivante.
+    """
+    keys = _page_keys(account_id, date_from, date_to, after, limit + 1)
+    has_next = len(keys) > limit
+    keys = keys[:limit]
+    opening = _opening_balance(account_id, date_from, after)
+    if not keys:
+        return opening, [], None
+    lines = [_line(row, opening) for row in _page_rows(account_id, keys)]
+    return opening, lines, keys[-1] if has_next else None
+
+
+async def aledger_page(account_id, date_from=None, date_to=None, after=None, limit=100):
+    """ Version asynchrone de `ledger_page` (ORM asynchrone) """
+    legs = []
+    for field in LEGS:
+        legs.append([key async for key in _leg_keys(field, account_id, date_from, date_to, after, limit + 1)])
+    keys = list(heapq.merge(*legs))[:limit + 1]
+    has_next = len(keys) > limit
+    keys = keys[:limit]
+
+    if after is None:
+        opening = (await aaccount_balance_at(account_id, date_from - timedelta(days=1)) if date_from is not None
+                   else ZERO)
+    else:
+        opening = await aaccount_balance_at(account_id, after[0] - timedelta(days=1))
+        same_day = await _same_day(account_id, after).aaggregate(**SAME_DAY_TOTAL)
+        opening += same_day['total'] or ZERO
+    if not keys:
+        return opening, [], None
+    lines = [_line(row, opening) async for row in _page_rows(account_id, keys)]
+    return opening, lines, keys[-1] if has_next else None
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.journal import archive_before
+
+
+class Command(BaseCommand):
+    help = "Archive les entrées du journal antérieures à un mois dans des CSV compressés, puis les retire de la base"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help="Premier mois conservé (AAAA-MM)")
+        parser.add_argument('--directory', help="Répertoire des archives (ACCOUNTING_JOURNAL_ARCHIVE_DIR par défaut)")
+
+    def handle(self, *args, **options):
+        try:
+            month = datetime.strptime(options['before'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError("--before attend un mois au format AAAA-MM")
+        archived = archive_before(month, directory=options['directory'])
+        for archived_month, path, count in archived:
+            self.stdout.write(f"{archived_month:%Y-%m} : {count} entrées → {path}")
+        self.stdout.write(self.style.SUCCESS(f"{len(archived)} mois archivés"))
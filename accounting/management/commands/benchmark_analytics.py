@@ -0,0 +1,101 @@
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounting.analytics import balance_sheet, cash_flow, monthly_pnl
+from accounting.models import Account, Transaction
+
+
+class Rollback(Exception):
+    """ Levée en fin de benchmark pour annuler les données générées """
+
+
+class Command(BaseCommand):
+    help = "Compare les analyses vectorisées (pandas) à une boucle sur les objets Transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, nargs='+', default=[10000, 100000],
+                            help="Nombres de transactions à tester")
+        parser.add_argument('--accounts', type=int, default=200, help="Nombre de comptes générés")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'transactions':>12} {'analyse':>14} {'méthode':>8} {'requêtes':>9} "
+                          f"{'durée (ms)':>11} {'pic mém. (Ko)':>14}")
+        for count in options['transactions']:
+            try:
+                with transaction.atomic():
+                    self._seed(count, options['accounts'])
+                    for label, vectorized, loop in (
+                        ('résultat', lambda: list(monthly_pnl()), self._loop_pnl),
+                        ('bilan', lambda: list(balance_sheet()), self._loop_balance_sheet),
+                        ('trésorerie', lambda: list(cash_flow()), self._loop_cash_flow),
+                    ):
+                        self._measure(count, label, 'boucle', loop)
+                        self._measure(count, label, 'pandas', vectorized)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _seed(self, count, accounts):
+        """ Génère des comptes de chaque type et `count` transactions sur deux ans """
+        user = User.objects.create(username='benchmark-analytics')
+        types = [('5', 'Actif'), ('4', 'Passif'), ('7', 'Produit'), ('6', 'Charge')]
+        created = Account.objects.bulk_create(
+            Account(code=f"{types[i % 4][0]}B{i:06d}", title=f"Compte {i}", type=types[i % 4][1])
+            for i in range(accounts)
+        )
+        rng = random.Random(0)
+        Transaction.objects.bulk_create(
+            (Transaction(date=date(2024, 1, 1) + timedelta(days=rng.randrange(730)), description="Benchmark",
+                         amount=Decimal(rng.randrange(100, 100000)) / 100, user=user,
+                         **dict(zip(('debit_account', 'credit_account'), rng.sample(created, 2))))
+             for _ in range(count)),
+            batch_size=5000,
+        )
+
+    def _legs(self):
+        """ Boucle de référence : une instance `Transaction` par ligne, comptes chargés par jointure """
+        for txn in Transaction.objects.select_related('debit_account', 'credit_account').iterator(chunk_size=2000):
+            month = txn.date.replace(day=1)
+            yield month, txn.debit_account, txn.amount, 'debit'
+            yield month, txn.credit_account, txn.amount, 'credit'
+
+    def _loop_pnl(self):
+        totals = defaultdict(lambda: defaultdict(Decimal))
+        for month, account, amount, side in self._legs():
+            if account.type in ('Produit', 'Charge'):
+                totals[month][account.type] += amount if side == 'credit' else -amount
+        return sorted(totals.items())
+
+    def _loop_balance_sheet(self):
+        totals = defaultdict(Decimal)
+        for _, account, amount, side in self._legs():
+            totals[account.type] += amount if side == 'credit' else -amount
+        return totals
+
+    def _loop_cash_flow(self):
+        totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+        for txn in Transaction.objects.select_related('debit_account', 'credit_account').iterator(chunk_size=2000):
+            debit_cash = txn.debit_account.code.startswith('5')
+            credit_cash = txn.credit_account.code.startswith('5')
+            if debit_cash != credit_cash:
+                totals[txn.date.replace(day=1)][0 if credit_cash else 1] += txn.amount
+        return sorted(totals.items())
+
+    def _measure(self, count, label, method, func):
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - start) * 1000
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        self.stdout.write(f"{count:>12} {label:>14} {method:>8} {len(queries):>9} {elapsed:>11.1f} {peak:>14.0f}")
@@ -0,0 +1,32 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.benchmarks import auth_overhead
+
+
+class Command(BaseCommand):
+    help = ("Mesure le coût de l'authentification JWT d'une requête : utilisateur relu en base (simplejwt), "
+            "en cache mémoire ou revendications du jeton seules")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000, help="Authentifications mesurées par mode")
+        parser.add_argument('--user', default='seed-ledger', help="Utilisateur du jeton JWT")
+        parser.add_argument('--output', help="Fichier JSON du rapport")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur introuvable : {options['user']} (voir seed_ledger)")
+        report = auth_overhead(user, repeat=options['repeat'])
+
+        self.stdout.write(f"{'mode':<16} {'p50 µs':>9} {'p95 µs':>9} {'moy. µs':>9} {'requêtes':>9}")
+        for name, result in report['results'].items():
+            self.stdout.write(f"{name:<16} {result['p50_us']:>9} {result['p95_us']:>9} {result['mean_us']:>9} "
+                              f"{result['queries']:>9}")
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(json.dumps(report, indent=2, ensure_ascii=False) + '\n')
+            self.stderr.write(f"Rapport écrit dans {options['output']}")
@@ -0,0 +1,74 @@
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from accounting.balances import balance_rows, rebuild_snapshots
+from accounting.exports import iter_balance_csv
+from accounting.models import Account, Transaction
+
+
+class Rollback(Exception):
+    """ Levée en fin de benchmark pour annuler les données générées """
+
+
+class Command(BaseCommand):
+    help = "Compare le calcul de la balance par compte (ancien) et groupé (moteur de soldes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, nargs='+', default=[10, 100, 1000],
+                            help="Nombres de comptes à tester")
+        parser.add_argument('--transactions-per-account', type=int, default=5,
+                            help="Nombre de transactions générées par compte")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'comptes':>8} {'méthode':>8} {'requêtes':>9} {'durée (ms)':>11} {'pic mém. (Ko)':>14}")
+        for count in options['accounts']:
+            try:
+                with transaction.atomic():
+                    self._seed(count, options['transactions_per_account'])
+                    self._measure(count, 'boucle', self._legacy)
+                    self._measure(count, 'groupé', lambda: list(balance_rows()))
+                    self._measure(count, 'csv', lambda: sum(1 for _ in iter_balance_csv(balance_rows())))
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _seed(self, count, per_account):
+        """ Génère `count` comptes et leurs transactions (données annulées en fin de mesure) """
+        user = User.objects.create(username='benchmark-balance')
+        accounts = Account.objects.bulk_create(
+            Account(code=f"B{i:07d}", title=f"Compte {i}", type='Actif') for i in range(count)
+        )
+        Transaction.objects.bulk_create(
+            Transaction(date=date(2025, 1, 1), description="Benchmark", amount=Decimal('10.00'),
+                        debit_account=accounts[i % count], credit_account=accounts[(i + 1) % count],
+                        user=user)
+            for i in range(count * per_account)
+        )
+        rebuild_snapshots()
+
+    def _legacy(self):
+        """ Ancien calcul : deux agrégats par compte """
+        rows = []
+        for account in Account.objects.all():
+            debits = Transaction.objects.filter(debit_account=account).aggregate(total=Sum('amount'))['total'] or 0
+            credits = Transaction.objects.filter(credit_account=account).aggregate(total=Sum('amount'))['total'] or 0
+            rows.append((account.code, debits, credits))
+        return rows
+
+    def _measure(self, count, label, func):
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - start) * 1000
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        self.stdout.write(f"{count:>8} {label:>8} {len(queries):>9} {elapsed:>11.1f} {peak:>14.0f}")
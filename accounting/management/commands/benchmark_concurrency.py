@@ -0,0 +1,42 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from accounting.benchmarks import concurrency
+
+
+class Command(BaseCommand):
+    help = ("Compare, sous de nombreux clients simultanés sur un seul worker, les lectures WSGI (vues DRF) "
+            "et ASGI (vues asynchrones) sur le grand livre existant (générer d'abord avec seed_ledger)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50, help="Clients simultanés")
+        parser.add_argument('--rounds', type=int, default=4, help="Requêtes successives par client")
+        parser.add_argument('--threads', type=int, default=1, help="Threads du worker WSGI")
+        parser.add_argument('--user', default='seed-ledger', help="Utilisateur du jeton JWT des requêtes")
+        parser.add_argument('--only', nargs='+', help="Préfixes des scénarios à exécuter (ex. balance)")
+        parser.add_argument('--output', help="Fichier JSON du rapport")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur introuvable : {options['user']} (voir seed_ledger)")
+        # Le client de test s'adresse à `testserver`
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            report = concurrency(user, clients=options['clients'], rounds=options['rounds'],
+                                 threads=options['threads'], only=options['only'])
+
+        self.stdout.write(f"{'scénario':<20} {'WSGI req/s':>11} {'ASGI req/s':>11} "
+                          f"{'WSGI p95 ms':>12} {'ASGI p95 ms':>12}")
+        for name, result in report['results'].items():
+            wsgi, asgi = result['wsgi'], result['asgi']
+            self.stdout.write(f"{name:<20} {wsgi['throughput_per_s']:>11} {asgi['throughput_per_s']:>11} "
+                              f"{wsgi['p95_ms']:>12} {asgi['p95_ms']:>12}")
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(json.dumps(report, indent=2, ensure_ascii=False) + '\n')
+            self.stderr.write(f"Rapport écrit dans {options['output']}")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounting.benchmarks import read_throughput
+from accounting.seeding import seed_ledger
+
+
+class Rollback(Exception):
+    """ Levée en fin de benchmark pour annuler les données générées """
+
+
+class Command(BaseCommand):
+    help = ("Compare le débit (lignes/s) des listes comptes / transactions / journal : "
+            "sérializers DRF contre lecture rapide (.values() + orjson)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000],
+                            help="Nombres de lignes à tester")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions par mesure")
+
+    def handle(self, *args, **options):
+        rows = max(options['rows'])
+        self.stdout.write(f"{'liste':>14} {'lignes':>8} {'DRF (l/s)':>12} {'rapide (l/s)':>13} {'gain':>6}")
+        try:
+            with transaction.atomic():
+                seed_ledger(accounts=rows, transactions=rows, username='benchmark-fast-reads')
+                for name, measures in read_throughput(options['rows'], options['repeat']).items():
+                    for count, result in measures.items():
+                        self.stdout.write(f"{name:>14} {count:>8} {result['drf']:>12} {result['fast']:>13} "
+                                          f"{result['speedup']:>5}x")
+                raise Rollback
+        except Rollback:
+            pass
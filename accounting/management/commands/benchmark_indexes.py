@@ -0,0 +1,108 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from accounting.models import Account, Transaction
+
+# Index du grand livre créés par la migration 0002_ledger_indexes
+LEDGER_INDEXES = [index.name for index in Transaction._meta.indexes] + ['txn_date_idx']
+
+
+class Rollback(Exception):
+    """ Levée en fin de benchmark pour annuler les données et la suppression des index """
+
+
+class Command(BaseCommand):
+    help = ("Génère N transactions et compare plans d'exécution (EXPLAIN) et durées "
+            "des requêtes du grand livre avec et sans les index dédiés")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=100_000, help="Nombre de transactions générées")
+        parser.add_argument('--accounts', type=int, default=200, help="Nombre de comptes générés")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions par requête")
+        parser.add_argument('--explain', action='store_true', help="Afficher les plans d'exécution complets")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                accounts = self._seed(options['transactions'], options['accounts'])
+                queries = self._queries(accounts)
+                self.stdout.write(self.style.MIGRATE_HEADING("Avec index"))
+                self._run(queries, options, "avec index")
+                self._drop_indexes()
+                self.stdout.write(self.style.MIGRATE_HEADING("Sans index"))
+                self._run(queries, options, "sans index")
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, count, account_count):
+        self.stdout.write(f"Génération de {count} transactions sur {account_count} comptes…")
+        user = User.objects.create(username='benchmark-indexes')
+        accounts = Account.objects.bulk_create(
+            Account(code=f"I{i:07d}", title=f"Compte {i}", type='Actif') for i in range(account_count)
+        )
+        rng = random.Random(42)
+        start = date(2020, 1, 1)
+        batch = []
+        for i in range(count):
+            debit, credit = rng.sample(accounts, 2)
+            # Dates croissantes, comme un grand livre alimenté au fil de l'eau
+            batch.append(Transaction(date=start + timedelta(days=i * 1825 // count), description="Benchmark",
+                                     amount=Decimal(rng.randint(100, 100_000)) / 100,
+                                     debit_account=debit, credit_account=credit, user=user))
+            if len(batch) == 5000:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        Transaction.objects.bulk_create(batch)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE accounting_transaction')
+        return accounts
+
+    def _queries(self, accounts):
+        account = accounts[len(accounts) // 2]
+        period = (date(2022, 1, 1), date(2022, 3, 31))
+        return {
+            "filtre date": lambda: Transaction.objects.filter(date=date(2022, 6, 15)),
+            "filtre période": lambda: Transaction.objects.filter(date__range=period),
+            "filtre compte débit": lambda: Transaction.objects.filter(debit_account=account),
+            "compte + période": lambda: Transaction.objects.filter(credit_account=account, date__range=period),
+            "somme par compte": lambda: Transaction.objects.order_by().filter(date__lte=period[1])
+                                                           .values('debit_account').annotate(total=Sum('amount')),
+        }
+
+    def _explain(self, queryset, tag):
+        """
+        EXPLAIN (ANALYZE sous PostgreSQL) de la requête. Un commentaire propre à
+        chaque passe évite que SQLite ne réutilise un plan préparé avant la
+        suppression des index.
+        """
+        options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix(**options)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql} /* {tag} */", params)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+    def _run(self, queries, options, tag):
+        for label, build in queries.items():
+            durations = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(build())
+                durations.append((time.perf_counter() - start) * 1000)
+            plan = self._explain(build(), tag)
+            self.stdout.write(f"{label:<22} médiane {sorted(durations)[len(durations) // 2]:>9.2f} ms")
+            self.stdout.write(plan if options['explain'] else f"    {plan.splitlines()[0]}")
+
+    def _drop_indexes(self):
+        with connection.cursor() as cursor:
+            for name in LEDGER_INDEXES:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
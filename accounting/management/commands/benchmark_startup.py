@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.benchmarks import STARTUP_PROFILES, startup
+
+
+class Command(BaseCommand):
+    help = ("Compare les profils de réglages (DJANGO_ENV) dans des processus neufs : démarrage d'un worker, "
+            "modules importés et coût de la chaîne de middlewares par requête")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=list(STARTUP_PROFILES),
+                            help=f"Profils mesurés ({', '.join(STARTUP_PROFILES)})")
+        parser.add_argument('--repeat', type=int, default=5, help="Processus démarrés par profil")
+        parser.add_argument('--requests', type=int, default=200, help="Requêtes mesurées par processus")
+        parser.add_argument('--output', help="Fichier JSON du rapport")
+
+    def handle(self, *args, **options):
+        unknown = set(options['profiles']) - set(STARTUP_PROFILES)
+        if unknown:
+            raise CommandError(f"Profils inconnus : {', '.join(sorted(unknown))}")
+        report = startup(options['profiles'], repeat=options['repeat'], requests=options['requests'])
+
+        self.stdout.write(f"{'profil':<16} {'démarrage ms':>13} {'min ms':>8} {'modules':>8} {'apps':>5} "
+                          f"{'middlewares':>12} {'req. p50 µs':>12} {'req. p95 µs':>12}  modules lourds")
+        for name, result in report['results'].items():
+            self.stdout.write(f"{name:<16} {result['startup_p50_ms']:>13} {result['startup_min_ms']:>8} "
+                              f"{result['modules']:>8} {result['apps']:>5} {result['middleware']:>12} "
+                              f"{result['request_p50_us']:>12} {result['request_p95_us']:>12}  "
+                              f"{', '.join(result['heavy_modules']) or '-'}")
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(json.dumps(report, indent=2, ensure_ascii=False) + '\n')
+            self.stderr.write(f"Rapport écrit dans {options['output']}")
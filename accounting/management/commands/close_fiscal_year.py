@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.closing import archive_fiscal_year, close_fiscal_year
+from accounting.models import ClosedPeriodError, FiscalYear
+
+
+class Command(BaseCommand):
+    help = ("Clôture l'exercice qui commence à --start (écritures de clôture et à-nouveaux, période verrouillée), "
+            "et l'archive éventuellement")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help="Premier jour de l'exercice (AAAA-MM-JJ)")
+        parser.add_argument('--user', required=True, help="Nom de l'utilisateur auteur des écritures de clôture")
+        parser.add_argument('--archive', action='store_true',
+                            help="Déplacer ensuite les transactions de l'exercice dans la table d'archive")
+
+    def handle(self, *args, **options):
+        try:
+            year = FiscalYear.objects.get(start=date.fromisoformat(options['start']))
+            user = User.objects.get(username=options['user'])
+        except ValueError:
+            raise CommandError("--start attend une date au format AAAA-MM-JJ")
+        except (FiscalYear.DoesNotExist, User.DoesNotExist) as exc:
+            raise CommandError(str(exc))
+        try:
+            if year.status == FiscalYear.OPEN:
+                year = close_fiscal_year(year, user)
+                self.stdout.write(f"Exercice {year} clôturé")
+            if options['archive']:
+                moved = archive_fiscal_year(year)
+                self.stdout.write(f"{moved} transactions archivées")
+        except ClosedPeriodError as exc:
+            raise CommandError(exc.messages[0])
+        self.stdout.write(self.style.SUCCESS(f"Exercice {year} : terminé"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from accounting.journal import ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = "Crée les partitions mensuelles du journal pour le mois courant et les mois à venir (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help="Nombre de mois à venir à préparer")
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write("Le journal n'est pas partitionné sur cette base : rien à faire")
+            return
+        created = ensure_partitions(months_ahead=options['months_ahead'])
+        for month in created:
+            self.stdout.write(f"Partition {month:%Y-%m} créée")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions créées"))
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.imports import DEFAULT_CHUNK_SIZE, BulkImportError, import_transactions, read_csv
+
+
+class Command(BaseCommand):
+    help = "Importe un lot de transactions depuis un fichier JSON ou CSV (tout-ou-rien)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer (.json ou .csv)")
+        parser.add_argument('--user', required=True, help="Nom de l'utilisateur auteur des transactions")
+        parser.add_argument('--format', choices=['json', 'csv'],
+                            help="Format du fichier (déduit de l'extension par défaut)")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Nombre de lignes par INSERT groupé")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur inconnu : {options['user']}")
+
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        content = path.read_text(encoding='utf-8-sig')
+        if file_format == 'json':
+            rows = json.loads(content)
+            if isinstance(rows, dict):
+                rows = rows.get('transactions')
+        elif file_format == 'csv':
+            rows = read_csv(content)
+        else:
+            raise CommandError("Format non reconnu : utilisez --format json ou --format csv")
+
+        try:
+            created = import_transactions(rows, user, chunk_size=options['chunk_size'])
+        except BulkImportError as exc:
+            for error in exc.errors:
+                self.stderr.write(f"Ligne {error['row']} : {json.dumps(error['errors'], ensure_ascii=False)}")
+            raise CommandError("Import annulé : aucune transaction n'a été enregistrée.")
+
+        self.stdout.write(self.style.SUCCESS(f"{created} transactions importées"))
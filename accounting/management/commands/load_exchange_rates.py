@@ -0,0 +1,32 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.currency import load_rates
+from accounting.imports import read_csv
+
+
+class Command(BaseCommand):
+    help = ("Charge des taux de change depuis un CSV `currency;date;rate` (valeur d'une unité de la devise "
+            "en devise fonctionnelle) ; les taux déjà chargés pour la même date sont remplacés")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier CSV des taux (en-tête currency;date;rate)")
+
+    def handle(self, *args, **options):
+        content = Path(options['path']).read_text(encoding='utf-8-sig')
+        rates = []
+        for line, row in enumerate(read_csv(content), start=2):
+            try:
+                currency = row['currency'].strip().upper()
+                day = date.fromisoformat(row['date'].strip())
+                rate = Decimal(row['rate'].strip().replace(',', '.'))
+            except (KeyError, AttributeError, ValueError, InvalidOperation):
+                raise CommandError(f"Ligne {line} invalide : colonnes currency;date (AAAA-MM-JJ);rate attendues")
+            if len(currency) != 3 or not currency.isalpha() or rate <= 0:
+                raise CommandError(f"Ligne {line} invalide : devise sur trois lettres et taux positif attendus")
+            rates.append((currency, day, rate))
+        loaded = load_rates(rates)
+        self.stdout.write(self.style.SUCCESS(f"{loaded} taux de change chargés"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounting.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence expirées (ACCOUNTING_IDEMPOTENCY_TTL), par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10_000, help="Clés supprimées par requête")
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} clés d'idempotence expirées supprimées"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounting.balances import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les cumuls mensuels par compte (BalanceSnapshot) à partir du grand livre"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Nombre de cumuls par INSERT groupé")
+
+    def handle(self, *args, **options):
+        count = rebuild_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{count} cumuls mensuels reconstruits"))
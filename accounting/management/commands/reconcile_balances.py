@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.reconcile import DEFAULT_CHUNK_SIZE, reconcile
+
+
+class Command(BaseCommand):
+    help = ("Rapproche les soldes des comptes avec le grand livre (écarts signalés, "
+            "et corrigés avec --repair)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Corriger les soldes en écart")
+        parser.add_argument('--incremental', action='store_true',
+                            help="Ne vérifier que les comptes mouvementés depuis le dernier passage")
+        parser.add_argument('--workers', type=int, default=1, help="Plages de comptes traitées en parallèle")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Comptes par plage")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--workers et --chunk-size attendent un entier positif")
+        checked, drifts = reconcile(repair=options['repair'], incremental=options['incremental'],
+                                    chunk_size=options['chunk_size'], workers=options['workers'])
+        if drifts:
+            self.stdout.write(f"{'Compte':<12}{'Stocké':>18}{'Grand livre':>18}{'Écart':>18}")
+            for drift in drifts:
+                self.stdout.write(f"{drift.code:<12}{drift.stored:>18}{drift.ledger:>18}{drift.difference:>18}")
+        summary = f"{checked} comptes vérifiés, {len(drifts)} en écart"
+        if drifts and options['repair']:
+            summary += " (corrigés)"
+        style = self.style.WARNING if drifts and not options['repair'] else self.style.SUCCESS
+        self.stdout.write(style(summary))
@@ -0,0 +1,63 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from accounting.benchmarks import compare, run_suite
+from accounting.seeding import seed_ledger
+
+
+class Rollback(Exception):
+    """ Levée en fin de benchmark pour annuler les données générées et les écritures mesurées """
+
+
+class Command(BaseCommand):
+    help = ("Mesure les endpoints (listes, filtres, exports, comptabilisation) et produit un rapport JSON : "
+            "p50 / p95 des durées, requêtes SQL et pic mémoire. La base utilisée est celle des réglages.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=200, help="Nombre de comptes générés")
+        parser.add_argument('--transactions', type=int, default=50_000, help="Nombre de transactions générées")
+        parser.add_argument('--existing', action='store_true',
+                            help="Mesurer le grand livre existant (par ex. généré par seed_ledger) sans générer")
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre d'exécutions chronométrées par scénario")
+        parser.add_argument('--warmup', type=int, default=2, help="Nombre d'exécutions d'échauffement")
+        parser.add_argument('--only', nargs='+', help="Préfixes des scénarios à exécuter (ex. transactions balance)")
+        parser.add_argument('--warm-cache', action='store_true', help="Ne pas vider le cache entre les exécutions")
+        parser.add_argument('--output', help="Fichier JSON du rapport (sortie standard par défaut)")
+        parser.add_argument('--compare', help="Rapport JSON précédent à comparer (variation du p50)")
+
+    def handle(self, *args, **options):
+        # Le client de test s'adresse à `testserver`
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                with transaction.atomic():
+                    if not options['existing']:
+                        self.stderr.write(f"Génération de {options['transactions']} transactions "
+                                          f"sur {options['accounts']} comptes…")
+                        seed_ledger(accounts=options['accounts'], transactions=options['transactions'],
+                                    username='benchmark-suite')
+                    user, _ = User.objects.get_or_create(username='benchmark-suite')
+                    report = run_suite(user, repeat=options['repeat'], warmup=options['warmup'],
+                                       only=options['only'], clear_cache=not options['warm_cache'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+        payload = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(payload + '\n')
+            self.stderr.write(f"Rapport écrit dans {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous:
+                deltas = compare(json.load(previous), report)
+            self.stderr.write(f"{'scénario':<32} {'p50 avant':>10} {'p50 après':>10} {'écart':>8}")
+            for name, (before, after, change) in deltas.items():
+                self.stderr.write(f"{name:<32} {before:>10.2f} {after:>10.2f} {change:>+7.1f}%")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounting.reports import run_pending
+
+
+class Command(BaseCommand):
+    help = "Exécute les rapports asynchrones en attente (file d'attente en base, sans courtier externe)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Traiter les travaux en attente puis s'arrêter")
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="Délai en secondes entre deux scrutations de la file")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            processed = run_pending()
+            if processed:
+                self.stdout.write(f"{processed} rapport(s) généré(s)")
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
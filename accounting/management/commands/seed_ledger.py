@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from accounting.seeding import seed_ledger
+
+
+class Command(BaseCommand):
+    help = "Génère des comptes et des transactions de test par insertions groupées (soldes, cumuls et journal inclus)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=200, help="Nombre de comptes générés")
+        parser.add_argument('--transactions', type=int, default=100_000, help="Nombre de transactions générées")
+        parser.add_argument('--start', type=date.fromisoformat, default=date(2024, 1, 1),
+                            help="Date de la première transaction (AAAA-MM-JJ)")
+        parser.add_argument('--days', type=int, default=730, help="Nombre de jours couverts")
+        parser.add_argument('--seed', type=int, default=42, help="Graine du générateur aléatoire")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Nombre de lignes par INSERT groupé")
+        parser.add_argument('--no-journal', action='store_true', help="Ne pas alimenter le journal")
+
+    def handle(self, *args, **options):
+        accounts, count = seed_ledger(accounts=options['accounts'], transactions=options['transactions'],
+                                      start=options['start'], days=options['days'], seed=options['seed'],
+                                      batch_size=options['batch_size'], journal=not options['no_journal'])
+        self.stdout.write(self.style.SUCCESS(f"{len(accounts)} comptes et {count} transactions générés"))
@@ -0,0 +1,253 @@
+"""
+Instrumentation des requêtes et exposition au format Prometheus (`/metrics`).
+
+`MetricsMiddleware` mesure, pour une fraction des requêtes
+(`ACCOUNTING_METRICS_SAMPLE_RATE`, de 0 à 1) :
+
+- la durée de la requête (histogramme par méthode, vue et statut) ;
+- le nombre de requêtes SQL (histogramme) et leur durée cumulée, par un
+  `execute_wrapper` posé sur les connexions le temps de la requête ;
+- le temps passé dans la sérialisation DRF (`serializer.data`).
+
+À 0, le middleware se retire de la chaîne au démarrage (`MiddlewareNotUsed`).
+Sous ASGI, le middleware est asynchrone (pas de passage par un thread) ;
+les requêtes SQL de l'ORM asynchrone s'exécutent alors dans un thread
+partagé entre les requêtes et ne peuvent pas leur être attribuées : seules
+la durée et la sérialisation sont mesurées.
+Les compteurs sont tenus en mémoire, par processus : avec plusieurs workers,
+chaque processus expose ses propres valeurs.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Mesures de la requête échantillonnée en cours (None hors échantillon)
+_current = ContextVar('accounting_request_metrics', default=None)
+# Sérialisation déjà chronométrée : les `.data` imbriqués sont comptés dans celui qui les appelle
+_serializing = ContextVar('accounting_serializing', default=False)
+
+
+class RequestMetrics:
+    """ Mesures accumulées pendant une requête échantillonnée (`sql=False` : requêtes SQL non mesurées) """
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds')
+
+    def __init__(self, sql=True):
+        self.queries = 0 if sql else None
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """ `execute_wrapper` : compte et chronomètre chaque requête SQL """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """ Couples `(borne, effectif cumulé)`, la dernière borne étant `+Inf` """
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(**labels):
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for value in labels.values())
+    return ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+
+
+class Registry:
+    """ Compteurs et histogrammes du processus, protégés par un verrou """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.latency = {}
+        self.queries = {}
+        self.db_seconds = {}
+        self.serializer_seconds = {}
+
+    def record(self, method, view, status, seconds, measures):
+        with self.lock:
+            self.latency.setdefault((method, view, status), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            if measures.queries is not None:
+                self.queries.setdefault((method, view), Histogram(QUERY_BUCKETS)).observe(measures.queries)
+                self.db_seconds[(method, view)] = self.db_seconds.get((method, view), 0.0) + measures.db_seconds
+            self.serializer_seconds[(method, view)] = (self.serializer_seconds.get((method, view), 0.0)
+                                                       + measures.serializer_seconds)
+
+    def render(self):
+        """ Exposition au format texte Prometheus 0.0.4 """
+        lines = []
+        with self.lock:
+            self._histograms(lines, 'accounting_http_request_duration_seconds',
+                             "Durée des requêtes HTTP échantillonnées", self.latency, ('method', 'view', 'status'))
+            self._histograms(lines, 'accounting_db_queries_per_request',
+                             "Nombre de requêtes SQL par requête HTTP échantillonnée", self.queries, ('method', 'view'))
+            self._counters(lines, 'accounting_db_query_duration_seconds_total',
+                           "Durée cumulée des requêtes SQL", self.db_seconds)
+            self._counters(lines, 'accounting_serializer_duration_seconds_total',
+                           "Durée cumulée de la sérialisation DRF", self.serializer_seconds)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histograms(lines, name, help_text, histograms, label_names):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, histogram in sorted(histograms.items()):
+            labels = _labels(**dict(zip(label_names, key)))
+            for bound, total in histogram.cumulative():
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    @staticmethod
+    def _counters(lines, name, help_text, counters):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (method, view), value in sorted(counters.items()):
+            lines.append(f'{name}{{{_labels(method=method, view=view)}}} {value}')
+
+
+registry = Registry()
+
+
+def instrument_serializers():
+    """
+    Chronomètre `serializer.data` des sérializers DRF pendant les requêtes
+    échantillonnées (appelé une fois au démarrage si l'échantillonnage est actif).
+    Seul l'appel le plus externe est mesuré : un sérializer imbriqué
+    (`VoucherLineSerializer` dans `VoucherSerializer`) n'est pas compté deux fois.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+    if getattr(original.fget, 'instrumented', False):
+        return
+
+    @wraps(original.fget)
+    def data(serializer):
+        measures = _current.get()
+        if measures is None or _serializing.get():
+            return original.fget(serializer)
+        token = _serializing.set(True)
+        start = time.perf_counter()
+        try:
+            return original.fget(serializer)
+        finally:
+            measures.serializer_seconds += time.perf_counter() - start
+            _serializing.reset(token)
+
+    data.instrumented = True
+    BaseSerializer.data = property(data)
+
+
+class MetricsMiddleware:
+    """ Mesure les requêtes échantillonnées et les enregistre dans `registry` (WSGI et ASGI) """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = float(getattr(settings, 'ACCOUNTING_METRICS_SAMPLE_RATE', 0))
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        measures = RequestMetrics()
+        token = _current.set(measures)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(measures))
+                response = self.get_response(request)
+                # Réponse DRF : le rendu (JSON) fait partie du coût de la requête
+                if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                    response.render()
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - start, measures)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        measures = RequestMetrics(sql=False)
+        token = _current.set(measures)
+        start = time.perf_counter()
+        try:
+            # Le gestionnaire ASGI rend lui-même les réponses DRF avant de les remonter
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - start, measures)
+        return response
+
+    @staticmethod
+    def record(request, response, seconds, measures):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        registry.record(request.method, view, response.status_code, seconds, measures)
+
+
+def metrics_view(request):
+    """
+    `/metrics` : exposition Prometheus. Accès par jeton
+    (`Authorization: Bearer <ACCOUNTING_METRICS_TOKEN>`) ou, sans jeton
+    configuré, depuis les adresses `ACCOUNTING_METRICS_ALLOWED_IPS`.
+    """
+    token = getattr(settings, 'ACCOUNTING_METRICS_TOKEN', '')
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in getattr(settings, 'ACCOUNTING_METRICS_ALLOWED_IPS',
+                                                             ['127.0.0.1'])
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
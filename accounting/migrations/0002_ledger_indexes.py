@@ -0,0 +1,60 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+DATE_INDEX = 'txn_date_idx'
+
+
+def create_date_index(apps, schema_editor):
+    """
+    Index sur `Transaction.date`.
+
+    Sous PostgreSQL la colonne est alimentée en ordre quasi chronologique
+    (table en ajout seul) : un index BRIN, quelques pages pour des millions de
+    lignes, suffit aux filtres par date et par période. Les autres bases
+    reçoivent un index B-tree classique.
+    """
+    table = schema_editor.quote_name('accounting_transaction')
+    name = schema_editor.quote_name(DATE_INDEX)
+    using = ' USING brin' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(f'CREATE INDEX {name} ON {table}{using} ("date")')
+
+
+def drop_date_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX {schema_editor.quote_name(DATE_INDEX)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='credit_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='accounting.account'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='debit_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='debits', to='accounting.account'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['created_at', 'id'], name='journal_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['debit_account', 'date'], include=('amount',), name='txn_debit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['credit_account', 'date'], include=('amount',), name='txn_credit_date_idx'),
+        ),
+        migrations.RunPython(create_date_index, drop_date_index, elidable=False),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:05
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_snapshots(apps, schema_editor):
+    """ Calcule les cumuls mensuels des transactions existantes """
+    Transaction = apps.get_model('accounting', 'Transaction')
+    BalanceSnapshot = apps.get_model('accounting', 'BalanceSnapshot')
+    db = schema_editor.connection.alias
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    ledger = Transaction.objects.using(db).order_by().annotate(period=TruncMonth('date'))
+    for index, field in enumerate(('debit_account', 'credit_account')):
+        rows = ledger.values(field, 'period').annotate(total=Sum('amount')).values_list(field, 'period', 'total')
+        for account_id, period, total in rows.iterator():
+            totals[(account_id, period)][index] += total
+    BalanceSnapshot.objects.using(db).bulk_create(
+        (BalanceSnapshot(account_id=account_id, period=period, debit=debit, credit=credit)
+         for (account_id, period), (debit, credit) in totals.items()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0002_ledger_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='accounting.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'account'], name='snapshot_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('account', 'period'), name='snapshot_account_period_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_snapshots, migrations.RunPython.noop),
+    ]
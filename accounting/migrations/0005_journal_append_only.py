@@ -0,0 +1,174 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from datetime import date
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+TABLE = 'accounting_journalentry'
+SNAPSHOT_FIELDS = ('date', 'description', 'debit_account_id', 'credit_account_id', 'amount')
+
+APPEND_ONLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION accounting_journal_append_only() RETURNS trigger AS $$
+BEGIN
+    IF coalesce(current_setting('accounting.journal_maintenance', true), '') <> 'on' THEN
+        RAISE EXCEPTION 'accounting_journalentry est en ajout seul';
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def copy_transaction_fields(apps, schema_editor):
+    """ Les entrées existantes reçoivent une copie de leur transaction """
+    JournalEntry = apps.get_model('accounting', 'JournalEntry')
+    Transaction = apps.get_model('accounting', 'Transaction')
+    source = Transaction.objects.filter(pk=OuterRef('transaction_id'))
+    JournalEntry.objects.update(**{field: Subquery(source.values(field)[:1]) for field in SNAPSHOT_FIELDS})
+
+
+def _month(year, month):
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def partition_journal(apps, schema_editor):
+    """
+    PostgreSQL : la table du journal devient une table partitionnée par mois
+    (UTC) sur `created_at`, avec une partition par défaut, des partitions pour
+    les mois déjà présents et les trois mois à venir, et un déclencheur qui
+    refuse UPDATE et DELETE. Les autres bases gardent une table simple.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    legacy = f'{TABLE}_legacy'
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT LIKE %s",
+                       [TABLE, '%_pkey'])
+        indexes = [definition for definition, in cursor.fetchall()]
+        cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                       "WHERE conrelid = %s::regclass AND contype = 'f'", [TABLE])
+        foreign_keys = cursor.fetchall()
+        cursor.execute("SELECT min(created_at), max(created_at) FROM " + quote(TABLE))
+        first, last = cursor.fetchone()
+
+    schema_editor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(legacy)}')
+    schema_editor.execute(f'CREATE TABLE {quote(TABLE)} (LIKE {quote(legacy)} INCLUDING DEFAULTS '
+                          f'INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)')
+    # La clé primaire d'une table partitionnée doit contenir la clé de partitionnement
+    schema_editor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY (id, created_at)')
+    schema_editor.execute(f'CREATE TABLE {quote(TABLE + "_default")} PARTITION OF {quote(TABLE)} DEFAULT')
+
+    today = date.today()
+    start = min(first.date(), today) if first else today
+    end = max(last.date(), today) if last else today
+    month, stop = _month(start.year, start.month), _month(end.year, end.month + 3)
+    while month <= stop:
+        following = _month(month.year, month.month + 1)
+        schema_editor.execute(
+            f'CREATE TABLE {quote(f"{TABLE}_y{month:%Y}m{month:%m}")} PARTITION OF {quote(TABLE)} '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{following:%Y-%m-%d} 00:00:00+00')")
+        month = following
+
+    schema_editor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(legacy)}')
+    schema_editor.execute(f'DROP TABLE {quote(legacy)}')
+
+    # Identifiants : séquence propre à la table partitionnée, reprise après le plus grand id
+    sequence = quote(f'{TABLE}_id_seq')
+    schema_editor.execute(f'CREATE SEQUENCE {sequence} OWNED BY {quote(TABLE)}.id')
+    schema_editor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+    schema_editor.execute(f"SELECT setval('{TABLE}_id_seq', coalesce((SELECT max(id) FROM {quote(TABLE)}), 0) + 1, "
+                          f"false)")
+
+    for definition in indexes:
+        schema_editor.execute(definition)
+    for name, definition in foreign_keys:
+        schema_editor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+
+    schema_editor.execute(APPEND_ONLY_FUNCTION)
+    schema_editor.execute(f'CREATE TRIGGER accounting_journal_append_only BEFORE UPDATE OR DELETE ON {quote(TABLE)} '
+                          f'FOR EACH ROW EXECUTE FUNCTION accounting_journal_append_only()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_report_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalentry',
+            name='transaction',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='journal_entries', to='accounting.transaction'),
+        ),
+        migrations.AlterField(
+            model_name='journalentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='action',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Création'), (2, 'Modification'), (3, 'Suppression')], default=1),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='date',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='description',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='debit_account',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounting.account'),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='credit_account',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounting.account'),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.RunPython(copy_transaction_fields, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='journalentry',
+            name='date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='journalentry',
+            name='description',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='journalentry',
+            name='debit_account',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounting.account'),
+        ),
+        migrations.AlterField(
+            model_name='journalentry',
+            name='credit_account',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounting.account'),
+        ),
+        migrations.AlterField(
+            model_name='journalentry',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=15),
+        ),
+        migrations.RunPython(partition_journal, migrations.RunPython.noop, elidable=False),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0007_fiscal_years'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('incremental', models.BooleanField(default=False)),
+                ('repair', models.BooleanField(default=False)),
+                ('accounts_checked', models.PositiveIntegerField(default=0)),
+                ('drifted', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
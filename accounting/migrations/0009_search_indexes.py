@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:40
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models.functions import Upper
+
+# Expressions identiques à celles des requêtes (accounting/search.py) : `icontains` compare des UPPER(…)
+SEARCH_INDEXES = (
+    ('Transaction', GinIndex(SearchVector('description', config='french'), name='txn_description_fts_idx')),
+    ('Transaction', GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='txn_description_trgm_idx')),
+    ('Account', GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='account_title_trgm_idx')),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    """ PostgreSQL : extension pg_trgm, index plein texte et trigrammes. Les autres bases n'en ont pas. """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model('accounting', model_name), index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model('accounting', model_name), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0008_reconciliation_runs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
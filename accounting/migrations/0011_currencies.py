@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:10
+
+import accounting.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0010_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='currency',
+            field=models.CharField(default=accounting.models.functional_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='currency_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='currency',
+            field=models.CharField(default=accounting.models.functional_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='currency_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='voucher',
+            name='currency',
+            field=models.CharField(default=accounting.models.functional_currency, max_length=3),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='exchange_rate_currency_date_uniq')],
+            },
+        ),
+    ]
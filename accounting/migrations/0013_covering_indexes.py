@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:06
+
+import accounting.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0012_report_started_at'),
+    ]
+
+    # Les index physiques sont inchangés (INCLUDE sous PostgreSQL, colonnes clés ailleurs) :
+    # seul l'état des modèles passe à CoveringIndex, sans reconstruire les index du grand livre.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='transaction',
+                    name='txn_debit_date_idx',
+                ),
+                migrations.RemoveIndex(
+                    model_name='transaction',
+                    name='txn_credit_date_idx',
+                ),
+                migrations.AddIndex(
+                    model_name='transaction',
+                    index=accounting.models.CoveringIndex(covering=('amount',), fields=['debit_account', 'date'], name='txn_debit_date_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='transaction',
+                    index=accounting.models.CoveringIndex(covering=('amount',), fields=['credit_account', 'date'], name='txn_credit_date_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -1,7 +1,87 @@
-from django.db import models
+import uuid
+import weakref
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, F, Max, Value, When
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
+from .cache import invalidate_accounts, invalidate_exchange_rates, invalidate_user
+
+class CoveringIndex(models.Index):
+    """ Index dont les colonnes `covering` sont ajoutées en INCLUDE là où la base le permet (PostgreSQL),
+        simple index sur les colonnes clés ailleurs (SQLite), sans avertissement models.W040 """
+
+    def __init__(self, *args, covering=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.covering = tuple(covering)
+
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        kwargs['covering'] = self.covering
+        return path, args, kwargs
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if not schema_editor.connection.features.supports_covering_indexes:
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        index = self.clone()
+        index.include = self.covering
+        return models.Index.create_sql(index, model, schema_editor, using=using, **kwargs)
+
+def functional_currency():
+    """ Devise fonctionnelle (`ACCOUNTING_FUNCTIONAL_CURRENCY`) : devise des soldes et des montants `amount` """
+    return getattr(settings, 'ACCOUNTING_FUNCTIONAL_CURRENCY', 'EUR')
+
+def month_start(day):
+    """ Premier jour du mois de `day` : clé de période des cumuls mensuels """
+    return day.replace(day=1)
+
+class ClosedPeriodError(ValidationError):
+    """ Écriture datée d'un exercice clos : les transactions des exercices clos sont immuables """
+
+class AccountQuerySet(models.QuerySet):
+
+    def post_movements(self, movements):
+        """
+        Enregistre l'effet de mouvements `(account_id, date, débit, crédit)` :
+        soldes des comptes puis cumuls mensuels (`BalanceSnapshot`), dans la
+        même transaction et sous le verrou des comptes concernés.
+        """
+        movements = list(movements)
+        deltas = defaultdict(Decimal)
+        for account_id, day, debit, credit in movements:
+            deltas[account_id] += credit - debit
+        with transaction.atomic(using=self.db, savepoint=False):
+            self.apply_balance_deltas(deltas)
+            # Contrôle après le verrou des comptes : une clôture concurrente est déjà validée
+            FiscalYear.objects.using(self.db).check_open(day for _, day, _, _ in movements)
+            BalanceSnapshot.objects.using(self.db).apply_movements(movements)
+
+    def apply_balance_deltas(self, deltas):
+        """
+        Applique des variations de solde `{account_id: delta}` directement en base.
+
+        Les comptes sont verrouillés dans l'ordre croissant des clés (ordre
+        déterministe : pas d'interblocage entre des écritures A→B et B→A), puis
+        mis à jour par un unique UPDATE `balance = balance + delta`.
+        """
+        deltas = {account_id: delta for account_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        account_ids = sorted(deltas)
+        with transaction.atomic(using=self.db, savepoint=False):
+            list(self.select_for_update().filter(pk__in=account_ids).order_by('pk').values_list('pk', flat=True))
+            increment = Case(*(When(pk=account_id, then=Value(deltas[account_id])) for account_id in account_ids),
+                             output_field=models.DecimalField(max_digits=15, decimal_places=2))
+            self.filter(pk__in=account_ids).update(balance=F('balance') + increment)
+            invalidate_accounts(account_ids, using=self.db)
+
 class Account(models.Model):
     ACCOUNT_TYPES = (
         ('Actif', 'Actif'),
@@ -15,40 +95,438 @@ class Account(models.Model):
     type = models.CharField(max_length=20, choices=ACCOUNT_TYPES)
     balance = models.DecimalField(max_digits=15, decimal_places=2, default=0)
 
+    objects = AccountQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.code} - {self.title}"
 
+class Voucher(models.Model):
+    """
+    Pièce comptable à N lignes (ex. facture : HT + TVA = TTC). Ses lignes sont
+    enregistrées sous forme de transactions équilibrées rattachées à la pièce
+    (voir `accounting/vouchers.py`).
+    """
+    ENTRY, CLOSING, OPENING = 'entry', 'closing', 'opening'
+    KINDS = (
+        (ENTRY, 'Saisie'),
+        (CLOSING, 'Clôture'),
+        (OPENING, 'À-nouveaux'),
+    )
+
+    reference = models.CharField(max_length=50, blank=True)  # Numéro de pièce (facture, relevé…)
+    kind = models.CharField(max_length=10, choices=KINDS, default=ENTRY)  # Écritures de clôture : accounting/closing.py
+    currency = models.CharField(max_length=3, default=functional_currency)  # Devise des lignes saisies
+    date = models.DateField()
+    description = models.CharField(max_length=255)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)  # L'utilisateur qui a saisi la pièce
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.reference or self.pk} - {self.description}"
+
+class FiscalYearQuerySet(models.QuerySet):
+
+    def closed_through(self):
+        """ Dernier jour du dernier exercice clos (ou archivé), None si aucun """
+        return self.filter(status__in=(FiscalYear.CLOSED, FiscalYear.ARCHIVED)).aggregate(end=Max('end'))['end']
+
+    def open_from(self):
+        """ Premier jour de la période ouverte : lendemain du dernier exercice clos, None si aucun """
+        closed = self.closed_through()
+        return closed + timedelta(days=1) if closed is not None else None
+
+    async def aclosed_through(self):
+        """ Version asynchrone de `closed_through` """
+        closed = await self.filter(status__in=(FiscalYear.CLOSED, FiscalYear.ARCHIVED)).aaggregate(end=Max('end'))
+        return closed['end']
+
+    async def aopen_from(self):
+        """ Version asynchrone de `open_from` """
+        closed = await self.aclosed_through()
+        return closed + timedelta(days=1) if closed is not None else None
+
+    def archived_through(self):
+        """ Dernier jour du dernier exercice archivé, None si aucun """
+        return self.filter(status=FiscalYear.ARCHIVED).aggregate(end=Max('end'))['end']
+
+    async def aarchived_through(self):
+        """ Version asynchrone de `archived_through` """
+        archived = await self.filter(status=FiscalYear.ARCHIVED).aaggregate(end=Max('end'))
+        return archived['end']
+
+    def check_open(self, days):
+        """ Lève `ClosedPeriodError` si l'une des dates appartient à un exercice clos """
+        days = list(days)
+        closed = self.closed_through() if days else None
+        if closed is not None and min(days) <= closed:
+            raise ClosedPeriodError(f"La période est close jusqu'au {closed:%d/%m/%Y} : écriture refusée.")
+
+class FiscalYear(models.Model):
+    """
+    Exercice comptable (mois entiers). Sa clôture écrit les écritures de
+    clôture et les à-nouveaux et rend ses transactions immuables ; un exercice
+    clos peut ensuite être archivé (voir `accounting/closing.py`).
+    """
+    OPEN, CLOSED, ARCHIVED = 'open', 'closed', 'archived'
+    STATUSES = (
+        (OPEN, 'Ouvert'),
+        (CLOSED, 'Clos'),
+        (ARCHIVED, 'Archivé'),
+    )
+
+    start = models.DateField(unique=True)
+    end = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=OPEN)
+    closing_voucher = models.ForeignKey(Voucher, related_name='+', on_delete=models.PROTECT, null=True, blank=True)
+    opening_voucher = models.ForeignKey(Voucher, related_name='+', on_delete=models.PROTECT, null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    closed_by = models.ForeignKey(User, on_delete=models.PROTECT, null=True, blank=True)
+
+    objects = FiscalYearQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['start']
+
+    def clean(self):
+        if self.start.day != 1 or (self.end + timedelta(days=1)).day != 1:
+            raise ValidationError("Un exercice commence le premier jour d'un mois et finit le dernier jour d'un mois.")
+        if self.end <= self.start:
+            raise ValidationError("La fin de l'exercice doit suivre son début.")
+        if FiscalYear.objects.exclude(pk=self.pk).filter(start__lte=self.end, end__gte=self.start).exists():
+            raise ValidationError("Les exercices ne peuvent pas se chevaucher.")
+
+    def __str__(self):
+        return f"{self.start:%d/%m/%Y} – {self.end:%d/%m/%Y}"
+
 class Transaction(models.Model):
     date = models.DateField()
     description = models.CharField(max_length=255)
-    debit_account = models.ForeignKey(Account, related_name='debits', on_delete=models.CASCADE)
-    credit_account = models.ForeignKey(Account, related_name='credits', on_delete=models.CASCADE)
-    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    # Les index (compte, date) ci-dessous remplacent les index simples des clés étrangères
+    debit_account = models.ForeignKey(Account, related_name='debits', on_delete=models.CASCADE, db_index=False)
+    credit_account = models.ForeignKey(Account, related_name='credits', on_delete=models.CASCADE, db_index=False)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)  # En devise fonctionnelle
+    # Saisie en devise étrangère : devise et montant d'origine, `amount` converti au taux du jour (currency.py)
+    currency = models.CharField(max_length=3, default=functional_currency)
+    currency_amount = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)  # Ajout du créateur de la transaction
+    # Pièce d'origine d'une écriture à plusieurs lignes
+    voucher = models.ForeignKey(Voucher, related_name='transactions', on_delete=models.CASCADE, null=True, blank=True)
+
+    # Utilisateur qui modifie ou supprime la transaction, inscrit au journal (auteur de la transaction si None)
+    acting_user = None
+
+    class Meta:
+        indexes = [
+            # Filtres par compte et période, agrégats par compte : `amount` inclus (PostgreSQL)
+            # pour des parcours d'index seuls sans lecture de la table
+            CoveringIndex(fields=['debit_account', 'date'], covering=['amount'], name='txn_debit_date_idx'),
+            CoveringIndex(fields=['credit_account', 'date'], covering=['amount'], name='txn_credit_date_idx'),
+        ]
 
     def clean(self):
         if self.amount <= 0:
             raise ValidationError("Le montant doit être positif.")
-        if self.debit_account == self.credit_account:
+        if self.debit_account_id == self.credit_account_id:
             raise ValidationError("Le compte débité et crédité doivent être différents.")
 
+    def movements(self, sign=1):
+        """ Mouvements `(account_id, date, débit, crédit)` induits par la transaction """
+        amount = Decimal(self.amount) * sign
+        return [(self.debit_account_id, self.date, amount, Decimal(0)),
+                (self.credit_account_id, self.date, Decimal(0), amount)]
+
     def save(self, *args, **kwargs):
         self.clean()  # Vérifier la validité avant sauvegarde
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            movements = []
+            previous = None
+            if self.pk is not None:
+                # Modification : on annule l'effet de la version enregistrée avant d'appliquer la nouvelle
+                previous = Transaction.objects.select_for_update().filter(pk=self.pk).first()
+                if previous is not None:
+                    movements.extend(previous.movements(sign=-1))
+            super().save(*args, **kwargs)
+
+            # Mise à jour des soldes et des cumuls en base (verrouillage ordonné, UPDATE atomiques)
+            movements.extend(self.movements())
+            Account.objects.post_movements(movements)
+            JournalEntry.objects.record([self], JournalEntry.CREATE if previous is None else JournalEntry.UPDATE,
+                                        user=self.acting_user)
+
+    def __str__(self):
+        return f"{self.description} ({self.currency_amount or self.amount} {self.currency})"
+
+class ArchivedTransaction(models.Model):
+    """
+    Transaction d'un exercice archivé, copiée à l'identique (même identifiant)
+    hors de la table de travail. Sans contraintes de clés étrangères : la
+    table n'est lue que pour consultation et reconstruction des cumuls.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    fiscal_year = models.ForeignKey(FiscalYear, related_name='archived_transactions', on_delete=models.PROTECT)
+    date = models.DateField()
+    description = models.CharField(max_length=255)
+    debit_account = models.ForeignKey(Account, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False)
+    credit_account = models.ForeignKey(Account, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    currency = models.CharField(max_length=3, default=functional_currency)
+    currency_amount = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    user = models.ForeignKey(User, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False)
+    voucher = models.ForeignKey(Voucher, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False,
+                                null=True, blank=True)
 
-        # Mise à jour des soldes
-        self.debit_account.balance -= self.amount
-        self.credit_account.balance += self.amount
-        self.debit_account.save()
-        self.credit_account.save()
+    def __str__(self):
+        return f"{self.description} ({self.currency_amount or self.amount} {self.currency}, archivée)"
+
+class ExchangeRate(models.Model):
+    """
+    Taux de change d'une devise à une date : valeur d'une unité de `currency`
+    en devise fonctionnelle. Chargé localement (`manage.py load_exchange_rates`) ;
+    une saisie datée d'un jour sans taux prend le dernier taux connu.
+    """
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        constraints = [
+            # Sert aussi la lecture des taux d'une devise par date (accounting/currency.py)
+            models.UniqueConstraint(fields=['currency', 'date'], name='exchange_rate_currency_date_uniq'),
+        ]
 
     def __str__(self):
-        return f"{self.description} ({self.amount}€)"
+        return f"{self.currency} {self.date} : {self.rate}"
+
+class BalanceSnapshotQuerySet(models.QuerySet):
+
+    def apply_movements(self, movements):
+        """
+        Reporte des mouvements `(account_id, date, débit, crédit)` dans les
+        cumuls mensuels : un UPDATE incrémental par couple (compte, mois), les
+        couples encore absents étant créés en un seul INSERT groupé.
+        """
+        totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+        for account_id, day, debit, credit in movements:
+            entry = totals[(account_id, month_start(day))]
+            entry[0] += debit
+            entry[1] += credit
+
+        missing = []
+        for (account_id, period), (debit, credit) in sorted(totals.items()):
+            if not debit and not credit:
+                continue
+            updated = self.filter(account_id=account_id, period=period).update(
+                debit=F('debit') + debit, credit=F('credit') + credit)
+            if not updated:
+                missing.append(BalanceSnapshot(account_id=account_id, period=period, debit=debit, credit=credit))
+        if missing:
+            self.bulk_create(missing)
+
+class BalanceSnapshot(models.Model):
+    """
+    Cumul des débits et crédits d'un compte sur un mois, maintenu par le
+    chemin de comptabilisation et reconstructible par
+    `manage.py rebuild_balance_snapshots`.
+    """
+    account = models.ForeignKey(Account, related_name='snapshots', on_delete=models.CASCADE)
+    period = models.DateField()  # Premier jour du mois
+    debit = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    objects = BalanceSnapshotQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period'], name='snapshot_account_period_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'account'], name='snapshot_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.period:%Y-%m} (D {self.debit} / C {self.credit})"
+
+class AppendOnlyError(Exception):
+    """ Le journal n'accepte que des ajouts : ni modification ni suppression """
+
+class JournalEntryQuerySet(models.QuerySet):
+
+    def record(self, transactions, action, user=None, batch_size=1000):
+        """
+        Ajoute au journal une entrée par transaction (`action` : création,
+        modification ou suppression), par INSERT groupés dans la transaction
+        en cours. L'entrée est attribuée à `user` (l'utilisateur qui agit), ou
+        à l'auteur de la transaction si `user` est omis.
+        """
+        return self.bulk_create(
+            (JournalEntry(transaction_id=txn.pk, action=action, date=txn.date, description=txn.description,
+                          debit_account_id=txn.debit_account_id, credit_account_id=txn.credit_account_id,
+                          amount=txn.amount, user_id=user.pk if user is not None else txn.user_id)
+             for txn in transactions),
+            batch_size=batch_size,
+        )
+
+    def update(self, **kwargs):
+        raise AppendOnlyError("Les entrées du journal ne peuvent pas être modifiées.")
+
+    def delete(self):
+        raise AppendOnlyError("Les entrées du journal ne peuvent pas être supprimées (voir archive_journal).")
 
 class JournalEntry(models.Model):
-    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE)
+    """
+    Entrée du journal, en ajout seul : chaque création, modification ou
+    suppression d'une transaction y est copiée (date, comptes, montant). La
+    transaction peut donc disparaître sans que l'entrée ne perde son contenu.
+
+    Sous PostgreSQL, la table est partitionnée par mois sur `created_at`
+    (voir `accounting/journal.py`) ; les anciens mois s'archivent avec
+    `manage.py archive_journal`.
+    """
+    CREATE, UPDATE, DELETE = 1, 2, 3
+    ACTIONS = (
+        (CREATE, 'Création'),
+        (UPDATE, 'Modification'),
+        (DELETE, 'Suppression'),
+    )
+
+    # Pas de contrainte de clé étrangère : l'entrée survit à la transaction et aux comptes
+    transaction = models.ForeignKey(Transaction, related_name='journal_entries', on_delete=models.DO_NOTHING,
+                                    db_constraint=False)
+    action = models.PositiveSmallIntegerField(choices=ACTIONS, default=CREATE)
+    date = models.DateField()
+    description = models.CharField(max_length=255)
+    debit_account = models.ForeignKey(Account, related_name='+', on_delete=models.DO_NOTHING,
+                                      db_constraint=False, db_index=False)
+    credit_account = models.ForeignKey(Account, related_name='+', on_delete=models.DO_NOTHING,
+                                       db_constraint=False, db_index=False)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # L'utilisateur qui a enregistré
+    user = models.ForeignKey(User, on_delete=models.PROTECT)  # L'utilisateur qui a enregistré
+
+    objects = JournalEntryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='journal_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise AppendOnlyError("Les entrées du journal ne peuvent pas être modifiées.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise AppendOnlyError("Les entrées du journal ne peuvent pas être supprimées (voir archive_journal).")
 
     def __str__(self):
-        return f"Journal Entry for {self.transaction} by {self.user.username}"
+        return f"{self.get_action_display()} de la transaction {self.transaction_id} par {self.user_id}"
+
+class ReconciliationRun(models.Model):
+    """ Passage du rapprochement des soldes (voir `accounting/reconcile.py`) : repère du mode incrémental """
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    incremental = models.BooleanField(default=False)  # Seuls les comptes mouvementés depuis le passage précédent
+    repair = models.BooleanField(default=False)  # Écarts corrigés
+    accounts_checked = models.PositiveIntegerField(default=0)
+    drifted = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Rapprochement du {self.started_at:%d/%m/%Y %H:%M} ({self.drifted} écarts)"
+
+class ReportJob(models.Model):
+    """ Génération asynchrone d'un rapport (fichier écrit dans MEDIA_ROOT/reports/) """
+    KINDS = (
+        ('balance', 'Balance comptable'),
+    )
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUSES = (
+        (PENDING, 'En attente'),
+        (RUNNING, 'En cours'),
+        (DONE, 'Terminé'),
+        (FAILED, 'Échec'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KINDS, default='balance')
+    params = models.JSONField(default=dict, blank=True)
+    # Empreinte (type, paramètres, version du grand livre) : dédoublonnage des demandes identiques
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    file = models.FileField(upload_to='reports/', blank=True)
+    error = models.TextField(blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)  # L'utilisateur qui a demandé le rapport
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # Réservation par un worker
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.get_status_display()})"
+
+class IdempotencyKey(models.Model):
+    """
+    Clé d'idempotence d'une écriture (`Idempotency-Key`) et réponse d'origine,
+    rejouée telle quelle sur une nouvelle tentative (voir `accounting/idempotency.py`).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=50)  # Endpoint d'origine (ex. `transactions.create`)
+    fingerprint = models.CharField(max_length=64)  # Empreinte de la requête d'origine
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            # Éviction des clés expirées (`manage.py purge_idempotency_keys`)
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.scope})"
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_account_cache(sender, instance, **kwargs):
+    """ Toute modification d'un compte rend obsolètes ses lectures en cache """
+    invalidate_accounts([instance.pk])
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """ Utilisateur modifié, désactivé ou supprimé : relu en base à sa prochaine authentification """
+    invalidate_user(instance.pk)
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def invalidate_exchange_rate_cache(sender, instance, **kwargs):
+    """ Tables de taux en mémoire des processus rechargées à la prochaine conversion """
+    invalidate_exchange_rates()
+
+# Comptes supprimés, par origine de la suppression (compte ou QuerySet) : relevés une fois par suppression
+_deleted_accounts = weakref.WeakKeyDictionary()
+
+@receiver(pre_delete, sender=Account)
+def remember_deleted_account(sender, instance, origin=None, **kwargs):
+    """ Le pre_delete de chaque compte précède la suppression en cascade de ses transactions """
+    if origin is not None:
+        _deleted_accounts.setdefault(origin, set()).add(instance.pk)
+
+@receiver(post_delete, sender=Transaction)
+def revert_transaction_balances(sender, instance, origin=None, **kwargs):
+    """ Annule l'effet d'une transaction supprimée (suppression directe, en masse ou en cascade) et la journalise """
+    movements = instance.movements(sign=-1)
+    # Suppression en cascade depuis des comptes : inutile (et impossible) de mettre à jour ces comptes-là
+    deleted = _deleted_accounts.get(origin) if origin is not None else None
+    if deleted:
+        movements = [movement for movement in movements if movement[0] not in deleted]
+    Account.objects.post_movements(movements)
+    JournalEntry.objects.record([instance], JournalEntry.DELETE, user=instance.acting_user)
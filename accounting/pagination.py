@@ -0,0 +1,89 @@
+"""
+Pagination des listes de l'API.
+
+Par défaut les listes sont paginées par numéro de page (`?page=N`). Dès que le
+paramètre `cursor` est présent (vide pour la première page), la pagination
+passe en mode « keyset » : la page suivante est lue à partir de la dernière
+clé de tri renvoyée (`WHERE (date, id) > (d, i) ORDER BY date, id LIMIT n`),
+ce qui garde un coût constant même pour les pages profondes.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(fields, values):
+    """ Condition `(f1, f2, ...) > (v1, v2, ...)` exprimée avec des Q (tri croissant) """
+    condition = Q()
+    for index in range(len(fields) - 1, -1, -1):
+        step = Q(**{f"{fields[index]}__gt": values[index]})
+        condition = step if index == len(fields) - 1 else step | (Q(**{fields[index]: values[index]}) & condition)
+    return condition
+
+
+class LedgerPagination(PageNumberPagination):
+    """
+    Pagination par numéro de page, avec une option keyset (`?cursor=`).
+
+    Les champs de tri du mode keyset sont lus sur la vue (`keyset_ordering`),
+    par défaut `('id',)` ; le dernier champ doit être unique.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = "Curseur invalide."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.fields = tuple(getattr(view, 'keyset_ordering', ('id',)))
+        model_fields = [queryset.model._meta.get_field('id' if name == 'pk' else name) for name in self.fields]
+        queryset = queryset.order_by(*self.fields)
+
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if position is not None:
+            try:
+                values = [field.to_python(value) for field, value in zip(model_fields, position, strict=True)]
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(keyset_filter(self.fields, values))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            if isinstance(last, dict):
+                # Lignes `.values()` (accounting/fastread.py) : clé de tri relue sur une instance
+                last = queryset.model(**{field.attname: last[field.attname] for field in model_fields})
+            self.next_position = [field.value_to_string(last) for field in model_fields]
+        return rows
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            return json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        next_url = self.encode_cursor(self.next_position) if self.next_position is not None else None
+        return Response(OrderedDict([('next', next_url), ('results', data)]))
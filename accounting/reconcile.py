@@ -0,0 +1,170 @@
+"""
+Rapprochement des soldes `Account.balance` avec le grand livre
+(`manage.py reconcile_balances`, actions de l'administration des comptes).
+
+Le solde stocké d'un compte est une valeur dénormalisée : une écriture SQL
+directe, un import hors API ou une anomalie peuvent le faire dériver. Le
+rapprochement recalcule les soldes depuis le grand livre (transactions des
+exercices archivés comprises) par une passe groupée par jambe et par plage
+de comptes, compare au solde stocké et, sur demande, corrige les écarts par
+un UPDATE groupé (`Account.objects.apply_balance_deltas`).
+
+- Mode complet : tous les comptes, par plages de `chunk_size` identifiants,
+  éventuellement réparties sur plusieurs threads (une connexion par thread).
+- Mode incrémental : seuls les comptes mouvementés depuis le dernier passage
+  (lus dans le journal, versions antérieures des transactions modifiées
+  comprises) sont vérifiés.
+
+En correction, chaque plage est traitée sous le verrou de ses comptes : une
+comptabilisation concurrente attend et s'applique ensuite au solde corrigé.
+En simple vérification, les écarts relevés sans verrou sont confirmés sous
+verrou avant d'être signalés, pour écarter les écritures en cours.
+"""
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Account, ArchivedTransaction, JournalEntry, ReconciliationRun, Transaction
+
+# Comptes par plage
+DEFAULT_CHUNK_SIZE = 5000
+
+# Recouvrement du mode incrémental : écritures journalisées avant le dernier passage mais validées après
+INCREMENTAL_MARGIN = timedelta(minutes=10)
+
+LEGS = (('debit_account', -1), ('credit_account', 1))
+
+
+class Drift(namedtuple('Drift', 'account_id code stored ledger')):
+    """ Écart entre le solde stocké et le solde recalculé d'un compte """
+
+    @property
+    def difference(self):
+        return self.ledger - self.stored
+
+
+def ledger_balances(first=None, last=None, account_ids=None):
+    """
+    Soldes `{account_id: crédits − débits}` recalculés depuis le grand livre,
+    pour la plage d'identifiants `[first, last]` ou la liste `account_ids`.
+    """
+    balances = defaultdict(Decimal)
+    for model in (ArchivedTransaction, Transaction):
+        for field, sign in LEGS:
+            rows = model.objects.order_by()
+            if account_ids is not None:
+                rows = rows.filter(**{f'{field}__in': account_ids})
+            else:
+                rows = rows.filter(**{f'{field}__gte': first, f'{field}__lte': last})
+            for account_id, total in rows.values(field).annotate(total=Sum('amount')).values_list(field, 'total'):
+                balances[account_id] += sign * total
+    return balances
+
+
+def _compare(accounts, ledger):
+    """ `(comptes comparés, écarts)` entre les soldes stockés de `accounts` et les soldes `ledger` """
+    rows = list(accounts.order_by('pk').values_list('pk', 'code', 'balance'))
+    drifts = [Drift(account_id, code, stored, ledger.get(account_id, Decimal('0.00')))
+              for account_id, code, stored in rows if stored != ledger.get(account_id, 0)]
+    return len(rows), drifts
+
+
+def check_accounts(first=None, last=None, account_ids=None, repair=False):
+    """
+    Rapproche une plage (ou une liste) de comptes. Retourne `(comptes vérifiés,
+    écarts)` ; avec `repair`, les écarts sont corrigés sous le verrou des comptes.
+    """
+    with transaction.atomic():
+        accounts = Account.objects.all()
+        accounts = (accounts.filter(pk__in=account_ids) if account_ids is not None
+                    else accounts.filter(pk__gte=first, pk__lte=last))
+        if repair:
+            list(accounts.select_for_update().order_by('pk').values_list('pk', flat=True))
+        checked, drifts = _compare(accounts, ledger_balances(first, last, account_ids))
+        if repair and drifts:
+            Account.objects.apply_balance_deltas({drift.account_id: drift.difference for drift in drifts})
+    return checked, drifts
+
+
+def touched_accounts(since):
+    """ Comptes mouvementés depuis `since`, d'après le journal """
+    entries = JournalEntry.objects.filter(created_at__gte=since)
+    # Une modification peut avoir quitté un compte : les versions antérieures comptent aussi
+    updated = entries.filter(action=JournalEntry.UPDATE).values('transaction')
+    previous = JournalEntry.objects.filter(transaction__in=updated, created_at__lt=since)
+    touched = set()
+    for queryset in (entries, previous):
+        for debit, credit in queryset.order_by().values_list('debit_account', 'credit_account').distinct():
+            touched.update((debit, credit))
+    return sorted(touched)
+
+
+def account_ranges(chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Plages `(premier, dernier)` d'identifiants de comptes, de `chunk_size` comptes chacune """
+    ids = list(Account.objects.order_by('pk').values_list('pk', flat=True))
+    return [(ids[start], ids[min(start + chunk_size, len(ids)) - 1]) for start in range(0, len(ids), chunk_size)]
+
+
+def _in_thread(function, *args, **kwargs):
+    try:
+        return function(*args, **kwargs)
+    finally:
+        # Chaque thread a sa propre connexion : elle est libérée à la fin de la plage
+        connection.close()
+
+
+def reconcile(repair=False, incremental=False, account_ids=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Rapproche les soldes de tous les comptes (ou des comptes mouvementés depuis
+    le dernier passage, ou de `account_ids`). Retourne `(comptes vérifiés, écarts)`.
+    Les passages complets et incrémentaux sont enregistrés (`ReconciliationRun`).
+    """
+    run = None
+    if account_ids is None:
+        since = None
+        if incremental:
+            last = ReconciliationRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+            since = last.started_at - INCREMENTAL_MARGIN if last is not None else None
+        run = ReconciliationRun.objects.create(incremental=since is not None, repair=repair)
+        if since is not None:
+            account_ids = touched_accounts(since)
+
+    if account_ids is not None:
+        account_ids = sorted(account_ids)
+        tasks = [{'account_ids': account_ids[start:start + chunk_size]}
+                 for start in range(0, len(account_ids), chunk_size)]
+    else:
+        tasks = [{'first': first, 'last': last} for first, last in account_ranges(chunk_size)]
+
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='accounting-reconcile') as executor:
+            results = list(executor.map(lambda task: _in_thread(check_accounts, repair=repair, **task), tasks))
+    else:
+        results = [check_accounts(repair=repair, **task) for task in tasks]
+
+    checked = sum(count for count, _ in results)
+    drifts = [drift for _, found in results for drift in found]
+    if drifts and not repair:
+        # Confirmation sous verrou : une écriture en cours pendant la lecture n'est pas un écart
+        drifts = confirm(drifts)
+
+    if run is not None:
+        run.accounts_checked = checked
+        run.drifted = len(drifts)
+        run.finished_at = timezone.now()
+        run.save(update_fields=['accounts_checked', 'drifted', 'finished_at'])
+    return checked, drifts
+
+
+def confirm(drifts):
+    """ Recalcule sous verrou les comptes en écart et ne garde que les écarts confirmés """
+    with transaction.atomic():
+        account_ids = [drift.account_id for drift in drifts]
+        accounts = Account.objects.filter(pk__in=account_ids)
+        list(accounts.select_for_update().order_by('pk').values_list('pk', flat=True))
+        return _compare(accounts, ledger_balances(account_ids=account_ids))[1]
@@ -0,0 +1,160 @@
+"""
+Génération asynchrone des rapports (`/api/reports/`).
+
+Une demande crée un `ReportJob` en attente : la table sert de file d'attente,
+sans courtier externe. Les travaux sont exécutés soit par le pool de threads
+du processus web (`ACCOUNTING_REPORT_WORKERS` > 0), soit par un processus
+séparé (`manage.py run_report_worker`). Chaque travail est réservé par une
+mise à jour conditionnelle `pending → running`, si bien qu'un même travail
+n'est jamais exécuté deux fois.
+
+Deux demandes d'un même utilisateur, de même type, mêmes paramètres et même
+version du grand livre (`cache.ledger_version`) partagent le même travail et
+donc le même fichier.
+
+Un travail resté en cours plus de `ACCOUNTING_REPORT_TIMEOUT` secondes (worker
+arrêté pendant la génération) est abandonné : il n'est plus proposé aux
+demandes identiques, qui créent un nouveau travail, et le prochain passage de
+`run_pending` le marque en échec.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .balances import balance_rows
+from .cache import exchange_rates_version, ledger_version
+from .currency import balance_in_currency
+from .exports import iter_balance_csv, write_balance_xlsx
+from .models import ReportJob
+from .routers import recent_ledger_write, replica_reads
+from .serializers import REPORT_PARAMS
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _build_balance(params, output):
+    """ Balance comptable : mêmes paramètres que `export_balance` """
+    rows = balance_in_currency(balance_rows(date_from=params.get('date_from'), date_to=params.get('date_to')), params)
+    if params['file_format'] == 'csv':
+        for chunk in iter_balance_csv(rows):
+            output.write(chunk.encode('utf-8'))
+        return 'csv'
+    write_balance_xlsx(rows, output)
+    return 'xlsx'
+
+
+# Par type de rapport : sérializer des paramètres et fonction d'écriture du fichier
+BUILDERS = {
+    'balance': (REPORT_PARAMS['balance'], _build_balance),
+}
+
+
+def fingerprint(kind, params):
+    """ Empreinte d'une demande pour l'état courant du grand livre et des taux de change """
+    payload = json.dumps([kind, params, ledger_version(), exchange_rates_version()], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _stale_before():
+    """ Début de génération avant lequel un travail encore en cours est considéré comme abandonné """
+    return timezone.now() - timedelta(seconds=getattr(settings, 'ACCOUNTING_REPORT_TIMEOUT', 3600))
+
+
+def request_report(kind, params, user):
+    """
+    Retourne `(travail, créé)` : un travail existant de `user` (en attente, en
+    cours depuis moins de `ACCOUNTING_REPORT_TIMEOUT` ou terminé) pour la même
+    empreinte, ou un nouveau travail mis en file.
+    """
+    key = fingerprint(kind, params)
+    existing = (ReportJob.objects.filter(fingerprint=key, user=user)
+                .exclude(status=ReportJob.FAILED)
+                .exclude(status=ReportJob.RUNNING, started_at__lt=_stale_before())
+                .order_by('-created_at').first())
+    if existing is not None:
+        return existing, False
+    job = ReportJob.objects.create(kind=kind, params=params, fingerprint=key, user=user)
+    enqueue(job.pk)
+    return job, True
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.ACCOUNTING_REPORT_WORKERS,
+                                       thread_name_prefix='accounting-report')
+    return _executor
+
+
+def enqueue(job_id):
+    """ Confie le travail au pool de threads après validation (sinon il attend `run_report_worker`) """
+    if getattr(settings, 'ACCOUNTING_REPORT_WORKERS', 0) > 0:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job_id))
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Chaque thread du pool a ses propres connexions (base principale, réplica) : libérées après chaque travail
+        connections.close_all()
+
+
+def claim(job_id):
+    """ Réserve un travail en attente ; False s'il a déjà été pris par un autre worker """
+    return ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+        status=ReportJob.RUNNING, started_at=timezone.now()) == 1
+
+
+def run_job(job_id):
+    """ Exécute un travail en attente et enregistre le fichier produit ; False s'il était déjà pris """
+    if not claim(job_id):
+        return False
+    job = ReportJob.objects.get(pk=job_id)
+    params_serializer, build = BUILDERS[job.kind]
+    try:
+        params = params_serializer(data=job.params)
+        params.is_valid(raise_exception=True)
+        # Rapport lu sur le réplica, sauf s'il peut ne pas refléter une écriture récente
+        reads = nullcontext() if recent_ledger_write() else replica_reads()
+        with tempfile.TemporaryFile() as output, reads:
+            extension = build(params.validated_data, output)
+            output.seek(0)
+            job.file.save(f"{job.kind}_{job.pk}.{extension}", File(output), save=False)
+        job.status = ReportJob.DONE
+    except Exception as exc:
+        logger.exception("Échec du rapport %s", job_id)
+        job.status = ReportJob.FAILED
+        job.error = str(exc)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'error', 'finished_at'])
+    return True
+
+
+def fail_stale():
+    """ Marque en échec les travaux en cours depuis plus de `ACCOUNTING_REPORT_TIMEOUT` ; retourne leur nombre """
+    return ReportJob.objects.filter(status=ReportJob.RUNNING, started_at__lt=_stale_before()).update(
+        status=ReportJob.FAILED, error="Génération interrompue (délai dépassé).", finished_at=timezone.now())
+
+
+def run_pending(limit=None):
+    """
+    Marque en échec les travaux abandonnés, puis exécute les travaux en
+    attente, du plus ancien au plus récent ; retourne le nombre exécuté.
+    """
+    stale = fail_stale()
+    if stale:
+        logger.warning("%s rapport(s) abandonné(s) marqué(s) en échec", stale)
+    pending = ReportJob.objects.filter(status=ReportJob.PENDING).order_by('created_at')
+    return sum(run_job(job_id) for job_id in list(pending.values_list('pk', flat=True)[:limit]))
@@ -0,0 +1,171 @@
+"""
+Routage des lectures vers un réplica en lecture seule (`DATABASE_ROUTERS`).
+
+Les écritures et, par défaut, les lectures vont à la base principale
+(`default`). Les lectures sont envoyées au réplica configuré par
+`ACCOUNTING_REPLICA_DATABASE` seulement lorsqu'elles ont été explicitement
+autorisées pour le contexte courant :
+
+- actions en lecture (GET, HEAD, OPTIONS) des ViewSets qui héritent de
+  `ReplicaReadMixin` (listes, détails, grand livre, balance, exports,
+  analyses), y compris la lecture en flux d'un export CSV ;
+- génération des rapports asynchrones (`reports.run_job`).
+
+Cohérence avec les écritures :
+
+- un utilisateur qui vient d'écrire par l'API lit sur la base principale
+  pendant `ACCOUNTING_REPLICA_STICKY_SECONDS` (délai de réplication toléré) ;
+- dans une requête, toute écriture ramène les lectures suivantes sur la base
+  principale, comme toute lecture faite dans une transaction ouverte ;
+- pendant ce même délai après une écriture sur le grand livre, les réponses
+  lues sur le réplica ne sont pas mises en cache (`cache.cached_response`) et
+  les rapports sont lus sur la base principale.
+
+Sans réplica configuré (ou si l'alias est absent de `DATABASES`), le routeur
+est sans effet.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY, REPLICA = 'primary', 'replica'
+
+STICKY_KEY = 'accounting:replica:sticky:{}'
+LEDGER_WRITE_KEY = 'accounting:replica:ledger-write'
+
+# Destination des lectures du contexte courant (requête, thread ou tâche asynchrone)
+_route = ContextVar('accounting_db_route', default=PRIMARY)
+
+
+def replica_alias():
+    """ Alias du réplica configuré, None sans réplica """
+    alias = getattr(settings, 'ACCOUNTING_REPLICA_DATABASE', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def _sticky_seconds():
+    return getattr(settings, 'ACCOUNTING_REPLICA_STICKY_SECONDS', 5)
+
+
+def route_reads(destination):
+    """ Oriente les lectures du contexte courant (`PRIMARY` ou `REPLICA`) """
+    _route.set(destination)
+
+
+@contextmanager
+def replica_reads():
+    """ Lectures du bloc servies par le réplica (hors transaction ouverte), puis routage antérieur rétabli """
+    token = _route.set(REPLICA)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def pin_primary(user):
+    """ Lectures de `user` servies par la base principale pendant le délai de réplication """
+    if user is not None and user.is_authenticated and replica_alias() is not None:
+        cache.set(STICKY_KEY.format(user.pk), True, _sticky_seconds())
+
+
+def pinned(user):
+    """ True si `user` a écrit récemment : ses lectures restent sur la base principale """
+    return user is not None and user.is_authenticated and bool(cache.get(STICKY_KEY.format(user.pk)))
+
+
+def mark_ledger_write():
+    """ Horodate la dernière écriture sur le grand livre (appelé à chaque invalidation des comptes) """
+    if replica_alias() is not None:
+        cache.set(LEDGER_WRITE_KEY, time.time(), _sticky_seconds())
+
+
+def recent_ledger_write():
+    """ True si le grand livre a été écrit pendant le délai de réplication """
+    return cache.get(LEDGER_WRITE_KEY) is not None
+
+
+def _reads_alias():
+    """ Alias du réplica si les lectures du contexte courant y sont servies, None sinon """
+    if _route.get() != REPLICA:
+        return None
+    alias = replica_alias()
+    if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    return alias
+
+
+def replica_may_lag():
+    """ True si les lectures courantes vont au réplica et qu'il peut ne pas refléter une écriture récente """
+    return _reads_alias() is not None and recent_ledger_write()
+
+
+class ReplicaRouter:
+    """ Lectures autorisées → réplica ; écritures, migrations et lectures en transaction → base principale """
+
+    def db_for_read(self, model, **hints):
+        return _reads_alias()
+
+    def db_for_write(self, model, **hints):
+        # Après une écriture, la suite du contexte lit ce qu'elle vient d'écrire
+        if _route.get() == REPLICA:
+            _route.set(PRIMARY)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias() and db != DEFAULT_DB_ALIAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """ Chaque requête commence sur la base principale (le routage ne fuit pas d'une requête à l'autre) """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        route_reads(PRIMARY)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        route_reads(PRIMARY)
+        return await self.get_response(request)
+
+
+class ReplicaReadMixin:
+    """
+    Actions en lecture du ViewSet servies par le réplica, sauf `primary_actions`
+    et sauf pour un utilisateur qui vient d'écrire ; une écriture réussie
+    maintient son auteur sur la base principale.
+    """
+    primary_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replica = (request.method in SAFE_METHODS and getattr(self, 'action', None) not in self.primary_actions
+                   and not pinned(request.user))
+        route_reads(REPLICA if replica else PRIMARY)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and status.is_success(response.status_code):
+            pin_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,85 @@
+"""
+Recherche dans les transactions et les comptes (`?search=`, `?code_prefix=`).
+
+PostgreSQL (index créés par la migration 0009) :
+
+- libellés des transactions : recherche plein texte (`to_tsvector` en
+  français, index GIN) combinée à une recherche par fragment (`icontains`,
+  index GIN trigramme de `pg_trgm`) ;
+- intitulés des comptes : fragment, index GIN trigramme ; une transaction
+  est trouvée par l'intitulé de son compte débité ou crédité via la liste
+  des comptes correspondants, sans jointure ;
+- préfixe de code de compte (`6` → comptes de charges) : `LIKE '6%'` servi par
+  l'index `varchar_pattern_ops` que Django crée pour la colonne unique `code`.
+
+Les autres bases (SQLite) gardent les mêmes résultats par des `icontains`
+non indexés ; le préfixe de code y est lu par intervalle sur l'index unique.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connections
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Account, Transaction
+
+# Configuration plein texte des libellés (doit rester celle des index de la migration 0009)
+SEARCH_CONFIG = 'french'
+
+# Expression indexée du libellé des transactions
+DESCRIPTION_VECTOR = SearchVector('description', config=SEARCH_CONFIG)
+
+
+def _postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def code_prefix(queryset, prefix):
+    """ Condition « le code commence par `prefix` », servie par un index sur la base du queryset """
+    if _postgresql(queryset):
+        return Q(code__startswith=prefix)
+    # `LIKE … ESCAPE` n'utilise pas l'index sous SQLite : intervalle [prefix, prefix suivant[
+    return Q(code__gte=prefix, code__lt=prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+def matching_accounts(terms, using=None):
+    """ Identifiants des comptes dont l'intitulé contient `terms` """
+    return Account.objects.using(using).filter(title__icontains=terms).values('pk')
+
+
+def search_accounts(queryset, terms):
+    """ Comptes dont le code commence par `terms` ou dont l'intitulé le contient """
+    return queryset.filter(code_prefix(queryset, terms) | Q(title__icontains=terms))
+
+
+def search_transactions(queryset, terms):
+    """
+    Transactions dont le libellé correspond à `terms` (plein texte sous
+    PostgreSQL, fragment partout) ou dont un compte a un intitulé qui le contient.
+    """
+    accounts = matching_accounts(terms, using=queryset.db)
+    condition = Q(description__icontains=terms) | Q(debit_account__in=accounts) | Q(credit_account__in=accounts)
+    if _postgresql(queryset):
+        queryset = queryset.alias(document=DESCRIPTION_VECTOR)
+        condition |= Q(document=SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch'))
+    return queryset.filter(condition)
+
+
+SEARCHES = {
+    Account: search_accounts,
+    Transaction: search_transactions,
+}
+
+
+class LedgerSearchFilter(BaseFilterBackend):
+    """ Filtres `?search=` (comptes et transactions) et `?code_prefix=` (comptes) """
+    search_param = 'search'
+    prefix_param = 'code_prefix'
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = request.query_params.get(self.prefix_param, '').strip()
+        if prefix and queryset.model is Account:
+            queryset = queryset.filter(code_prefix(queryset, prefix))
+        terms = request.query_params.get(self.search_param, '').strip()
+        if terms:
+            queryset = SEARCHES[queryset.model](queryset, terms)
+        return queryset
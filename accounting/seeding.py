@@ -0,0 +1,79 @@
+"""
+Génération d'un grand livre de test (`manage.py seed_ledger`, benchmarks).
+
+Les comptes et les transactions sont insérés par `bulk_create` en lots ; les
+soldes des comptes sont appliqués en fin de génération par variations
+groupées, les cumuls mensuels reconstruits en une passe et le journal
+alimenté par lots, comme le ferait un import. Le générateur est déterministe
+pour une graine donnée.
+"""
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .balances import rebuild_snapshots
+from .models import Account, JournalEntry, Transaction
+
+# Classes du plan comptable utilisées pour les comptes générés : (préfixe du code, type)
+ACCOUNT_CLASSES = (
+    ('5', 'Actif'),
+    ('4', 'Actif'),
+    ('4', 'Passif'),
+    ('7', 'Produit'),
+    ('6', 'Charge'),
+)
+
+# Nombre de comptes par UPDATE des soldes
+BALANCE_CHUNK_SIZE = 1000
+
+
+def seed_ledger(accounts=200, transactions=100_000, start=date(2024, 1, 1), days=730, seed=42,
+                batch_size=5000, username='seed-ledger', journal=True):
+    """
+    Crée `accounts` comptes et `transactions` transactions à dates croissantes
+    sur `days` jours à partir de `start`. Retourne `(comptes, nombre de transactions)`.
+    """
+    rng = random.Random(seed)
+    user, _ = User.objects.get_or_create(username=username)
+    with transaction.atomic():
+        offset = Account.objects.count()
+        classes = [ACCOUNT_CLASSES[i % len(ACCOUNT_CLASSES)] for i in range(accounts)]
+        created = Account.objects.bulk_create(
+            (Account(code=f"{prefix}{offset + i:06d}", title=f"Compte généré {offset + i}", type=account_type)
+             for i, (prefix, account_type) in enumerate(classes)),
+            batch_size=batch_size,
+        )
+        account_ids = [account.pk for account in created]
+
+        deltas = defaultdict(Decimal)
+        batch = []
+        for index in range(transactions):
+            debit, credit = rng.sample(account_ids, 2)
+            amount = Decimal(rng.randint(100, 1_000_000)) / 100
+            batch.append(Transaction(date=start + timedelta(days=index * days // max(transactions, 1)),
+                                     description=f"Écriture générée {index}", amount=amount,
+                                     debit_account_id=debit, credit_account_id=credit, user=user))
+            deltas[debit] -= amount
+            deltas[credit] += amount
+            if len(batch) == batch_size:
+                _insert(batch, journal)
+                batch = []
+        if batch:
+            _insert(batch, journal)
+
+        ids = sorted(deltas)
+        for chunk_start in range(0, len(ids), BALANCE_CHUNK_SIZE):
+            chunk = ids[chunk_start:chunk_start + BALANCE_CHUNK_SIZE]
+            Account.objects.apply_balance_deltas({account_id: deltas[account_id] for account_id in chunk})
+        rebuild_snapshots(batch_size=batch_size)
+    return created, transactions
+
+
+def _insert(batch, journal):
+    Transaction.objects.bulk_create(batch)
+    if journal:
+        JournalEntry.objects.record(batch, JournalEntry.CREATE, batch_size=len(batch))
@@ -1,5 +1,15 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Account, Transaction, JournalEntry
+from .currency import MissingRateError, balance_currency, convert, exchange_rate, format_amount
+from .models import (Account, ClosedPeriodError, FiscalYear, Transaction, JournalEntry, ReportJob, Voucher,
+                     functional_currency)
+from .vouchers import post_voucher
+
+ZERO = Decimal('0.00')
 
 class AccountSerializer(serializers.ModelSerializer):
     """ Sérializer pour le modèle Account avec affichage du solde formaté """
@@ -11,40 +21,317 @@ class AccountSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'code', 'type', 'balance', 'formatted_balance']
     
     def get_formatted_balance(self, obj):
-        """ Retourne le solde formaté avec deux décimales et un séparateur de milliers """
-        return f"{obj.balance:,.2f} €"
+        """ Retourne le solde formaté avec deux décimales, un séparateur de milliers et la devise fonctionnelle """
+        return format_amount(obj.balance)
+
+def closed_period(exc):
+    """ `ClosedPeriodError` levée à la comptabilisation → erreur de validation sur la date """
+    return serializers.ValidationError({'date': exc.messages})
+
+def validate_transaction_rules(debit_account, credit_account, amount):
+    """ Règles comptables d'une transaction, partagées par la saisie unitaire et l'import en masse """
+    if amount <= 0:
+        raise serializers.ValidationError("Le montant de la transaction doit être positif.")
+
+    if debit_account == credit_account:
+        raise serializers.ValidationError("Le compte débité et crédité doivent être différents.")
+
+def currency_error(exc):
+    """ `MissingRateError` → erreur de validation sur la devise """
+    return serializers.ValidationError({'currency': exc.messages})
+
+def apply_exchange_rate(data, rate):
+    """
+    Montant en devise fonctionnelle d'une saisie : `amount` tel quel en devise
+    fonctionnelle, `currency_amount` converti au taux `rate` sinon. En devise
+    étrangère, un `amount` fourni qui diffère de la conversion est refusé
+    (il n'est jamais remplacé sans le dire).
+    """
+    if data['currency'] == functional_currency():
+        if data.get('amount') is None:
+            raise serializers.ValidationError({'amount': [serializers.Field.default_error_messages['required']]})
+        data['currency_amount'] = None
+        return data
+    if data.get('currency_amount') is None:
+        raise serializers.ValidationError(
+            {'currency_amount': [f"Montant en {data['currency']} requis pour une transaction dans cette devise."]})
+    amount = convert(data['currency_amount'], rate)
+    if data.get('amount') is not None and data['amount'] != amount:
+        raise serializers.ValidationError({'amount': [
+            f"En {data['currency']}, le montant est calculé depuis currency_amount ({amount} au taux du jour) : "
+            f"modifiez currency_amount plutôt que amount."]})
+    data['amount'] = amount
+    return data
 
 class TransactionSerializer(serializers.ModelSerializer):
     """ Sérializer pour le modèle Transaction avec validations et affichage des noms de comptes """
 
     debit_account_name = serializers.CharField(source='debit_account.title', read_only=True)
     credit_account_name = serializers.CharField(source='credit_account.title', read_only=True)
+    currency = serializers.RegexField(r'^[A-Z]{3}$', required=False)
 
     class Meta:
         model = Transaction
         fields = ['id', 'date', 'description', 'debit_account', 'debit_account_name', 
-                  'credit_account', 'credit_account_name', 'amount', 'user']
+                  'credit_account', 'credit_account_name', 'amount', 'currency', 'currency_amount', 'user', 'voucher']
+        read_only_fields = ['voucher']
+        # En devise étrangère, `amount` est calculé depuis `currency_amount`
+        extra_kwargs = {'amount': {'required': False}}
     
     def validate(self, data):
-        """ Vérification des règles comptables avant enregistrement """
-        debit_account = data.get('debit_account')
-        credit_account = data.get('credit_account')
-        amount = data.get('amount')
+        """ Conversion en devise fonctionnelle et vérification des règles comptables avant enregistrement """
+        # Modification partielle : les champs absents gardent leur valeur enregistrée
+        for name in ('date', 'debit_account', 'credit_account', 'currency_amount'):
+            if name not in data and self.instance is not None:
+                data[name] = getattr(self.instance, name)
+        data['currency'] = data.get('currency') or getattr(self.instance, 'currency', None) or functional_currency()
+        # En devise étrangère, le montant enregistré n'est pas repris : il est recalculé depuis `currency_amount`
+        if 'amount' not in data and self.instance is not None and data['currency'] == functional_currency():
+            data['amount'] = self.instance.amount
+        try:
+            rate = exchange_rate(data['currency'], data['date'])
+        except MissingRateError as exc:
+            raise currency_error(exc)
+        apply_exchange_rate(data, rate)
+        validate_transaction_rules(data.get('debit_account'), data.get('credit_account'), data.get('amount'))
+        return data
 
-        if amount <= 0:
-            raise serializers.ValidationError("Le montant de la transaction doit être positif.")
+    # Exercice clos : contrôlé au moment de la comptabilisation, sous le verrou des comptes
+    def create(self, validated_data):
+        try:
+            return super().create(validated_data)
+        except ClosedPeriodError as exc:
+            raise closed_period(exc)
 
-        if debit_account == credit_account:
-            raise serializers.ValidationError("Le compte débité et crédité doivent être différents.")
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except ClosedPeriodError as exc:
+            raise closed_period(exc)
 
+class VoucherLineSerializer(serializers.Serializer):
+    """ Ligne d'une pièce comptable : un compte, un montant au débit ou au crédit """
+
+    # Identifiant simple : l'existence des comptes est vérifiée en une requête pour toute la pièce
+    account = serializers.IntegerField()
+    debit = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=ZERO, default=ZERO)
+    credit = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=ZERO, default=ZERO)
+
+    def validate(self, data):
+        if bool(data['debit']) == bool(data['credit']):
+            raise serializers.ValidationError("Chaque ligne doit porter un montant soit au débit, soit au crédit.")
+        return data
+
+class VoucherSerializer(serializers.ModelSerializer):
+    """ Sérializer des pièces comptables : lignes saisies en écriture, lignes par compte en lecture """
+
+    lines = VoucherLineSerializer(many=True, min_length=2, write_only=True)
+    currency = serializers.RegexField(r'^[A-Z]{3}$', required=False)
+
+    class Meta:
+        model = Voucher
+        fields = ['id', 'reference', 'kind', 'date', 'description', 'currency', 'lines', 'user', 'created_at']
+        read_only_fields = ['kind', 'user']
+
+    def validate(self, data):
+        """ Lignes en devise étrangère : un taux doit être connu à la date de la pièce """
+        data['currency'] = data.get('currency') or functional_currency()
+        try:
+            exchange_rate(data['currency'], data['date'])
+        except MissingRateError as exc:
+            raise currency_error(exc)
+        return data
+
+    def validate_lines(self, lines):
+        """ Équilibre débit / crédit et existence des comptes (une seule requête) """
+        debit = sum(line['debit'] for line in lines)
+        credit = sum(line['credit'] for line in lines)
+        if debit != credit:
+            raise serializers.ValidationError(f"La pièce n'est pas équilibrée : débit {debit} ≠ crédit {credit}.")
+        account_ids = {line['account'] for line in lines}
+        if len(account_ids) < 2:
+            raise serializers.ValidationError("Une pièce mouvemente au moins deux comptes.")
+        missing = account_ids - set(Account.objects.filter(pk__in=account_ids).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Comptes inconnus : {', '.join(map(str, sorted(missing)))}.")
+        return lines
+
+    def create(self, validated_data):
+        lines = [(line['account'], line['debit'], line['credit']) for line in validated_data.pop('lines')]
+        try:
+            return post_voucher(lines=lines, **validated_data)
+        except ClosedPeriodError as exc:
+            raise closed_period(exc)
+
+    def to_representation(self, instance):
+        """ Les lignes sont reconstituées par compte (dans la devise de la pièce) à partir de ses transactions """
+        data = super().to_representation(instance)
+        totals = defaultdict(lambda: [ZERO, ZERO])
+        transactions = list(instance.transactions.all())
+        for txn in transactions:
+            amount = txn.amount if txn.currency_amount is None else txn.currency_amount
+            totals[txn.debit_account_id][0] += amount
+            totals[txn.credit_account_id][1] += amount
+        data['lines'] = VoucherLineSerializer(
+            [{'account': account, 'debit': debit, 'credit': credit} for account, (debit, credit) in totals.items()],
+            many=True).data
+        data['transactions'] = [txn.pk for txn in transactions]
+        return data
+
+class FiscalYearSerializer(serializers.ModelSerializer):
+    """ Sérializer des exercices comptables ; statut et pièces de clôture en lecture seule """
+
+    class Meta:
+        model = FiscalYear
+        fields = ['id', 'start', 'end', 'status', 'closing_voucher', 'opening_voucher', 'closed_at', 'closed_by']
+        read_only_fields = ['status', 'closing_voucher', 'opening_voucher', 'closed_at', 'closed_by']
+
+    def validate(self, data):
+        """ Mois entiers, sans chevauchement (règles du modèle) """
+        try:
+            FiscalYear(**data).clean()
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
         return data
 
 class JournalEntrySerializer(serializers.ModelSerializer):
     """ Sérializer pour le modèle JournalEntry avec affichage du nom de l'utilisateur """
     
-    transaction_description = serializers.CharField(source='transaction.description', read_only=True)
+    # Copie de la description enregistrée dans l'entrée : la transaction a pu être modifiée ou supprimée
+    transaction_description = serializers.CharField(source='description', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
 
     class Meta:
         model = JournalEntry
-        fields = ['id', 'transaction', 'transaction_description', 'created_at', 'user', 'user_name']
+        fields = ['id', 'transaction', 'action', 'date', 'transaction_description', 'debit_account',
+                  'credit_account', 'amount', 'created_at', 'user', 'user_name']
+
+class BalanceRowSerializer(serializers.Serializer):
+    """ Sérializer d'une ligne de la balance comptable (lecture seule) """
+
+    account_id = serializers.IntegerField()
+    code = serializers.CharField()
+    title = serializers.CharField()
+    opening_balance = serializers.DecimalField(max_digits=15, decimal_places=2)
+    debit = serializers.DecimalField(max_digits=15, decimal_places=2)
+    credit = serializers.DecimalField(max_digits=15, decimal_places=2)
+    closing_balance = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+class BalancePeriodSerializer(serializers.Serializer):
+    """ Paramètres de période de la balance (`?date_from=AAAA-MM-JJ&date_to=AAAA-MM-JJ`) """
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        date_from = data.get('date_from')
+        date_to = data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError("La date de début doit précéder la date de fin.")
+        return data
+
+class BalanceCurrencySerializer(BalancePeriodSerializer):
+    """ Paramètres de la balance avec devise de présentation (`?currency=USD`, taux à la date de fin) """
+
+    currency = serializers.RegexField(r'^[A-Z]{3}$', required=False)
+
+    def validate(self, data):
+        data = super().validate(data)
+        currency, day = balance_currency(data)
+        if currency is not None:
+            try:
+                exchange_rate(currency, day)
+            except MissingRateError as exc:
+                raise currency_error(exc)
+        return data
+
+class BalanceExportSerializer(BalanceCurrencySerializer):
+    """ Paramètres de l'export de la balance : période, devise et format du fichier """
+
+    file_format = serializers.ChoiceField(choices=['xlsx', 'csv'], default='xlsx')
+
+class AccountHistorySerializer(serializers.Serializer):
+    """ Sérializer d'une ligne de l'historique mensuel d'un compte (lecture seule) """
+
+    period = serializers.DateField()
+    opening_balance = serializers.DecimalField(max_digits=18, decimal_places=2)
+    debit = serializers.DecimalField(max_digits=18, decimal_places=2)
+    credit = serializers.DecimalField(max_digits=18, decimal_places=2)
+    closing_balance = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+class LedgerLineSerializer(serializers.Serializer):
+    """ Sérializer d'une ligne du grand livre d'un compte, avec solde progressif (lecture seule) """
+
+    id = serializers.IntegerField()
+    date = serializers.DateField()
+    description = serializers.CharField()
+    counterpart_account = serializers.IntegerField()
+    debit = serializers.DecimalField(max_digits=15, decimal_places=2)
+    credit = serializers.DecimalField(max_digits=15, decimal_places=2)
+    running_balance = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+class LedgerPageSerializer(serializers.Serializer):
+    """ Sérializer d'une page du grand livre : solde d'ouverture, lien suivant et lignes """
+
+    account = serializers.IntegerField()
+    opening_balance = serializers.DecimalField(max_digits=18, decimal_places=2)
+    next = serializers.URLField(allow_null=True)
+    results = LedgerLineSerializer(many=True)
+
+class BalanceSheetParamsSerializer(serializers.Serializer):
+    """ Paramètres du bilan : date d'arrêté (`?date=AAAA-MM-JJ`, tout l'historique par défaut) """
+
+    date = serializers.DateField(required=False)
+
+class PnlRowSerializer(serializers.Serializer):
+    """ Sérializer d'un mois du compte de résultat (lecture seule) """
+
+    period = serializers.DateField()
+    revenue = serializers.DecimalField(max_digits=18, decimal_places=2)
+    expenses = serializers.DecimalField(max_digits=18, decimal_places=2)
+    result = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+class BalanceSheetRowSerializer(serializers.Serializer):
+    """ Sérializer des totaux du bilan par type de compte (lecture seule) """
+
+    type = serializers.CharField()
+    debit = serializers.DecimalField(max_digits=18, decimal_places=2)
+    credit = serializers.DecimalField(max_digits=18, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+class CashFlowRowSerializer(serializers.Serializer):
+    """ Sérializer d'un mois du tableau des flux de trésorerie (lecture seule) """
+
+    period = serializers.DateField()
+    inflow = serializers.DecimalField(max_digits=18, decimal_places=2)
+    outflow = serializers.DecimalField(max_digits=18, decimal_places=2)
+    net = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """ Sérializer d'une demande de rapport asynchrone ; `params` est validé selon le type de rapport """
+
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'kind', 'params', 'status', 'error', 'created_at', 'finished_at', 'download_url']
+        read_only_fields = ['status', 'error', 'created_at', 'finished_at']
+
+    def validate(self, data):
+        params = REPORT_PARAMS[data.get('kind', 'balance')](data=data.get('params', {}))
+        params.is_valid(raise_exception=True)
+        # Forme normalisée (dates ISO, valeurs par défaut) : base de l'empreinte de dédoublonnage
+        data['params'] = params.data
+        return data
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.DONE:
+            return None
+        request = self.context.get('request')
+        url = reverse('report-download', args=[obj.pk])
+        return request.build_absolute_uri(url) if request else url
+
+# Paramètres acceptés par type de rapport
+REPORT_PARAMS = {
+    'balance': BalanceExportSerializer,
+}
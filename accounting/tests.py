@@ -1,3 +1,1253 @@
-from django.test import TestCase
+import csv
+import gzip
+import itertools
+import json
+import random
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.conf import settings
+from django.db import connection, connections, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .analytics import balance_sheet, cash_flow, monthly_pnl
+from . import authentication, reconcile
+from .benchmarks import compare, run_suite, startup
+from .balances import account_history, balance_rows, rebuild_snapshots
+from .journal import archive_before
+from .metrics import RequestMetrics, _current, registry
+from .currency import load_rates
+from .idempotency import purge_expired
+from .models import (Account, AppendOnlyError, ArchivedTransaction, BalanceSnapshot, FiscalYear, IdempotencyKey,
+                     JournalEntry, ReconciliationRun, ReportJob, Transaction, Voucher)
+from .reports import run_pending
+from .routers import ReplicaRouter
+from .serializers import VoucherSerializer
+from .seeding import seed_ledger
+from .vouchers import split_lines
+
+
+class LedgerTestMixin:
+    """ Outils communs : création de comptes et de transactions de test """
+
+    def make_account(self, code, type='Actif'):
+        return Account.objects.create(code=code, title=f"Compte {code}", type=type)
+
+    def post(self, debit, credit, amount, day=date(2025, 1, 15), description="Écriture"):
+        return Transaction.objects.create(date=day, description=description, debit_account=debit,
+                                          credit_account=credit, amount=Decimal(amount), user=self.user)
+
+
+class BalanceEngineTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.client_account = self.make_account('411')
+        self.sales = self.make_account('706', type='Produit')
+
+    def test_totals_match_ledger(self):
+        self.post(self.bank, self.sales, '100.00')
+        self.post(self.client_account, self.sales, '50.00')
+        self.post(self.bank, self.client_account, '20.00')
+
+        rows = {row['code']: row for row in balance_rows()}
+        self.assertEqual(rows['512']['debit'], Decimal('120.00'))
+        self.assertEqual(rows['512']['credit'], Decimal('0'))
+        self.assertEqual(rows['706']['credit'], Decimal('150.00'))
+        self.assertEqual(rows['411']['opening_balance'], Decimal('0'))
+        self.assertEqual(rows['411']['closing_balance'], Decimal('-30.00'))
+
+    def test_query_count_is_independent_of_account_count(self):
+        for i in range(20):
+            self.post(self.make_account(f"60{i}", type='Charge'), self.bank, '1.00')
+        with self.assertNumQueries(3):
+            # Début de la période ouverte, cumuls mensuels groupés par compte, parcours des comptes
+            list(balance_rows())
+
+    def test_period_balances_come_from_the_ledger(self):
+        self.post(self.bank, self.sales, '100.00', day=date(2024, 12, 20))
+        self.post(self.bank, self.sales, '40.00', day=date(2025, 1, 10))
+        self.post(self.bank, self.sales, '5.00', day=date(2025, 2, 1))
+
+        rows = {row['code']: row for row in balance_rows(date_from=date(2025, 1, 1), date_to=date(2025, 1, 31))}
+        self.assertEqual(rows['706']['opening_balance'], Decimal('100.00'))
+        self.assertEqual(rows['706']['credit'], Decimal('40.00'))
+        self.assertEqual(rows['706']['closing_balance'], Decimal('140.00'))
+        self.assertEqual(rows['512']['closing_balance'], Decimal('-140.00'))
+
+    def test_snapshots_follow_postings_updates_and_deletes(self):
+        first = self.post(self.bank, self.sales, '100.00', day=date(2025, 1, 10))
+        self.post(self.bank, self.sales, '40.00', day=date(2025, 2, 3))
+        first.date = date(2025, 2, 20)
+        first.save()
+        self.post(self.client_account, self.sales, '7.00', day=date(2025, 3, 1)).delete()
+
+        snapshots = {(snapshot.account_id, snapshot.period): (snapshot.debit, snapshot.credit)
+                     for snapshot in BalanceSnapshot.objects.exclude(debit=0, credit=0)}
+        self.assertEqual(snapshots, {
+            (self.bank.pk, date(2025, 2, 1)): (Decimal('140.00'), Decimal('0')),
+            (self.sales.pk, date(2025, 2, 1)): (Decimal('0'), Decimal('140.00')),
+        })
+
+        rebuild_snapshots()
+        self.assertEqual(BalanceSnapshot.objects.count(), 2)
+        rows = {row['code']: row for row in balance_rows(date_from=date(2025, 2, 4), date_to=date(2025, 2, 28))}
+        self.assertEqual(rows['706']['opening_balance'], Decimal('40.00'))
+        self.assertEqual(rows['706']['credit'], Decimal('100.00'))
+
+    def test_account_history(self):
+        self.post(self.bank, self.sales, '100.00', day=date(2024, 12, 20))
+        self.post(self.bank, self.sales, '40.00', day=date(2025, 1, 10))
+        self.post(self.sales, self.bank, '15.00', day=date(2025, 1, 12))
+
+        history = list(account_history(self.sales, date_from=date(2025, 1, 5)))
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0]['period'], date(2025, 1, 1))
+        self.assertEqual(history[0]['opening_balance'], Decimal('100.00'))
+        self.assertEqual(history[0]['closing_balance'], Decimal('125.00'))
+
+    def test_account_ledger_running_balance_and_cursor(self):
+        self.post(self.bank, self.sales, '100.00', day=date(2024, 12, 20))
+        self.post(self.bank, self.sales, '40.00', day=date(2025, 1, 10))
+        self.post(self.sales, self.bank, '15.00', day=date(2025, 1, 10))
+        self.post(self.client_account, self.sales, '7.00', day=date(2025, 1, 12))
+        self.post(self.bank, self.client_account, '1.00', day=date(2025, 1, 13))
+        api = APIClient()
+        api.force_authenticate(self.user)
+        url = f'/api/accounts/{self.sales.pk}/ledger/'
+
+        response = api.get(url, {'date_from': '2025-01-01', 'cursor': '', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['opening_balance']), Decimal('100.00'))
+        self.assertEqual([Decimal(line['running_balance']) for line in response.data['results']],
+                         [Decimal('140.00'), Decimal('125.00')])
+        self.assertEqual(response.data['results'][1]['counterpart_account'], self.bank.pk)
+
+        response = api.get(response.data['next'])
+        self.assertEqual(Decimal(response.data['opening_balance']), Decimal('125.00'))
+        self.assertEqual([Decimal(line['running_balance']) for line in response.data['results']],
+                         [Decimal('132.00')])
+        self.assertIsNone(response.data['next'])
+
+        self.assertEqual(api.get(url, {'cursor': 'invalide'}).status_code, 404)
+
+    def test_export_balance_streams_csv(self):
+        self.post(self.bank, self.sales, '100.00')
+        api = APIClient()
+        api.force_authenticate(self.user)
+        response = api.get('/api/export-balance/export_balance/',
+                           {'file_format': 'csv', 'date_from': '2025-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        sales = next(line.split(';') for line in lines if line.startswith('706;'))
+        self.assertEqual([Decimal(value) for value in sales[2:]], [0, 0, 100, 100])
+
+        response = api.get('/api/export-balance/export_balance/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+        response = api.get('/api/export-balance/export_balance/', {'date_from': '2025-02-01', 'date_to': '2025-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_balance_endpoint(self):
+        self.post(self.bank, self.sales, '100.00')
+        api = APIClient()
+        api.force_authenticate(self.user)
+        response = api.get('/api/balance/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+
+
+class PostingTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.client_account = self.make_account('411')
+        self.sales = self.make_account('706', type='Produit')
+
+    def assertBalances(self, **expected):
+        for code, balance in expected.items():
+            self.assertEqual(Account.objects.get(code=code.lstrip('_')).balance, Decimal(balance), code)
+
+    def test_create_applies_deltas(self):
+        self.post(self.bank, self.sales, '100.00')
+        self.assertBalances(_512='-100.00', _706='100.00')
+
+    def test_update_reverses_previous_version(self):
+        transaction = self.post(self.bank, self.sales, '100.00')
+        transaction.amount = Decimal('30.00')
+        transaction.save()
+        self.assertBalances(_512='-30.00', _706='30.00')
+
+        transaction.credit_account = self.client_account
+        transaction.save()
+        self.assertBalances(_512='-30.00', _706='0.00', _411='30.00')
+
+    def test_delete_reverts_balances(self):
+        self.post(self.bank, self.sales, '100.00').delete()
+        self.post(self.bank, self.client_account, '10.00')
+        Transaction.objects.filter(credit_account=self.client_account).delete()
+        self.assertBalances(_512='0.00', _706='0.00', _411='0.00')
+
+    def test_cascade_from_deleted_accounts_reads_them_once(self):
+        for _ in range(5):
+            self.post(self.bank, self.sales, '1.00')
+            self.post(self.bank, self.client_account, '2.00')
+        with CaptureQueriesContext(connection) as queries:
+            Account.objects.filter(code__in=['706', '411']).delete()
+        # Le QuerySet d'origine n'est lu qu'une fois (collecte), quel que soit le nombre de transactions
+        self.assertEqual(len([query for query in queries if '"accounting_account"."code"' in query['sql']]), 1)
+        self.assertBalances(_512='0.00')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_posting_only_updates_balances(self):
+        self.post(self.bank, self.sales, '1.00')
+        with self.assertNumQueries(9):
+            # SAVEPOINT, INSERT, SELECT ... FOR UPDATE, UPDATE des soldes, contrôle de l'exercice clos,
+            # UPDATE des deux cumuls mensuels, INSERT du journal, RELEASE SAVEPOINT
+            self.post(self.bank, self.sales, '1.00')
+
+
+class ConcurrentPostingTests(LedgerTestMixin, TransactionTestCase):
+    """ Écritures concurrentes A→B / B→A depuis plusieurs threads """
+
+    threads = 8
+    postings_per_thread = 25
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Une base SQLite en mémoire ne peut pas être partagée entre threads")
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.accounts = [self.make_account(code) for code in ('401', '411', '512', '530')]
+
+    def test_concurrent_postings_keep_balances_consistent(self):
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(self.postings_per_thread):
+                    debit, credit = rng.sample(self.accounts, 2)
+                    self.post(debit, credit, f"{rng.randint(1, 500)}.{rng.randint(0, 99):02d}")
+            except Exception as exc:  # pragma: no cover - remonté par l'assertion ci-dessous
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Transaction.objects.count(), self.threads * self.postings_per_thread)
+        rows = {row['account_id']: row for row in balance_rows()}
+        for account in Account.objects.all():
+            self.assertEqual(account.balance, rows[account.pk]['closing_balance'], account.code)
+        self.assertEqual(sum(account.balance for account in Account.objects.all()), 0)
+
+    def test_parallel_reconciliation_repairs_drift(self):
+        self.post(self.accounts[0], self.accounts[1], '40.00')
+        self.post(self.accounts[2], self.accounts[3], '15.00')
+        Account.objects.filter(pk__in=[self.accounts[1].pk, self.accounts[2].pk]).update(balance=Decimal('1.00'))
+
+        checked, drifts = reconcile.reconcile(repair=True, chunk_size=1, workers=2)
+        self.assertEqual((checked, sorted(drift.code for drift in drifts)), (4, ['411', '512']))
+        balances = dict(Account.objects.values_list('code', 'balance'))
+        self.assertEqual((balances['411'], balances['512']), (Decimal('40.00'), Decimal('-15.00')))
+
+
+class BulkImportTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def line(self, amount='10.00', **overrides):
+        data = {'date': '2025-01-31', 'description': "Relevé", 'debit_account': self.bank.pk,
+                'credit_account': self.sales.pk, 'amount': amount}
+        data.update(overrides)
+        return data
+
+    def test_json_batch_updates_each_account_once(self):
+        lines = [self.line() for _ in range(50)]
+        with self.assertNumQueries(11):
+            # SELECT comptes, SAVEPOINT, INSERT, SELECT ... FOR UPDATE, UPDATE des soldes, contrôle de l'exercice clos,
+            # UPDATE (sans effet) puis INSERT groupé des deux cumuls mensuels, INSERT du journal, RELEASE
+            response = self.api.post('/api/transactions/bulk/', lines, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 50})
+        self.assertEqual(Account.objects.get(pk=self.sales.pk).balance, Decimal('500.00'))
+        self.assertEqual(Account.objects.get(pk=self.bank.pk).balance, Decimal('-500.00'))
+
+    def test_csv_batch(self):
+        body = ("date;description;debit_account;credit_account;amount\n"
+                f"2025-01-31;Virement;{self.bank.pk};{self.sales.pk};12.50\n")
+        response = self.api.post('/api/transactions/bulk/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Transaction.objects.get().amount, Decimal('12.50'))
+
+    def test_invalid_batch_is_rejected_with_row_errors(self):
+        lines = [self.line(), self.line(amount='-1'), self.line(credit_account=self.bank.pk),
+                 self.line(debit_account=9999, date='pas une date')]
+        response = self.api.post('/api/transactions/bulk/', lines, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(set(response.data['errors'][2]['errors']), {'date', 'debit_account'})
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(Account.objects.get(pk=self.bank.pk).balance, 0)
+
+
+class VoucherTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.customer = self.make_account('411')
+        self.sales = self.make_account('706', type='Produit')
+        self.vat = self.make_account('44571', type='Passif')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def invoice(self, amount='100.00', vat='20.00', total='120.00'):
+        return {'reference': 'F-001', 'date': '2025-01-15', 'description': "Facture F-001", 'lines': [
+            {'account': self.customer.pk, 'debit': total},
+            {'account': self.sales.pk, 'credit': amount},
+            {'account': self.vat.pk, 'credit': vat},
+        ]}
+
+    def test_split_lines_pairs_debits_with_credits(self):
+        lines = [(1, Decimal('120'), Decimal('0')), (2, Decimal('0'), Decimal('100')), (3, Decimal('0'), Decimal('20')),
+                 (2, Decimal('5'), Decimal('0')), (4, Decimal('0'), Decimal('5'))]
+        self.assertEqual(split_lines(lines), [(1, 2, Decimal('95')), (1, 3, Decimal('20')), (1, 4, Decimal('5'))])
+
+    def test_voucher_is_posted_in_one_pass(self):
+        self.api.post('/api/vouchers/', self.invoice(), format='json')
+        with self.assertNumQueries(13):
+            # SELECT comptes, SAVEPOINT, INSERT pièce, INSERT groupé des transactions, SELECT ... FOR UPDATE,
+            # UPDATE des soldes, contrôle de l'exercice clos, UPDATE des trois cumuls mensuels, INSERT du journal, RELEASE, lecture des lignes
+            response = self.api.post('/api/vouchers/', self.invoice(), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual({line['account']: (line['debit'], line['credit']) for line in response.data['lines']}, {
+            self.customer.pk: ('120.00', '0.00'), self.sales.pk: ('0.00', '100.00'), self.vat.pk: ('0.00', '20.00'),
+        })
+        self.assertEqual(len(response.data['transactions']), 2)
+
+        balances = dict(Account.objects.values_list('code', 'balance'))
+        self.assertEqual(balances, {'411': Decimal('-240.00'), '706': Decimal('200.00'), '44571': Decimal('40.00')})
+        self.assertEqual(JournalEntry.objects.count(), 4)
+
+    def test_unbalanced_voucher_is_rejected(self):
+        response = self.api.post('/api/vouchers/', self.invoice(total='119.99'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('lines', response.data)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class IdempotencyTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.data = {'date': '2025-01-31', 'description': "Facture 42", 'debit_account': self.bank.pk,
+                     'credit_account': self.sales.pk, 'amount': '80.00', 'user': self.user.pk}
+
+    def test_retry_with_same_key_posts_once(self):
+        first = self.api.post('/api/transactions/', self.data, format='json', HTTP_IDEMPOTENCY_KEY='facture-42')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.api.post('/api/transactions/', self.data, format='json', HTTP_IDEMPOTENCY_KEY='facture-42')
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        # Rejeu servi par la clé seule : ni verrou ni lecture des comptes
+        self.assertFalse([query for query in queries if 'accounting_account' in query['sql']])
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(Account.objects.get(pk=self.sales.pk).balance, Decimal('80.00'))
+
+        other = self.api.post('/api/transactions/', {**self.data, 'amount': '90.00'}, format='json',
+                              HTTP_IDEMPOTENCY_KEY='facture-42')
+        self.assertEqual(other.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_request_does_not_keep_key_and_bulk_is_idempotent(self):
+        invalid = self.api.post('/api/transactions/bulk/', [{**self.data, 'amount': '-1'}], format='json',
+                                HTTP_IDEMPOTENCY_KEY='releve-01')
+        self.assertEqual(invalid.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        for _ in range(2):
+            response = self.api.post('/api/transactions/bulk/', [self.data, self.data], format='json',
+                                     HTTP_IDEMPOTENCY_KEY='releve-01')
+            self.assertEqual(response.data, {'created': 2})
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(Account.objects.get(pk=self.bank.pk).balance, Decimal('-160.00'))
+
+    def test_expired_keys_are_purged(self):
+        self.api.post('/api/transactions/', self.data, format='json', HTTP_IDEMPOTENCY_KEY='facture-42')
+        IdempotencyKey.objects.update(expires_at=datetime.now(dt_timezone.utc) - timedelta(seconds=1))
+        self.assertEqual(purge_expired(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class CurrencyTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        load_rates([('USD', date(2025, 1, 1), Decimal('0.9')), ('USD', date(2025, 2, 1), Decimal('0.8')),
+                    ('XOF', date(2025, 1, 1), Decimal('0.00152449'))])
+
+    def test_foreign_currency_posting_keeps_functional_balances(self):
+        response = self.api.post('/api/transactions/', {
+            'date': '2025-01-20', 'description': "Facture US", 'debit_account': self.bank.pk,
+            'credit_account': self.sales.pk, 'currency': 'USD', 'currency_amount': '100.00', 'user': self.user.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Dernier taux connu au 20 janvier : celui du 1er janvier
+        self.assertEqual((response.data['amount'], response.data['currency_amount']), ('90.00', '100.00'))
+        self.assertEqual(Account.objects.get(pk=self.sales.pk).balance, Decimal('90.00'))
+        self.assertEqual(self.api.get(f'/api/accounts/{self.sales.pk}/').data['formatted_balance'], "90.00 €")
+
+        voucher = self.api.post('/api/vouchers/', {
+            'date': '2025-02-03', 'description': "Facture XOF", 'currency': 'XOF',
+            'lines': [{'account': self.bank.pk, 'debit': '65596'}, {'account': self.sales.pk, 'credit': '65596'}],
+        }, format='json')
+        self.assertEqual(voucher.status_code, 201)
+        self.assertEqual(voucher.data['lines'][0]['debit'], '65596.00')
+        self.assertEqual(Account.objects.get(pk=self.sales.pk).balance, Decimal('190.00'))
+
+        missing = self.api.post('/api/transactions/', {
+            'date': '2024-12-31', 'description': "Avant le premier taux", 'debit_account': self.bank.pk,
+            'credit_account': self.sales.pk, 'currency': 'USD', 'currency_amount': '10.00', 'user': self.user.pk,
+        }, format='json')
+        self.assertEqual(missing.status_code, 400)
+        self.assertIn('currency', missing.data)
+
+    def test_partial_updates_keep_accounts_and_never_drop_the_amount(self):
+        local = self.post(self.bank, self.sales, '80.00')
+        response = self.api.patch(f'/api/transactions/{local.pk}/', {'description': "Libellé corrigé"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['debit_account'], response.data['amount']), (self.bank.pk, '80.00'))
+
+        foreign = self.api.post('/api/transactions/', {
+            'date': '2025-01-20', 'description': "Facture US", 'debit_account': self.bank.pk,
+            'credit_account': self.sales.pk, 'currency': 'USD', 'currency_amount': '100.00', 'user': self.user.pk,
+        }, format='json').data
+        # `amount` seul en devise étrangère : refusé, au lieu d'être recalculé sans le dire
+        response = self.api.patch(f"/api/transactions/{foreign['id']}/", {'amount': '50.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.data)
+        response = self.api.patch(f"/api/transactions/{foreign['id']}/", {'currency_amount': '200.00'},
+                                  format='json')
+        self.assertEqual((response.status_code, response.data['amount']), (200, '180.00'))
+
+    def test_bulk_import_reads_rates_once_per_currency(self):
+        lines = [{'date': f'2025-01-{day:02d}', 'description': "Relevé", 'debit_account': self.bank.pk,
+                  'credit_account': self.sales.pk, 'currency': currency, 'currency_amount': '10.00'}
+                 for day in range(1, 29) for currency in ('USD', 'XOF')]
+        lines.append({'date': '2025-02-01', 'description': "Relevé", 'debit_account': self.bank.pk,
+                      'credit_account': self.sales.pk, 'amount': '5.00'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.post('/api/transactions/bulk/', lines, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len([query for query in queries if 'accounting_exchangerate' in query['sql']]), 2)
+        self.assertEqual(Account.objects.get(pk=self.sales.pk).balance,
+                         28 * (Decimal('9.00') + Decimal('0.02')) + Decimal('5.00'))
+
+    def test_balance_in_presentation_currency(self):
+        self.post(self.bank, self.sales, '80.00')
+        response = self.api.get('/api/balance/', {'currency': 'USD', 'date_to': '2025-02-28'})
+        self.assertEqual(response.status_code, 200)
+        row = next(row for row in response.data if row['code'] == '706')
+        self.assertEqual((row['credit'], row['closing_balance']), ('100.00', '100.00'))
+        export = self.api.get('/api/export-balance/export_balance/',
+                              {'currency': 'USD', 'date_to': '2025-02-28', 'file_format': 'csv'})
+        self.assertIn('706;Compte 706;0.00;0.00;100.00;100.00', b''.join(export.streaming_content).decode())
+        self.assertEqual(self.api.get('/api/balance/', {'currency': 'GBP'}).status_code, 400)
+
+
+@override_settings(ACCOUNTING_REPLICA_DATABASE='default')
+class ReplicaRoutingTests(LedgerTestMixin, TransactionTestCase):
+    """
+    Réplica simulé par l'alias `default` : le routeur renvoie l'alias quand il route vers le réplica
+    (hors transaction ouverte, d'où `TransactionTestCase`)
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        cache.clear()
+
+    def routed(self, method, url, data=None):
+        """ Statut de la requête et destinations choisies par le routeur pour ses lectures """
+        destinations = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            destinations.append(db_for_read(router, model, **hints))
+            return destinations[-1]
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=spy):
+            response = getattr(self.api, method)(url, data, format='json')
+        return response.status_code, set(destinations)
+
+    def test_reads_use_replica_until_the_user_writes(self):
+        self.assertEqual(self.routed('get', '/api/transactions/'), (200, {'default'}))
+        self.assertEqual(self.routed('post', '/api/transactions/', {
+            'date': '2025-01-31', 'description': "Facture", 'debit_account': self.bank.pk,
+            'credit_account': self.sales.pk, 'amount': '10.00', 'user': self.user.pk}), (201, {None}))
+        # Lecture de l'auteur juste après son écriture : base principale
+        self.assertEqual(self.routed('get', '/api/transactions/'), (200, {None}))
+
+        other = User.objects.create_user('lecteur')
+        self.api.force_authenticate(other)
+        status_code, destinations = self.routed('get', f'/api/accounts/{self.sales.pk}/')
+        self.assertEqual((status_code, destinations), (200, {'default'}))
+        # Écriture récente sur le grand livre : la lecture sur le réplica n'est pas mise en cache
+        self.assertNotIn('ETag', self.api.get(f'/api/accounts/{self.sales.pk}/'))
+
+
+@skipUnless('replica' in settings.DATABASES, "Aucun réplica configuré (DB_ENGINE=sqlite ou DB_REPLICA_HOST)")
+@override_settings(ACCOUNTING_REPLICA_DATABASE='replica')
+class ReplicaAliasTests(LedgerTestMixin, TransactionTestCase):
+    """ Réplica réel : alias `replica` distinct (miroir de la base de test), requêtes relevées par connexion """
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        cache.clear()
+
+    def queries(self, method, url, data=None):
+        """ Statut et tables lues ou écrites, par alias, pendant la requête """
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.api, method)(url, data, format='json')
+        touched = lambda captured: any('accounting_transaction' in query['sql'] for query in captured)
+        return response.status_code, touched(primary), touched(replica)
+
+    def test_routed_reads_run_on_the_replica_connection(self):
+        self.post(self.bank, self.sales, '10.00')
+        # (statut, grand livre lu sur la base principale, grand livre lu sur le réplica)
+        self.assertEqual(self.queries('get', '/api/transactions/'), (200, False, True))
+        self.assertEqual(self.queries('post', '/api/transactions/', {
+            'date': '2025-01-31', 'description': "Facture", 'debit_account': self.bank.pk,
+            'credit_account': self.sales.pk, 'amount': '5.00', 'user': self.user.pk}), (201, True, False))
+        # L'auteur relit son écriture sur la base principale
+        self.assertEqual(self.queries('get', '/api/transactions/'), (200, True, False))
+
+
+class AuthenticationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        cache.clear()
+        authentication.clear()
+
+    def user_queries(self, method='get', data=None):
+        """ Statut de la requête et nombre de lectures de la table des utilisateurs """
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.api, method)('/api/fiscal-years/', data, format='json')
+        return response.status_code, len([query for query in queries if 'FROM "auth_user"' in query['sql']])
+
+    def test_user_is_cached_until_changed(self):
+        self.assertEqual(self.user_queries(), (200, 1))
+        self.assertEqual(self.user_queries(), (200, 0))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.user_queries()[0], 401)
+
+    @override_settings(ACCOUNTING_JWT_STATELESS_READS=True)
+    def test_stateless_reads_skip_the_user_table(self):
+        self.assertEqual(self.user_queries(), (200, 0))
+        # Les écritures chargent l'utilisateur
+        self.assertEqual(self.user_queries('post', {'start': '2025-01-01', 'end': '2025-12-31'}), (201, 1))
+
+
+class SeedAndBenchmarkTests(TestCase):
+
+    def test_seed_ledger_is_consistent(self):
+        accounts, count = seed_ledger(accounts=12, transactions=300, batch_size=128)
+        self.assertEqual(Transaction.objects.count(), 300)
+        self.assertEqual(JournalEntry.objects.count(), 300)
+        rows = {row['account_id']: row['closing_balance'] for row in balance_rows()}
+        for account in Account.objects.all():
+            self.assertEqual(account.balance, rows[account.pk], account.code)
+
+    def test_benchmark_suite_reports_every_scenario(self):
+        seed_ledger(accounts=5, transactions=50)
+        report = run_suite(User.objects.get(username='seed-ledger'), repeat=2, warmup=0)
+        self.assertEqual(report['dataset']['transactions'], 50)
+        for name, result in report['results'].items():
+            self.assertLess(result['status'], 300, name)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'], name)
+        self.assertEqual(compare(report, report)['balance'][2], 0)
+
+
+class MetricsTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='comptable')
+        self.make_account('512000')
+        registry.reset()
+
+    def test_requests_are_measured_and_exposed(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/accounts/').status_code, 200)
+        body = client.get('/metrics').content.decode()
+        self.assertIn('accounting_http_request_duration_seconds_count{method="GET",view="account-list",status="200"} 1',
+                      body)
+        self.assertIn('accounting_db_queries_per_request_bucket{method="GET",view="account-list",le="+Inf"} 1', body)
+        self.assertIn('accounting_serializer_duration_seconds_total{method="GET",view="account-list"}', body)
+
+    def test_metrics_endpoint_requires_token_or_allowed_address(self):
+        client = APIClient(REMOTE_ADDR='192.0.2.1')
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        with override_settings(ACCOUNTING_METRICS_TOKEN='secret'):
+            self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    @override_settings(ACCOUNTING_METRICS_SAMPLE_RATE=0)
+    def test_sampling_off_records_nothing(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get('/api/accounts/')
+        self.assertEqual(registry.latency, {})
+
+    def test_nested_serializers_are_timed_once(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        sales = self.make_account('706', type='Produit')
+        client.post('/api/vouchers/', {'reference': 'F-001', 'date': '2025-01-15', 'description': "Facture", 'lines': [
+            {'account': Account.objects.get(code='512000').pk, 'debit': '10.00'},
+            {'account': sales.pk, 'credit': '10.00'},
+        ]}, format='json')
+
+        measures = RequestMetrics(sql=False)
+        token = _current.set(measures)
+        try:
+            # Horloge factice : une seconde par lecture, le `.data` des lignes (imbriqué) n'en lit aucune
+            with mock.patch('accounting.metrics.time.perf_counter', side_effect=itertools.count()):
+                lines = VoucherSerializer(Voucher.objects.get()).data['lines']
+        finally:
+            _current.reset(token)
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(measures.serializer_seconds, 1)
+
+
+class JournalTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+
+    def test_posting_path_writes_the_journal(self):
+        transaction = self.post(self.bank, self.sales, '100.00')
+        transaction.amount = Decimal('80.00')
+        transaction.save()
+        transaction_id = transaction.pk
+        transaction.delete()
+
+        entries = list(JournalEntry.objects.filter(transaction_id=transaction_id).order_by('id'))
+        self.assertEqual([entry.action for entry in entries],
+                         [JournalEntry.CREATE, JournalEntry.UPDATE, JournalEntry.DELETE])
+        self.assertEqual([entry.amount for entry in entries], [Decimal('100.00'), Decimal('80.00'), Decimal('80.00')])
+        self.assertEqual(entries[2].debit_account_id, self.bank.pk)
+
+    def test_changes_are_attributed_to_the_acting_user(self):
+        transaction = self.post(self.bank, self.sales, '100.00')
+        reviewer = User.objects.create_user('controleur', password='secret', is_staff=True)
+        api = APIClient()
+        api.force_authenticate(reviewer)
+        self.assertEqual(api.patch(f'/api/transactions/{transaction.pk}/', {'amount': '90.00'},
+                                   format='json').status_code, 200)
+        self.assertEqual(api.delete(f'/api/transactions/{transaction.pk}/').status_code, 204)
+
+        entries = JournalEntry.objects.filter(transaction_id=transaction.pk).order_by('id')
+        self.assertEqual([entry.user_id for entry in entries], [self.user.pk, reviewer.pk, reviewer.pk])
+
+    def test_journal_is_append_only(self):
+        self.post(self.bank, self.sales, '10.00')
+        entry = JournalEntry.objects.get()
+        with self.assertRaises(AppendOnlyError):
+            entry.save()
+        with self.assertRaises(AppendOnlyError):
+            entry.delete()
+        with self.assertRaises(AppendOnlyError):
+            JournalEntry.objects.update(amount=0)
+        with self.assertRaises(AppendOnlyError):
+            JournalEntry.objects.all().delete()
+
+    def test_archive_writes_compressed_months(self):
+        self.post(self.bank, self.sales, '10.00')
+        kept = self.post(self.bank, self.sales, '20.00')
+        old = JournalEntry.objects.order_by('id').first()
+        # Entrée d'un mois ancien (contournement volontaire de l'ajout seul pour le test)
+        models.QuerySet.update(JournalEntry.objects.filter(pk=old.pk),
+                               created_at=datetime(2024, 3, 15, tzinfo=dt_timezone.utc))
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        archived = archive_before(date(2024, 4, 1), directory=directory)
+        self.assertEqual([(month, count) for month, _, count in archived], [(date(2024, 3, 1), 1)])
+        with gzip.open(archived[0][1], 'rt', encoding='utf-8') as archive:
+            rows = list(csv.DictReader(archive))
+        self.assertEqual(rows[0]['amount'], '10.00')
+        self.assertEqual(list(JournalEntry.objects.values_list('transaction_id', flat=True)), [kept.pk])
+
+    def test_journal_endpoint_filters_on_created_at(self):
+        self.post(self.bank, self.sales, '10.00')
+        api = APIClient()
+        api.force_authenticate(self.user)
+        response = api.get('/api/journal/', {'created_at__gte': '2000-01-01T00:00:00Z', 'action': JournalEntry.CREATE})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['amount'], '10.00')
+        self.assertEqual(api.get('/api/journal/', {'created_at__lt': '2000-01-01T00:00:00Z'}).data['count'], 0)
+
+
+class ListQueryBudgetTests(LedgerTestMixin, TestCase):
+    """
+    Budget de requêtes SQL par liste : il ne doit pas dépendre du nombre de
+    lignes renvoyées. Un dépassement signale une requête N+1.
+    """
+
+    # Page numérotée : COUNT + SELECT ; keyset : SELECT seul
+    QUERY_BUDGETS = {
+        '/api/accounts/': 2,
+        '/api/transactions/': 2,
+        '/api/journal/': 2,
+        '/api/accounts/?cursor=': 1,
+        '/api/transactions/?cursor=': 1,
+        '/api/journal/?cursor=': 1,
+        # Recherche : comptes correspondants lus en sous-requête
+        '/api/transactions/?search=Compte': 2,
+        '/api/accounts/?code_prefix=00': 2,
+        # Pièces : COUNT + SELECT + transactions de la page (prefetch)
+        '/api/vouchers/': 3,
+        '/api/reports/': 2,
+        '/api/fiscal-years/': 2,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def seed(self, count):
+        accounts = [self.make_account(f"{Account.objects.count() + 1:04d}") for _ in range(2)]
+        for _ in range(count):
+            transaction = self.post(*accounts, '10.00')
+            # Une pièce, un rapport et un exercice par ligne : listes de même taille que le grand livre
+            transaction.voucher = Voucher.objects.create(date=transaction.date, description="Pièce", user=self.user)
+            transaction.save()
+            ReportJob.objects.create(params={}, fingerprint=str(transaction.pk), user=self.user)
+            year = 1900 + FiscalYear.objects.count()
+            FiscalYear.objects.create(start=date(year, 1, 1), end=date(year, 12, 31))
+
+    def test_list_endpoints_stay_within_budget(self):
+        for rows in (3, 30):
+            self.seed(rows)
+            for url, budget in self.QUERY_BUDGETS.items():
+                with self.subTest(url=url, rows=rows), CaptureQueriesContext(connection) as queries:
+                    response = self.api.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertLessEqual(len(queries), budget, [query['sql'] for query in queries])
+
+    def test_keyset_pages_follow_date_and_id(self):
+        accounts = [self.make_account('512'), self.make_account('706', type='Produit')]
+        for day in (3, 1, 2, 1, 3):
+            self.post(*accounts, '1.00', day=date(2025, 1, day))
+
+        seen, url = [], '/api/transactions/?cursor=&page_size=2'
+        while url:
+            response = self.api.get(url)
+            seen.extend((row['date'], row['id']) for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), 5)
+
+        self.assertEqual(self.api.get('/api/transactions/?cursor=bad').status_code, 404)
+
+    def test_fast_reads_match_serializers(self):
+        self.seed(3)
+        for url in ('/api/accounts/', '/api/transactions/?debit_account=1', '/api/journal/',
+                    '/api/transactions/?cursor=&page_size=2', '/api/journal/?cursor=&page_size=2'):
+            with self.subTest(url=url):
+                with override_settings(ACCOUNTING_FAST_READS=False):
+                    expected = self.api.get(url).json()
+                cache.clear()
+                with override_settings(ACCOUNTING_FAST_READS=True):
+                    response = self.api.get(url)
+                self.assertEqual(response.json(), expected)
+                if 'cursor' in url:
+                    self.assertEqual(self.api.get(response.json()['next']).json()['results'],
+                                     self.api.get(expected['next']).json()['results'])
+
+
+class LedgerIndexTests(TestCase):
+    """ Index du grand livre et du journal : déclarés dans Meta.indexes et présents en base après les migrations """
+
+    expected = {Transaction: {'txn_debit_date_idx', 'txn_credit_date_idx'}, JournalEntry: {'journal_created_idx'}}
+
+    def test_declared_indexes_exist_in_the_database(self):
+        for model, names in self.expected.items():
+            indexes = {index.name: index for index in model._meta.indexes}
+            self.assertLessEqual(names, set(indexes), model.__name__)
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            for name in names:
+                with self.subTest(index=name):
+                    index = indexes[name]
+                    columns = [model._meta.get_field(field).column for field in index.fields]
+                    # Colonnes incluses (INCLUDE) seulement là où la base les prend en charge
+                    if connection.features.supports_covering_indexes:
+                        columns += [model._meta.get_field(field).column for field in getattr(index, 'covering', ())]
+                    self.assertIn(name, constraints)
+                    self.assertTrue(constraints[name]['index'])
+                    self.assertEqual(constraints[name]['columns'], columns)
+
+    @skipUnless(connection.vendor == 'sqlite', "Plan stable sans statistiques : SQLite")
+    def test_account_period_filters_use_the_ledger_indexes(self):
+        for field, name in (('debit_account', 'txn_debit_date_idx'), ('credit_account', 'txn_credit_date_idx')):
+            plan = Transaction.objects.filter(**{field: 1, 'date__gte': date(2025, 1, 1)}).explain()
+            self.assertIn(name, plan, field)
+
+
+class SearchTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.bank = Account.objects.create(code='512', title="Banque", type='Actif')
+        self.rent = Account.objects.create(code='613', title="Locations immobilières", type='Charge')
+        self.fees = Account.objects.create(code='6226', title="Honoraires", type='Charge')
+        self.sales = Account.objects.create(code='706', title="Prestations de services", type='Produit')
+        self.post(self.rent, self.bank, '800.00', description="Loyer du bureau, mars")
+        self.post(self.fees, self.bank, '300.00', description="Expert-comptable")
+        self.post(self.bank, self.sales, '1200.00', description="Facture client 42")
+
+    def search(self, url, **params):
+        response = self.api.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_transactions_match_description_or_account_title(self):
+        for terms, expected in (("loyer", ["Loyer du bureau, mars"]),
+                                ("honoraires", ["Expert-comptable"]),
+                                ("FACTURE", ["Facture client 42"]),
+                                ("introuvable", [])):
+            for fast in (False, True):
+                with self.subTest(terms=terms, fast=fast), self.settings(ACCOUNTING_FAST_READS=fast):
+                    rows = self.search('/api/transactions/', search=terms)
+                    self.assertEqual([row['description'] for row in rows], expected)
+
+    def test_accounts_by_code_prefix_or_title(self):
+        codes = lambda rows: [row['code'] for row in rows]
+        self.assertEqual(codes(self.search('/api/accounts/', code_prefix='6')), ['613', '6226'])
+        self.assertEqual(codes(self.search('/api/accounts/', code_prefix='62')), ['6226'])
+        self.assertEqual(codes(self.search('/api/accounts/', search='7')), ['706'])
+        self.assertEqual(codes(self.search('/api/accounts/', search='location')), ['613'])
+
+
+class AsyncReadTests(LedgerTestMixin, TestCase):
+    """ Les vues asynchrones rendent les mêmes données que l'API synchrone """
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.fees = self.make_account('622', type='Charge')
+        for day, amount in ((3, '100.00'), (10, '40.00'), (20, '15.50')):
+            self.post(self.bank, self.sales, amount, day=date(2025, 1, day))
+        self.post(self.fees, self.bank, '30.00', day=date(2025, 2, 1))
+
+    async def test_async_reads_match_the_sync_api(self):
+        pairs = (
+            ('/api/accounts/?cursor=', '/api/async/accounts/'),
+            ('/api/accounts/?cursor=&code_prefix=7', '/api/async/accounts/?code_prefix=7'),
+            ('/api/balance/?date_from=2025-01-15', '/api/async/balance/?date_from=2025-01-15'),
+            (f'/api/accounts/{self.bank.pk}/ledger/?cursor=', f'/api/async/accounts/{self.bank.pk}/ledger/'),
+        )
+        for sync_url, async_url in pairs:
+            with self.subTest(url=async_url):
+                expected = json.loads((await sync_to_async(self.api.get)(sync_url)).content)
+                response = await self.async_client.get(async_url, headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), expected)
+
+        # Pages suivantes par curseur
+        url = f'/api/async/accounts/{self.bank.pk}/ledger/?page_size=3'
+        page = json.loads((await self.async_client.get(url, headers=self.headers)).content)
+        following = json.loads((await self.async_client.get(page['next'], headers=self.headers)).content)
+        self.assertEqual([line['id'] for line in following['results']], [page['results'][-1]['id'] + 1])
+        self.assertEqual(following['opening_balance'], page['results'][-1]['running_balance'])
+
+        response = await self.async_client.get('/api/async/balance/export/', headers=self.headers)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        export = await sync_to_async(self.api.get)('/api/export-balance/export_balance/', {'file_format': 'csv'})
+        expected = await sync_to_async(lambda: b''.join(export.streaming_content))()  # Flux lu hors boucle
+        self.assertEqual(content, expected.decode('utf-8'))
+
+    async def test_async_reads_require_a_valid_token(self):
+        for headers in ({}, {'Authorization': 'Bearer invalide'}):
+            response = await self.async_client.get('/api/async/balance/', headers=headers)
+            self.assertEqual(response.status_code, 401)
+
+
+class AccountCacheTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_list_is_served_from_cache_until_a_posting(self):
+        first = self.api.get('/api/accounts/')
+        self.assertIn('ETag', first)
+        with self.assertNumQueries(0):
+            cached = self.api.get('/api/accounts/')
+        self.assertEqual(cached.data, first.data)
+
+        self.post(self.bank, self.sales, '25.00')
+        fresh = self.api.get('/api/accounts/')
+        self.assertNotEqual(fresh['ETag'], first['ETag'])
+        balances = {row['code']: row['balance'] for row in fresh.data['results']}
+        self.assertEqual(balances['706'], '25.00')
+
+    def test_if_none_match_returns_304(self):
+        etag = self.api.get(f'/api/accounts/{self.bank.pk}/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.api.get(f'/api/accounts/{self.bank.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Une écriture sur un autre compte ne change pas l'ETag du détail…
+        other = self.make_account('411')
+        self.post(other, self.sales, '1.00')
+        self.assertEqual(self.api.get(f'/api/accounts/{self.bank.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # … une écriture sur ce compte, si
+        self.post(self.bank, self.sales, '1.00')
+        response = self.api.get(f'/api/accounts/{self.bank.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balance'], '-1.00')
+
+
+class AnalyticsTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.cash = self.make_account('530')
+        self.supplier = self.make_account('401', type='Passif')
+        self.sales = self.make_account('706', type='Produit')
+        self.purchases = self.make_account('607', type='Charge')
+        self.post(self.bank, self.sales, '100.00', day=date(2025, 1, 10))
+        self.post(self.purchases, self.supplier, '30.25', day=date(2025, 1, 20))
+        self.post(self.supplier, self.bank, '30.25', day=date(2025, 2, 5))
+        self.post(self.cash, self.bank, '10.00', day=date(2025, 2, 6))
+
+    def test_monthly_pnl(self):
+        self.assertEqual(list(monthly_pnl()), [
+            {'period': date(2025, 1, 1), 'revenue': Decimal('100.00'), 'expenses': Decimal('30.25'),
+             'result': Decimal('69.75')},
+        ])
+        self.assertEqual(list(monthly_pnl(date_from=date(2025, 2, 1))), [])
+
+    def test_balance_sheet_and_cash_flow(self):
+        sheet = {row['type']: row for row in balance_sheet(date(2025, 1, 31))}
+        self.assertEqual(sheet['Actif']['balance'], Decimal('-100.00'))
+        self.assertEqual(sheet['Passif']['balance'], Decimal('30.25'))
+
+        # Convention du modèle : le crédit d'un compte de trésorerie est un encaissement ;
+        # le virement entre la banque et la caisse est ignoré
+        self.assertEqual([(row['period'], row['inflow'], row['outflow']) for row in cash_flow()], [
+            (date(2025, 1, 1), Decimal('0.00'), Decimal('100.00')),
+            (date(2025, 2, 1), Decimal('30.25'), Decimal('0.00')),
+        ])
+
+    def test_endpoints(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        response = api.get('/api/analytics/pnl/', {'date_to': '2025-01-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['result'], '69.75')
+        self.assertEqual(len(api.get('/api/analytics/balance_sheet/', {'date': '2025-02-28'}).data), 2)
+        self.assertEqual(api.get('/api/analytics/cash_flow/').data[1]['net'], '30.25')
+
+
+class FiscalYearTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret', is_staff=True)
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.bank = self.make_account('512')
+        self.supplier = self.make_account('401', type='Passif')
+        self.sales = self.make_account('706', type='Produit')
+        self.purchases = self.make_account('607', type='Charge')
+        self.sale = self.post(self.bank, self.sales, '100.00', day=date(2024, 3, 10))
+        self.post(self.purchases, self.supplier, '30.00', day=date(2024, 12, 31))
+        self.post(self.bank, self.sales, '50.00', day=date(2025, 1, 10))
+        self.year = FiscalYear.objects.create(start=date(2024, 1, 1), end=date(2024, 12, 31))
+
+    def assertBalancesMatchAccounts(self):
+        rows = {row['account_id']: row['closing_balance'] for row in balance_rows()}
+        for account in Account.objects.all():
+            self.assertEqual(rows.get(account.pk, Decimal('0')), account.balance, account.code)
+
+    def test_closing_carries_balances_and_locks_the_period(self):
+        response = self.api.post(f'/api/fiscal-years/{self.year.pk}/close/')
+        self.assertEqual(response.data['status'], FiscalYear.CLOSED)
+
+        balances = dict(Account.objects.values_list('code', 'balance'))
+        self.assertEqual(balances['706'], Decimal('50.00'))  # Produits 2024 soldés dans le résultat
+        self.assertEqual(balances['607'], Decimal('0.00'))
+        self.assertEqual(balances['120'], Decimal('70.00'))
+        self.assertEqual((balances['512'], balances['401']), (Decimal('-150.00'), Decimal('30.00')))
+        self.assertEqual((balances['890'], balances['891']), (Decimal('0.00'), Decimal('0.00')))
+        self.assertBalancesMatchAccounts()
+        # Balance de la période ouverte : à-nouveaux au premier jour, puis les mouvements de 2025
+        rows = {row['code']: row for row in balance_rows(date_from=date(2025, 1, 1))}
+        self.assertEqual(rows['512']['opening_balance'], Decimal('0'))
+        self.assertEqual(rows['512']['debit'], Decimal('150.00'))
+        # Les analyses ignorent les écritures de clôture
+        self.assertEqual([row['revenue'] for row in monthly_pnl()], [Decimal('100.00'), Decimal('0.00'),
+                                                                      Decimal('50.00')])
+
+        # Période verrouillée : saisie, suppression et nouvelle clôture refusées
+        response = self.api.post('/api/transactions/', {'date': '2024-06-01', 'description': "Tardive",
+                                                        'debit_account': self.bank.pk,
+                                                        'credit_account': self.sales.pk, 'amount': '5.00',
+                                                        'user': self.user.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.data)
+        self.assertEqual(self.api.delete(f'/api/transactions/{self.sale.pk}/').status_code, 409)
+        self.assertEqual(self.api.post(f'/api/fiscal-years/{self.year.pk}/close/').status_code, 409)
+        self.assertTrue(Transaction.objects.filter(pk=self.sale.pk).exists())
+
+    def test_account_with_closed_period_transactions_cannot_be_deleted(self):
+        self.api.post(f'/api/fiscal-years/{self.year.pk}/close/')
+        count = Transaction.objects.count()
+        response = self.api.delete(f'/api/accounts/{self.supplier.pk}/')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('error', response.data)
+        # Suppression annulée en entier : compte, transactions et soldes intacts
+        self.assertTrue(Account.objects.filter(pk=self.supplier.pk).exists())
+        self.assertEqual(Transaction.objects.count(), count)
+        self.assertBalancesMatchAccounts()
+
+    def test_archiving_moves_the_closed_year_out_of_the_working_table(self):
+        self.assertEqual(self.api.post(f'/api/fiscal-years/{self.year.pk}/archive/').status_code, 409)
+        self.api.post(f'/api/fiscal-years/{self.year.pk}/close/')
+        self.assertEqual(self.api.post(f'/api/fiscal-years/{self.year.pk}/archive/').data['status'],
+                         FiscalYear.ARCHIVED)
+
+        self.assertFalse(Transaction.objects.filter(date__lte=self.year.end).exists())
+        self.assertTrue(ArchivedTransaction.objects.filter(pk=self.sale.pk, fiscal_year=self.year).exists())
+        self.assertBalancesMatchAccounts()
+        rebuild_snapshots()
+        self.assertBalancesMatchAccounts()
+        # Les à-nouveaux du premier exercice non archivé reportent les soldes archivés
+        sheet = {row['type']: row['balance'] for row in balance_sheet()}
+        self.assertEqual(sheet['Actif'], Decimal('-150.00'))
+
+    def test_period_balance_inside_an_archived_year_reads_the_archive(self):
+        self.post(self.bank, self.sales, '7.00', day=date(2024, 3, 20))
+        self.api.post(f'/api/fiscal-years/{self.year.pk}/close/')
+        self.api.post(f'/api/fiscal-years/{self.year.pk}/archive/')
+
+        # Fin de période au milieu d'un mois archivé : la queue du mois est lue dans les archives
+        rows = {row['code']: row for row in balance_rows(date_from=date(2024, 1, 1), date_to=date(2024, 3, 15))}
+        self.assertEqual(rows['706']['credit'], Decimal('100.00'))
+        self.assertEqual(rows['512']['closing_balance'], Decimal('-100.00'))
+
+    def test_fiscal_years_cover_whole_months_without_overlap(self):
+        for start, end in (('2025-01-15', '2025-12-31'), ('2024-07-01', '2025-06-30')):
+            response = self.api.post('/api/fiscal-years/', {'start': start, 'end': end}, format='json')
+            self.assertEqual(response.status_code, 400, (start, end))
+        response = self.api.post('/api/fiscal-years/', {'start': '2025-01-01', 'end': '2025-12-31'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class ReconciliationTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.customer = self.make_account('411')
+        self.sales = self.make_account('706', type='Produit')
+        self.post(self.bank, self.sales, '120.00')
+        self.post(self.customer, self.sales, '80.00')
+
+    def test_drift_is_reported_then_repaired(self):
+        self.assertEqual(reconcile.reconcile(), (3, []))
+        Account.objects.filter(pk=self.sales.pk).update(balance=Decimal('150.00'))
+
+        checked, drifts = reconcile.reconcile()
+        self.assertEqual(len(drifts), 1)
+        self.assertEqual((drifts[0].code, drifts[0].stored, drifts[0].ledger, drifts[0].difference),
+                         ('706', Decimal('150.00'), Decimal('200.00'), Decimal('50.00')))
+        self.sales.refresh_from_db()
+        self.assertEqual(self.sales.balance, Decimal('150.00'))  # Vérification seule : solde inchangé
+
+        reconcile.reconcile(repair=True)
+        self.sales.refresh_from_db()
+        self.assertEqual(self.sales.balance, Decimal('200.00'))
+        self.assertEqual(list(ReconciliationRun.objects.order_by('started_at').values_list('drifted', flat=True)),
+                         [0, 1, 1])
+
+    def test_incremental_run_checks_accounts_touched_since_the_last_run(self):
+        reconcile.reconcile()
+        Account.objects.filter(pk=self.customer.pk).update(balance=Decimal('0.00'))
+        other = self.make_account('530')
+        with mock.patch.object(reconcile, 'INCREMENTAL_MARGIN', timedelta(0)):
+            self.post(other, self.bank, '10.00')
+            checked, drifts = reconcile.reconcile(incremental=True)
+        self.assertEqual((checked, drifts), (2, []))  # 512 et 530 : le compte 411 n'a pas bougé
+        self.assertTrue(ReconciliationRun.objects.filter(incremental=True).exists())
+        self.assertEqual([drift.code for drift in reconcile.reconcile()[1]], ['411'])
+
+
+class ReportJobTests(LedgerTestMixin, TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, ACCOUNTING_REPORT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('comptable', password='secret')
+        self.bank = self.make_account('512')
+        self.sales = self.make_account('706', type='Produit')
+        self.post(self.bank, self.sales, '100.00')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def request(self, **params):
+        return self.api.post('/api/reports/', {'kind': 'balance', 'params': params}, format='json')
+
+    def test_job_lifecycle_and_deduplication(self):
+        created = self.request(file_format='csv')
+        self.assertEqual(created.status_code, 202)
+        self.assertEqual(created.data['status'], ReportJob.PENDING)
+        self.assertEqual(self.api.get(f"/api/reports/{created.data['id']}/download/").status_code, 409)
+
+        same = self.request(file_format='csv')
+        self.assertEqual(same.status_code, 200)
+        self.assertEqual(same.data['id'], created.data['id'])
+
+        self.assertEqual(run_pending(), 1)
+        job = self.api.get(f"/api/reports/{created.data['id']}/")
+        self.assertEqual(job.data['status'], ReportJob.DONE)
+        download = self.api.get(job.data['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertIn(b'706;Compte 706', b''.join(download.streaming_content))
+
+        # Le grand livre a changé : une nouvelle demande produit un nouveau rapport
+        self.post(self.bank, self.sales, '1.00')
+        self.assertEqual(self.request(file_format='csv').status_code, 202)
+
+    def test_stale_running_job_is_replaced_and_failed(self):
+        job = ReportJob.objects.get(pk=self.request(file_format='csv').data['id'])
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.RUNNING, started_at=datetime.now(dt_timezone.utc) - timedelta(hours=2))
+
+        # Worker arrêté en cours de génération : la demande identique crée un nouveau travail
+        retry = self.request(file_format='csv')
+        self.assertEqual(retry.status_code, 202)
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.FAILED)
+
+    def test_jobs_are_visible_to_their_owner_and_staff_only(self):
+        job_id = self.request(file_format='csv').data['id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('autre', password='secret'))
+        self.assertEqual(other.get('/api/reports/').data['results'], [])
+        self.assertEqual(other.get(f'/api/reports/{job_id}/download/').status_code, 404)
+        # Même demande par un autre utilisateur : son propre travail
+        self.assertNotEqual(other.post('/api/reports/', {'kind': 'balance', 'params': {'file_format': 'csv'}},
+                                       format='json').data['id'], job_id)
+
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_user('admin', password='secret', is_staff=True))
+        self.assertEqual(admin.get(f'/api/reports/{job_id}/').status_code, 200)
+
+    @override_settings(ACCOUNTING_JWT_STATELESS_READS=True)
+    def test_jobs_are_scoped_with_stateless_reads(self):
+        job_id = self.request(file_format='csv').data['id']
+        run_pending()
+        User.objects.create_user('autre', password='secret')
+        User.objects.create_user('admin', password='secret', is_staff=True)
+
+        def client(username):
+            # Jeton émis par /api/token/ : lectures authentifiées par ses seules revendications (TokenUser)
+            access = APIClient().post('/api/token/', {'username': username, 'password': 'secret'},
+                                      format='json').data['access']
+            api = APIClient()
+            api.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+            return api
+
+        owner, other, admin = client('comptable'), client('autre'), client('admin')
+        with CaptureQueriesContext(connection) as queries:
+            listed = owner.get('/api/reports/')
+        self.assertEqual(listed.status_code, 200)
+        self.assertEqual([job['id'] for job in listed.data['results']], [job_id])
+        self.assertFalse(any('FROM "auth_user"' in query['sql'] for query in queries))
+        self.assertEqual(owner.get(f'/api/reports/{job_id}/').status_code, 200)
+        self.assertEqual(owner.get(f'/api/reports/{job_id}/download/').status_code, 200)
+
+        self.assertEqual(other.get('/api/reports/').data['results'], [])
+        self.assertEqual(other.get(f'/api/reports/{job_id}/download/').status_code, 404)
+        # Revendication `is_staff` du jeton : les admins voient tous les rapports
+        self.assertEqual(admin.get(f'/api/reports/{job_id}/').status_code, 200)
+
+    def test_invalid_params_are_rejected(self):
+        response = self.request(date_from='2025-02-01', date_to='2025-01-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ReportJob.objects.exists())
+
+
+class StartupProfileTests(TestCase):
+
+    def test_production_profile_starts_without_dev_apps_or_export_libraries(self):
+        result = startup(['production'], repeat=1, requests=1)['results']['production']
+        # Requête sans jeton : toute la chaîne de middlewares, puis refus de l'API
+        self.assertEqual(result['status'], 401)
+        self.assertEqual(result['heavy_modules'], [])
@@ -1,36 +1,29 @@
 # accounting/urls.py
-from django.urls import path, include, re_path  # Importation des fonctions de routage
+from django.urls import path, include  # Importation des fonctions de routage
 from rest_framework.routers import DefaultRouter  # Importation du routeur par défaut
-from rest_framework import permissions  # Importation des permissions REST
-from drf_yasg.views import get_schema_view  # Importation de la vue de documentation
-from drf_yasg import openapi  # Importation des outils de documentation Swagger / Redoc
-from .views import AccountViewSet, TransactionViewSet, JournalEntryViewSet, ExportBalanceViewSet  # Importation des vues
-# 📌 Configuration de la documentation Swagger / Redoc 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="API Gestion Comptable",
-        default_version='v1',
-        description="Documentation de l'API de gestion comptable avec Django REST Framework",
-        terms_of_service="https://www.tonsite.com/terms/",
-        contact=openapi.Contact(email="support@tonsite.com"),
-        license=openapi.License(name="MIT License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
-
+from . import async_views  # Lectures asynchrones (ASGI)
+from .metrics import metrics_view  # Exposition Prometheus
+from .views import AccountViewSet, TransactionViewSet, JournalEntryViewSet, ExportBalanceViewSet, BalanceViewSet, ReportJobViewSet, AnalyticsViewSet, VoucherViewSet, FiscalYearViewSet  # Importation des vues
 # 📌 Création du routeur pour les endpoints REST
 router = DefaultRouter()
 router.register(r'accounts', AccountViewSet, basename='account')  # CRUD des comptes comptables
 router.register(r'transactions', TransactionViewSet, basename='transaction')  # CRUD des transactions
+router.register(r'vouchers', VoucherViewSet, basename='voucher')  # Pièces comptables à plusieurs lignes
 router.register(r'journal', JournalEntryViewSet, basename='journal')  # Journal comptable
+router.register(r'fiscal-years', FiscalYearViewSet, basename='fiscal-year')  # Exercices : clôture et archivage
 router.register(r'export-balance', ExportBalanceViewSet, basename='export-balance')  # Export Excel
+router.register(r'balance', BalanceViewSet, basename='balance')  # Balance comptable (JSON)
+router.register(r'reports', ReportJobViewSet, basename='report')  # Rapports asynchrones
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')  # Analyses (pandas)
 
 # 📌 Définition des URLs
 urlpatterns = [
     path('api/', include(router.urls)),  # Inclusion des routes API générées automatiquement
-
-    # 📄 Documentation Swagger et ReDoc
-    re_path(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    re_path(r'^redoc/$', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # ⚡ Lectures asynchrones (ORM asynchrone, sans thread par requête sous ASGI)
+    path('api/async/accounts/', async_views.accounts, name='async-accounts'),
+    path('api/async/accounts/<int:pk>/ledger/', async_views.account_ledger, name='async-account-ledger'),
+    path('api/async/balance/', async_views.balance, name='async-balance'),
+    path('api/async/balance/export/', async_views.balance_export, name='async-balance-export'),
+    path('metrics', metrics_view, name='metrics'),  # Mesures des requêtes (Prometheus)
+    # 📄 Documentation Swagger et ReDoc : Test/urls.py (un seul schéma, mis en cache)
 ]
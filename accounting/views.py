@@ -1,16 +1,34 @@
+import json
 import logging
-from django.db.models import Sum
-from django.http import HttpResponse
-from rest_framework import viewsets, permissions, status
+import tempfile
+from datetime import date
+from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
-import openpyxl
-from openpyxl.utils import get_column_letter
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import no_body, swagger_auto_schema
 from drf_yasg import openapi
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Account, Transaction, JournalEntry
-from .serializers import AccountSerializer, TransactionSerializer, JournalEntrySerializer
+from .balances import account_history, balance_rows
+from .cache import account_version, cached_response, exchange_rates_version, ledger_version
+from .closing import archive_fiscal_year, close_fiscal_year
+from .currency import balance_currency, balance_in_currency
+from .exports import CSV_CONTENT_TYPE, XLSX_CONTENT_TYPE, iter_balance_csv, write_balance_xlsx
+from .idempotency import idempotent_response
+from .fastread import AccountReader, FastListMixin, JournalEntryReader, TransactionReader
+from .imports import BulkImportError, CSVParser, import_transactions, read_csv
+from .ledger import ledger_page
+from .models import Account, ClosedPeriodError, FiscalYear, Transaction, JournalEntry, ReportJob, Voucher
+from .reports import request_report
+from .routers import ReplicaReadMixin
+from .search import LedgerSearchFilter
+from .serializers import (AccountSerializer, TransactionSerializer, JournalEntrySerializer, BalanceRowSerializer,
+                          BalancePeriodSerializer, BalanceCurrencySerializer, BalanceExportSerializer,
+                          AccountHistorySerializer, LedgerPageSerializer, ReportJobSerializer,
+                          BalanceSheetParamsSerializer, PnlRowSerializer, BalanceSheetRowSerializer, CashFlowRowSerializer, VoucherSerializer, FiscalYearSerializer)
 
 # 📌 Configuration des logs
 logger = logging.getLogger(__name__)
@@ -21,27 +39,59 @@ authorization = openapi.Parameter(
     description="Bearer <token>", type=openapi.TYPE_STRING
 )
 
+# Recherche dans les listes (accounting/search.py)
+search = openapi.Parameter(
+    'search', openapi.IN_QUERY,
+    description="Texte recherché (libellé, intitulé de compte, début de code)", type=openapi.TYPE_STRING
+)
+code_prefix = openapi.Parameter(
+    'code_prefix', openapi.IN_QUERY,
+    description="Début du code des comptes (ex. 6 : comptes de charges)", type=openapi.TYPE_STRING
+)
+
+# Écritures rejouables sans double comptabilisation (accounting/idempotency.py)
+idempotency_key = openapi.Parameter(
+    'Idempotency-Key', openapi.IN_HEADER,
+    description="Clé unique de la requête : une nouvelle tentative avec la même clé renvoie la réponse d'origine",
+    type=openapi.TYPE_STRING
+)
+
 # ✅ Gestion des comptes comptables
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     CRUD des comptes comptables
     - 🔍 GET /accounts/ → Lister les comptes
     - ➕ POST /accounts/ → Créer un compte
     - 📝 PUT /accounts/{id}/ → Modifier un compte
     - ❌ DELETE /accounts/{id}/ → Supprimer un compte
+    - 📈 GET /accounts/{id}/history/ → Historique mensuel du compte
+    - 📒 GET /accounts/{id}/ledger/ → Grand livre du compte avec solde progressif
     """
-    queryset = Account.objects.all()
+    queryset = Account.objects.order_by('code')
     serializer_class = AccountSerializer
+    fast_reader = AccountReader
+    keyset_ordering = ('code',)
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [LedgerSearchFilter]
 
     @swagger_auto_schema(
-        operation_description="Liste des comptes comptables",
+        operation_description="Liste des comptes comptables, filtrable par `search` et `code_prefix`",
         responses={200: AccountSerializer(many=True)},
-        manual_parameters=[authorization]
+        manual_parameters=[authorization, search, code_prefix]
     )
     def list(self, request, *args, **kwargs):
         logger.info("Liste des comptes consultée par %s", request.user)
-        return super().list(request, *args, **kwargs)
+        compute = super().list
+        return cached_response(request, ledger_version(), lambda: compute(request, *args, **kwargs))
+
+    @swagger_auto_schema(
+        operation_description="Détail d'un compte comptable",
+        responses={200: AccountSerializer},
+        manual_parameters=[authorization]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        compute = super().retrieve
+        return cached_response(request, account_version(kwargs['pk']), lambda: compute(request, *args, **kwargs))
 
     @swagger_auto_schema(
         operation_description="Créer un nouveau compte comptable",
@@ -64,16 +114,70 @@ class AccountViewSet(viewsets.ModelViewSet):
         return super().update(request, *args, **kwargs)
 
     @swagger_auto_schema(
-        operation_description="Supprimer un compte comptable",
-        responses={204: "Compte supprimé"},
+        operation_description="Historique mensuel du compte (soldes et totaux débit / crédit par mois)",
+        query_serializer=BalancePeriodSerializer,
+        responses={200: AccountHistorySerializer(many=True)},
+        manual_parameters=[authorization]
+    )
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        params = BalancePeriodSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        def compute():
+            account = self.get_object()
+            return Response(AccountHistorySerializer(account_history(account, **params.validated_data),
+                                                     many=True).data)
+
+        return cached_response(request, account_version(pk), compute)
+
+    @swagger_auto_schema(
+        operation_description="Grand livre du compte : mouvements triés par (date, id) avec solde progressif, "
+                              "paginés par curseur (`?cursor=`, `?page_size=`)",
+        query_serializer=BalancePeriodSerializer,
+        responses={200: LedgerPageSerializer},
+        manual_parameters=[authorization]
+    )
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
+        params = BalancePeriodSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        paginator = self.paginator
+        paginator.request = request
+
+        def compute():
+            account = self.get_object()
+            position = paginator.decode_cursor(request.query_params.get(paginator.cursor_query_param))
+            after = None
+            if position is not None:
+                try:
+                    day, transaction_id = position
+                    after = (date.fromisoformat(day), int(transaction_id))
+                except (TypeError, ValueError):
+                    raise NotFound(paginator.invalid_cursor_message)
+            opening, lines, last = ledger_page(account.pk, after=after, limit=paginator.get_page_size(request),
+                                               **params.validated_data)
+            next_url = paginator.encode_cursor([last[0].isoformat(), last[1]]) if last is not None else None
+            return Response(LedgerPageSerializer({'account': account.pk, 'opening_balance': opening,
+                                                  'next': next_url, 'results': lines}).data)
+
+        return cached_response(request, account_version(pk), compute)
+
+    @swagger_auto_schema(
+        operation_description="Supprimer un compte comptable (ses transactions sont supprimées avec lui)",
+        responses={204: "Compte supprimé", 409: "Le compte a des transactions dans un exercice clos"},
         manual_parameters=[authorization]
     )
     def destroy(self, request, *args, **kwargs):
         logger.warning("Suppression du compte %s par %s", kwargs['pk'], request.user)
-        return super().destroy(request, *args, **kwargs)
+        try:
+            with transaction.atomic():
+                return super().destroy(request, *args, **kwargs)
+        except ClosedPeriodError as exc:
+            return Response({"error": exc.messages[0]}, status=status.HTTP_409_CONFLICT)
 
 # CRUD des transactions
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     CRUD des transactions comptables
     - 🔍 GET /transactions/ → Lister les transactions
@@ -81,16 +185,81 @@ class TransactionViewSet(viewsets.ModelViewSet):
     - 📝 PUT /transactions/{id}/ → Modifier une transaction
     - ❌ DELETE /transactions/{id}/ → Supprimer une transaction (Admin only)
     """
-    queryset = Transaction.objects.all()
+    # Les intitulés des comptes sont lus par le sérializer : jointure plutôt qu'une requête par ligne
+    queryset = Transaction.objects.select_related('debit_account', 'credit_account').order_by('date', 'id')
     serializer_class = TransactionSerializer
+    fast_reader = TransactionReader
+    keyset_ordering = ('date', 'id')
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, LedgerSearchFilter]
     filterset_fields = ['date', 'debit_account', 'credit_account']
 
+    @swagger_auto_schema(
+        operation_description="Enregistrer une transaction (rejouable avec l'en-tête `Idempotency-Key`)",
+        request_body=TransactionSerializer,
+        responses={201: TransactionSerializer, 422: "Clé d'idempotence déjà utilisée pour une autre requête"},
+        manual_parameters=[authorization, idempotency_key]
+    )
+    def create(self, request, *args, **kwargs):
+        compute = super().create
+        return idempotent_response(request, 'transactions.create', lambda: compute(request, *args, **kwargs))
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
         logger.info("Nouvelle transaction créée par %s", self.request.user)
 
+    # Le journal attribue modifications et suppressions à l'utilisateur qui agit, pas à l'auteur
+    def perform_update(self, serializer):
+        serializer.save(acting_user=self.request.user)
+
+    def perform_destroy(self, instance):
+        instance.acting_user = self.request.user
+        instance.delete()
+
+    @swagger_auto_schema(
+        operation_description="Liste des transactions, filtrable par date, compte et `search` "
+                              "(libellé ou intitulé d'un des comptes)",
+        responses={200: TransactionSerializer(many=True)},
+        manual_parameters=[authorization, search]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Importer un lot de transactions (JSON, CSV ou fichier) en tout-ou-rien",
+        request_body=TransactionSerializer(many=True),
+        responses={201: "Nombre de transactions créées", 400: "Rapport d'erreurs par ligne",
+                   422: "Clé d'idempotence déjà utilisée pour une autre requête"},
+        manual_parameters=[authorization, idempotency_key]
+    )
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, MultiPartParser, CSVParser])
+    def bulk(self, request):
+        return idempotent_response(request, 'transactions.bulk', lambda: self._bulk(request))
+
+    def _bulk(self, request):
+        try:
+            created = import_transactions(self._bulk_rows(request), request.user)
+        except BulkImportError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        logger.info("%s transactions importées par %s", created, request.user)
+        return Response({"created": created}, status=status.HTTP_201_CREATED)
+
+    def _bulk_rows(self, request):
+        """ Extrait les lignes du lot : liste JSON, `{"transactions": [...]}`, corps CSV ou fichier `file` """
+        data = request.data
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                content = upload.read().decode('utf-8-sig')
+                data = json.loads(content) if upload.name.endswith('.json') else read_csv(content)
+            except ValueError:
+                data = None
+        elif isinstance(data, str):
+            data = read_csv(data)
+        if isinstance(data, dict):
+            data = data.get('transactions')
+        return data
+
     @swagger_auto_schema(
         operation_description="Supprimer une transaction (Admin seulement)",
         responses={204: "Transaction supprimée"},
@@ -101,52 +270,297 @@ class TransactionViewSet(viewsets.ModelViewSet):
             return Response({"error": "Seuls les admins peuvent supprimer une transaction"},
                             status=status.HTTP_403_FORBIDDEN)
         logger.warning("Transaction %s supprimée par %s", kwargs['pk'], request.user)
-        return super().destroy(request, *args, **kwargs)
+        try:
+            with transaction.atomic():
+                return super().destroy(request, *args, **kwargs)
+        except ClosedPeriodError as exc:
+            return Response({"error": exc.messages[0]}, status=status.HTTP_409_CONFLICT)
+
+# 🧾 Pièces comptables à plusieurs lignes
+class VoucherViewSet(ReplicaReadMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                     viewsets.GenericViewSet):
+    """
+    Pièces comptables (factures, relevés…) à N lignes équilibrées
+    - ➕ POST /vouchers/ → Enregistrer une pièce (somme des débits = somme des crédits)
+    - 🔍 GET /vouchers/ → Lister les pièces
+    - 🔎 GET /vouchers/{id}/ → Détail d'une pièce (lignes par compte et transactions)
+    """
+    queryset = Voucher.objects.prefetch_related('transactions').order_by('date', 'id')
+    serializer_class = VoucherSerializer
+    keyset_ordering = ('date', 'id')
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Enregistrer une pièce comptable à plusieurs lignes, comptabilisée en une seule passe",
+        request_body=VoucherSerializer,
+        responses={201: VoucherSerializer, 400: "Pièce déséquilibrée ou comptes inconnus",
+                   422: "Clé d'idempotence déjà utilisée pour une autre requête"},
+        manual_parameters=[authorization, idempotency_key]
+    )
+    def create(self, request, *args, **kwargs):
+        compute = super().create
+        return idempotent_response(request, 'vouchers.create', lambda: compute(request, *args, **kwargs))
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+        logger.info("Nouvelle pièce %s enregistrée par %s", serializer.instance.pk, self.request.user)
+
+    @swagger_auto_schema(
+        operation_description="Liste des pièces comptables",
+        responses={200: VoucherSerializer(many=True)},
+        manual_parameters=[authorization]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Détail d'une pièce comptable",
+        responses={200: VoucherSerializer},
+        manual_parameters=[authorization]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 # CRUD des écritures comptables
-class ExportBalanceViewSet(viewsets.ViewSet):
+class ExportBalanceViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """
     📊 Export de la balance comptable en Excel
-    - 📥 GET /export-balance/ → Télécharger un fichier Excel de la balance comptable
+    - 📥 GET /export-balance/ → Télécharger un fichier Excel (ou CSV) de la balance comptable
     """
     permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Exporter la balance comptable sous format Excel",
+        operation_description="Exporter la balance comptable sous format Excel ou CSV, "
+                              "éventuellement limitée à une période",
+        query_serializer=BalanceExportSerializer,
         responses={200: "Fichier Excel téléchargé"},
         manual_parameters=[authorization]
     )
     @action(detail=False, methods=['get'])
     def export_balance(self, request):
-        accounts = Account.objects.all()
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename=balance_comptable.xlsx'
-
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.title = "Balance Comptable"
-        headers = ["Compte", "Intitulé", "Solde début période", "Débit", "Crédit", "Solde fin période"]
-        sheet.append(headers)
-
-        for account in accounts:
-            debits = Transaction.objects.filter(debit_account=account).aggregate(total=Sum('amount'))['total'] or 0
-            credits = Transaction.objects.filter(credit_account=account).aggregate(total=Sum('amount'))['total'] or 0
-            solde_initial = account.balance - (credits - debits)
+        params = BalanceExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        rows = balance_in_currency(balance_rows(date_from=params.validated_data.get('date_from'),
+                                                date_to=params.validated_data.get('date_to')), params.validated_data)
 
-            row = [account.code, account.title, solde_initial, debits, credits, account.balance]
-            sheet.append(row)
+        if params.validated_data['file_format'] == 'csv':
+            # CSV envoyé au fil de l'eau : le client reçoit les premiers octets immédiatement
+            response = StreamingHttpResponse(iter_balance_csv(rows), content_type=CSV_CONTENT_TYPE)
+            response['Content-Disposition'] = 'attachment; filename=balance_comptable.csv'
+        else:
+            # Classeur en écriture seule sur fichier temporaire, renvoyé par blocs
+            output = tempfile.TemporaryFile()
+            write_balance_xlsx(rows, output)
+            output.seek(0)
+            response = FileResponse(output, as_attachment=True, filename='balance_comptable.xlsx',
+                                    content_type=XLSX_CONTENT_TYPE)
 
-        workbook.save(response)
         logger.info("Balance comptable exportée par %s", request.user)
         return response
 
-class JournalEntryViewSet(viewsets.ReadOnlyModelViewSet):
+# 📊 Balance comptable exposée en JSON
+class BalanceViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Balance comptable calculée par le moteur de soldes
+    - 🔍 GET /balance/ → Soldes de début, totaux débit / crédit et soldes de fin par compte
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Balance comptable de tous les comptes, éventuellement limitée à une période "
+                              "et présentée dans une autre devise (`currency`, taux de fin de période)",
+        query_serializer=BalanceCurrencySerializer,
+        responses={200: BalanceRowSerializer(many=True)},
+        manual_parameters=[authorization]
+    )
+    def list(self, request):
+        params = BalanceCurrencySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        period = {name: params.validated_data.get(name) for name in ('date_from', 'date_to')}
+        # Balance convertie : la réponse en cache dépend aussi des taux chargés
+        version = ledger_version()
+        if balance_currency(params.validated_data)[0] is not None:
+            version = f"{version}.{exchange_rates_version()}"
+        return cached_response(request, version, lambda: Response(BalanceRowSerializer(
+            balance_in_currency(balance_rows(**period), params.validated_data), many=True).data))
+
+# 📉 Analyses calculées côté serveur
+class AnalyticsViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Analyses du grand livre calculées avec pandas (importé à la première analyse, pas au démarrage)
+    - 📈 GET /analytics/pnl/ → Compte de résultat mensuel (produits, charges, résultat)
+    - 🧾 GET /analytics/balance_sheet/ → Totaux du bilan (actif, passif) à une date
+    - 💶 GET /analytics/cash_flow/ → Flux de trésorerie mensuels
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Compte de résultat mensuel (produits, charges et résultat par mois)",
+        query_serializer=BalancePeriodSerializer,
+        responses={200: PnlRowSerializer(many=True)},
+        manual_parameters=[authorization]
+    )
+    @action(detail=False, methods=['get'])
+    def pnl(self, request):
+        from .analytics import monthly_pnl
+
+        params = BalancePeriodSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return cached_response(request, ledger_version(), lambda: Response(
+            PnlRowSerializer(monthly_pnl(**params.validated_data), many=True).data))
+
+    @swagger_auto_schema(
+        operation_description="Totaux débit / crédit et soldes des comptes d'actif et de passif à une date",
+        query_serializer=BalanceSheetParamsSerializer,
+        responses={200: BalanceSheetRowSerializer(many=True)},
+        manual_parameters=[authorization]
+    )
+    @action(detail=False, methods=['get'])
+    def balance_sheet(self, request):
+        from .analytics import balance_sheet
+
+        params = BalanceSheetParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return cached_response(request, ledger_version(), lambda: Response(
+            BalanceSheetRowSerializer(balance_sheet(params.validated_data.get('date')), many=True).data))
+
+    @swagger_auto_schema(
+        operation_description="Flux de trésorerie mensuels (encaissements, décaissements et solde net)",
+        query_serializer=BalancePeriodSerializer,
+        responses={200: CashFlowRowSerializer(many=True)},
+        manual_parameters=[authorization]
+    )
+    @action(detail=False, methods=['get'])
+    def cash_flow(self, request):
+        from .analytics import cash_flow
+
+        params = BalancePeriodSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return cached_response(request, ledger_version(), lambda: Response(
+            CashFlowRowSerializer(cash_flow(**params.validated_data), many=True).data))
+
+# ⏳ Rapports générés en arrière-plan
+class ReportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Génération asynchrone des rapports
+    - ➕ POST /reports/ → Demander un rapport (réponse immédiate, 202)
+    - 🔍 GET /reports/{id}/ → Suivre l'état de la demande
+    - 📥 GET /reports/{id}/download/ → Télécharger le fichier une fois le rapport terminé
+    """
+    queryset = ReportJob.objects.order_by('-created_at')
+    serializer_class = ReportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # Chacun ne voit (et ne télécharge) que ses rapports ; les admins voient tout.
+        # `user_id` : en lecture sans état, `request.user` est un TokenUser et non une instance de User
+        queryset = super().get_queryset()
+        return queryset if self.request.user.is_staff else queryset.filter(user_id=self.request.user.id)
+
+    @swagger_auto_schema(
+        operation_description="Demander la génération d'un rapport ; une demande identique du même utilisateur "
+                              "sur le même état du grand livre renvoie le rapport déjà produit ou en cours",
+        request_body=ReportJobSerializer,
+        responses={202: ReportJobSerializer, 200: ReportJobSerializer},
+        manual_parameters=[authorization]
+    )
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = request_report(serializer.validated_data['kind'], serializer.validated_data['params'],
+                                      request.user)
+        logger.info("Rapport %s demandé par %s (%s)", job.pk, request.user, "nouveau" if created else "existant")
+        return Response(self.get_serializer(job).data,
+                        status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Télécharger le fichier d'un rapport terminé",
+        responses={200: "Fichier du rapport", 409: "Rapport pas encore disponible"},
+        manual_parameters=[authorization]
+    )
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJob.DONE:
+            return Response({"error": "Le rapport n'est pas disponible", "status": job.status},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file.name.rsplit('/', 1)[-1])
+
+# 🔒 Exercices comptables : clôture et archivage
+class FiscalYearViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                        viewsets.GenericViewSet):
+    """
+    Exercices comptables
+    - ➕ POST /fiscal-years/ → Déclarer un exercice (mois entiers)
+    - 🔍 GET /fiscal-years/ → Lister les exercices
+    - 🔒 POST /fiscal-years/{id}/close/ → Clôturer : écritures de clôture, à-nouveaux, période verrouillée (Admin only)
+    - 📦 POST /fiscal-years/{id}/archive/ → Déplacer les transactions d'un exercice clos en archive (Admin only)
+    """
+    queryset = FiscalYear.objects.order_by('start')
+    serializer_class = FiscalYearSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Déclarer un exercice comptable",
+        request_body=FiscalYearSerializer,
+        responses={201: FiscalYearSerializer},
+        manual_parameters=[authorization]
+    )
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Clôturer l'exercice : comptes de produits et charges soldés dans le résultat, "
+                              "comptes de bilan soldés puis rouverts le lendemain, transactions verrouillées",
+        request_body=no_body,
+        responses={200: FiscalYearSerializer, 409: "Exercice déjà clos ou exercice antérieur ouvert"},
+        manual_parameters=[authorization]
+    )
+    @action(detail=True, methods=['post'])
+    def close(self, request, pk=None):
+        return self._run(request, lambda year: close_fiscal_year(year, request.user), "clôturé")
+
+    @swagger_auto_schema(
+        operation_description="Archiver un exercice clos : ses transactions quittent la table de travail",
+        request_body=no_body,
+        responses={200: FiscalYearSerializer, 409: "Exercice non clos ou exercice antérieur non archivé"},
+        manual_parameters=[authorization]
+    )
+    @action(detail=True, methods=['post'])
+    def archive(self, request, pk=None):
+        return self._run(request, archive_fiscal_year, "archivé")
+
+    def _run(self, request, operation, done):
+        if not request.user.is_staff:
+            return Response({"error": "Seuls les admins peuvent clôturer ou archiver un exercice"},
+                            status=status.HTTP_403_FORBIDDEN)
+        year = self.get_object()
+        try:
+            operation(year)
+        except ClosedPeriodError as exc:
+            return Response({"error": exc.messages[0]}, status=status.HTTP_409_CONFLICT)
+        logger.warning("Exercice %s %s par %s", year, done, request.user)
+        year.refresh_from_db()
+        return Response(self.get_serializer(year).data)
+
+class JournalEntryViewSet(ReplicaReadMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API Read-Only pour consulter les entrées du journal comptable
+    - 🔍 GET /journal/?created_at__gte=...&created_at__lt=... → Entrées d'une période (seules les
+      partitions mensuelles concernées sont lues sous PostgreSQL)
     """
-    queryset = JournalEntry.objects.all()
+    queryset = JournalEntry.objects.select_related('user').order_by('created_at', 'id')
     serializer_class = JournalEntrySerializer
+    fast_reader = JournalEntryReader
+    keyset_ordering = ('created_at', 'id')
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'created_at': ['gte', 'lt'],
+        'transaction': ['exact'],
+        'action': ['exact'],
+    }
 
     @swagger_auto_schema(
         manual_parameters=[authorization]
@@ -0,0 +1,91 @@
+"""
+Pièces comptables à plusieurs lignes (`/api/vouchers/`).
+
+Une pièce reçoit N lignes `(compte, débit, crédit)` dont la somme des débits
+égale la somme des crédits. Les lignes sont d'abord nettées par compte, puis
+les comptes débiteurs sont appariés aux comptes créditeurs : on obtient au
+plus (comptes mouvementés − 1) transactions, rattachées à la pièce, ce qui
+garde le moteur de soldes, le grand livre et les analyses inchangés.
+
+La comptabilisation d'une pièce est groupée dans une seule transaction de
+base : un INSERT pour la pièce, un INSERT groupé pour ses transactions, un
+seul UPDATE des soldes pour tous les comptes concernés (variations
+regroupées par compte), les cumuls mensuels, puis un INSERT groupé dans le
+journal.
+
+Une pièce saisie en devise étrangère garde ses lignes dans sa devise
+(`currency_amount` des transactions) ; chaque paire est convertie au taux du
+jour de la pièce, si bien que débit et crédit convertis restent égaux.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from .currency import convert, exchange_rate
+from .models import Account, JournalEntry, Transaction, Voucher, functional_currency
+
+
+def net_lines(lines):
+    """ Solde `{account_id: débit − crédit}` des lignes, comptes soldés exclus """
+    net = defaultdict(Decimal)
+    for account_id, debit, credit in lines:
+        net[account_id] += debit - credit
+    return {account_id: amount for account_id, amount in net.items() if amount}
+
+
+def split_lines(lines):
+    """
+    Décompose des lignes équilibrées `(compte, débit, crédit)` en paires
+    `(compte débité, compte crédité, montant)`, en appariant les comptes dans
+    l'ordre de leur première apparition.
+    """
+    net = net_lines(lines)
+    debits = [[account_id, amount] for account_id, amount in net.items() if amount > 0]
+    credits = [[account_id, -amount] for account_id, amount in net.items() if amount < 0]
+    pairs = []
+    debit_index = credit_index = 0
+    while debit_index < len(debits) and credit_index < len(credits):
+        debit, credit = debits[debit_index], credits[credit_index]
+        amount = min(debit[1], credit[1])
+        pairs.append((debit[0], credit[0], amount))
+        debit[1] -= amount
+        credit[1] -= amount
+        if not debit[1]:
+            debit_index += 1
+        if not credit[1]:
+            credit_index += 1
+    return pairs
+
+
+def post_voucher(date, description, lines, user, reference='', currency=None):
+    """
+    Enregistre une pièce et ses transactions, et applique leurs mouvements en
+    une seule passe. Les lignes doivent avoir été validées (équilibre,
+    comptes existants). Retourne la pièce.
+    """
+    return post_pairs(date, description, split_lines(lines), user, reference=reference, currency=currency)
+
+
+def post_pairs(date, description, pairs, user, reference='', kind=Voucher.ENTRY, currency=None):
+    """
+    Enregistre une pièce formée de paires `(compte débité, compte crédité,
+    montant)` en `currency` (devise fonctionnelle par défaut) : INSERT de la
+    pièce et des transactions, mouvements appliqués en une passe, journal.
+    Retourne la pièce.
+    """
+    currency = currency or functional_currency()
+    foreign = currency != functional_currency()
+    rate = exchange_rate(currency, date)
+    with transaction.atomic():
+        voucher = Voucher.objects.create(reference=reference, date=date, description=description, user=user,
+                                         kind=kind, currency=currency)
+        transactions = Transaction.objects.bulk_create(
+            Transaction(date=date, description=description, debit_account_id=debit_account,
+                        credit_account_id=credit_account, amount=convert(amount, rate), currency=currency,
+                        currency_amount=amount if foreign else None, user=user, voucher=voucher)
+            for debit_account, credit_account, amount in pairs
+        )
+        Account.objects.post_movements(movement for txn in transactions for movement in txn.movements())
+        JournalEntry.objects.record(transactions, JournalEntry.CREATE)
+    return voucher